@@ -0,0 +1,143 @@
+import json
+import math
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from grouse.columnar import REPORT_FIELDS, SCORE_METRICS, EvaluationColumns
+from grouse.dtos import (
+    EvaluationDiff,
+    EvaluationSample,
+    GroundedQAEvaluation,
+    GroundedQAEvaluationReport,
+)
+from grouse.journal import JOURNAL_FILE_NAME, has_failed_metric, read_journal
+from grouse.utils import get_question_hash, get_sample_hash
+
+
+class Baseline:
+    """Evaluations of a previous run of grouse evaluate, read from the journal of
+    its output directory.
+
+    The evaluation of a sample is reused when its input, references, expected
+    output and actual output are all unchanged, unless one of its metrics failed,
+    as when resuming a journal. Samples answering the same
+    question with another actual output are matched with their previous
+    evaluation to compare the scores.
+    """
+
+    def __init__(self, output_dir_path: str, config_hash: Optional[str] = None):
+        """
+        Args:
+            output_dir_path (str): Output directory of the previous run.
+            config_hash (Optional[str]): Hash of the configuration of the current
+            evaluator. If given, the baseline is refused when its evaluations were
+            recorded with another configuration, such as another judge model or
+            prompts, as its scores would not be comparable.
+
+        Raises:
+            FileNotFoundError: If the output directory has no journal.
+            ValueError: If the configuration of the baseline does not match.
+        """
+        journal_path = os.path.join(output_dir_path, JOURNAL_FILE_NAME)
+        if not os.path.exists(journal_path):
+            raise FileNotFoundError(f"No journal found in baseline {output_dir_path}")
+        self.evaluations: Dict[str, GroundedQAEvaluation] = {}
+        # Sample hash of the last answer to each question
+        self.question_sample_hashes: Dict[str, str] = {}
+        for entry in read_journal(journal_path):
+            if config_hash is not None and entry.get("config_hash") != config_hash:
+                raise ValueError(
+                    f"Baseline {output_dir_path} was evaluated with another "
+                    "evaluator configuration (model, prompts, cascade or metric "
+                    "routes)"
+                )
+            self.evaluations[entry["sample_hash"]] = GroundedQAEvaluation(
+                **entry["evaluation"]
+            )
+            if "question_hash" in entry:
+                self.question_sample_hashes[entry["question_hash"]] = entry[
+                    "sample_hash"
+                ]
+        self.report: Optional[Dict[str, float]] = None
+        report_path = os.path.join(output_dir_path, "report.json")
+        if os.path.exists(report_path):
+            with open(report_path, encoding="utf-8") as file:
+                report = json.load(file)
+            # NaN values are written as null
+            self.report = {
+                field: math.nan if report.get(field) is None else report[field]
+                for field in REPORT_FIELDS
+            }
+
+    def get(self, eval_sample: EvaluationSample) -> Optional[GroundedQAEvaluation]:
+        evaluation = self.evaluations.get(get_sample_hash(eval_sample))
+        # Failed evaluations are kept to compare the runs, but evaluated again
+        if evaluation is None or has_failed_metric(evaluation):
+            return None
+        return evaluation
+
+    def compute_diff(
+        self,
+        eval_samples: Sequence[EvaluationSample],
+        columns: EvaluationColumns,
+        report: GroundedQAEvaluationReport,
+    ) -> EvaluationDiff:
+        """Compare the evaluations of a run with those of the baseline.
+
+        Args:
+            eval_samples (Sequence[EvaluationSample]): Evaluated samples.
+            columns (EvaluationColumns): Evaluations of the samples, in the same
+            order.
+            report (GroundedQAEvaluationReport): Report of the evaluations.
+        """
+        changed_indices: List[int] = []
+        changed_evaluations: List[GroundedQAEvaluation] = []
+        matched_sample_hashes = set()
+        new_samples = 0
+        for index, eval_sample in enumerate(eval_samples):
+            sample_hash = get_sample_hash(eval_sample)
+            if sample_hash in self.evaluations:
+                matched_sample_hashes.add(sample_hash)
+                continue
+            baseline_sample_hash = self.question_sample_hashes.get(
+                get_question_hash(eval_sample)
+            )
+            if baseline_sample_hash is None:
+                new_samples += 1
+                continue
+            matched_sample_hashes.add(baseline_sample_hash)
+            changed_indices.append(index)
+            changed_evaluations.append(self.evaluations[baseline_sample_hash])
+
+        changed_columns = columns[np.array(changed_indices, dtype=np.int64)]
+        baseline_columns = EvaluationColumns.from_evaluations(changed_evaluations)
+        score_deltas = {}
+        improved_samples = {}
+        regressed_samples = {}
+        for metric in SCORE_METRICS:
+            deltas = changed_columns.values[metric] - baseline_columns.values[metric]
+            # Pairs with a null or failed score are left out
+            deltas = deltas[~np.isnan(deltas)]
+            score_deltas[metric] = float(deltas.mean()) if len(deltas) else math.nan
+            improved_samples[metric] = int(np.count_nonzero(deltas > 0))
+            regressed_samples[metric] = int(np.count_nonzero(deltas < 0))
+
+        return EvaluationDiff(
+            unchanged_samples=len(eval_samples) - len(changed_indices) - new_samples,
+            changed_samples=len(changed_indices),
+            new_samples=new_samples,
+            removed_samples=len(self.evaluations) - len(matched_sample_hashes),
+            report_deltas=(
+                {
+                    field: getattr(report, field) - self.report[field]
+                    for field in REPORT_FIELDS
+                }
+                if self.report is not None
+                else None
+            ),
+            score_deltas=score_deltas,
+            improved_samples=improved_samples,
+            regressed_samples=regressed_samples,
+        )
@@ -0,0 +1,409 @@
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import litellm
+
+from grouse.dtos import (
+    AnswerRelevancy,
+    Completeness,
+    EvaluationSample,
+    Failed,
+    Faithfulness,
+    GroundedQAEvaluation,
+    ScorePair,
+    Usefulness,
+)
+from grouse.grounded_qa_evaluator import GroundedQAEvaluator
+from grouse.journal import EvaluationJournal
+
+# Price of batched requests relative to regular requests for OpenAI and Anthropic
+BATCH_COST_FACTOR = 0.5
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+Result = TypeVar("Result")
+
+
+class SampleRequests:
+    """Metric evaluations of a sample in progress and the batch requests they
+    wait for. Each metric evaluation sends one request at a time, so the sample is
+    blocked once there are as many pending requests as evaluations in progress."""
+
+    def __init__(self, progress: asyncio.Event):
+        self.progress = progress
+        self.evaluations = 0
+        self.requests = 0
+
+    @property
+    def blocked(self) -> bool:
+        return self.evaluations > 0 and self.requests == self.evaluations
+
+    def update(self, evaluations: int = 0, requests: int = 0) -> None:
+        self.evaluations += evaluations
+        self.requests += requests
+        self.progress.set()
+
+
+# Requests of the sample evaluated by the current task, only set in batch waves
+_sample_requests: ContextVar[Optional[SampleRequests]] = ContextVar(
+    "sample_requests", default=None
+)
+
+
+class BatchService(ABC):
+    """Service running batches of chat completion requests written in the OpenAI
+    batch JSONL format."""
+
+    def get_model(self, model_name: str) -> str:
+        """Name of the model to put in the body of the requests."""
+        return model_name
+
+    @abstractmethod
+    async def submit(self, requests_path: str) -> str:
+        """Submit the requests of a JSONL file and return the id of the batch."""
+
+    @abstractmethod
+    async def retrieve(self, batch_id: str, results_path: str) -> bool:
+        """Write the results of a batch to results_path if it is completed.
+
+        Returns:
+            bool: Whether the batch is completed.
+        """
+
+
+class LiteLLMBatchService(BatchService):
+    """Batch service of a provider supported by the LiteLLM batches API, such as
+    OpenAI, Azure or Vertex AI."""
+
+    def __init__(self, custom_llm_provider: str = "openai"):
+        self.custom_llm_provider = custom_llm_provider
+
+    def get_model(self, model_name: str) -> str:
+        model, _, _, _ = litellm.get_llm_provider(model_name)
+        return model
+
+    async def submit(self, requests_path: str) -> str:
+        with open(requests_path, "rb") as file:
+            file_object = await litellm.acreate_file(
+                file=file,
+                purpose="batch",
+                custom_llm_provider=self.custom_llm_provider,
+            )
+        batch = await litellm.acreate_batch(
+            completion_window="24h",
+            endpoint=BATCH_ENDPOINT,
+            input_file_id=file_object.id,
+            custom_llm_provider=self.custom_llm_provider,
+        )
+        return batch.id
+
+    async def retrieve(self, batch_id: str, results_path: str) -> bool:
+        batch = await litellm.aretrieve_batch(
+            batch_id=batch_id, custom_llm_provider=self.custom_llm_provider
+        )
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} is {batch.status}")
+        if batch.status != "completed":
+            return False
+        with open(results_path, "wb") as file:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is not None:
+                    content = await litellm.afile_content(
+                        file_id=file_id, custom_llm_provider=self.custom_llm_provider
+                    )
+                    file.write(content.content)
+        return True
+
+
+class LocalBatchService(BatchService):
+    """Local stand-in for a provider batch service, answering each request with the
+    given function and reading and writing the batches on disk."""
+
+    def __init__(
+        self, directory: str, respond: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ):
+        """
+        Args:
+            directory (str): Directory where the submitted batches are stored.
+            respond (Callable[[Dict[str, Any]], Dict[str, Any]]): Function taking
+            the body of a request and returning the body of its chat completion.
+        """
+        self.directory = directory
+        self.respond = respond
+        os.makedirs(directory, exist_ok=True)
+
+    async def submit(self, requests_path: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        shutil.copy(requests_path, os.path.join(self.directory, f"{batch_id}.jsonl"))
+        return batch_id
+
+    async def retrieve(self, batch_id: str, results_path: str) -> bool:
+        with (
+            open(
+                os.path.join(self.directory, f"{batch_id}.jsonl"), encoding="utf-8"
+            ) as requests_file,
+            open(results_path, "w", encoding="utf-8") as results_file,
+        ):
+            for line in requests_file:
+                request = json.loads(line)
+                try:
+                    result = {
+                        "response": {
+                            "status_code": 200,
+                            "body": self.respond(request["body"]),
+                        },
+                        "error": None,
+                    }
+                except Exception as error:
+                    result = {"response": None, "error": {"message": str(error)}}
+                result["custom_id"] = request["custom_id"]
+                results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return True
+
+
+class BatchGroundedQAEvaluator(GroundedQAEvaluator):
+    """Evaluator sending its LLM calls through a batch service instead of calling
+    the model directly, trading latency for cost and throughput.
+
+    The evaluations of all the samples run until each metric evaluation in
+    progress waits for an LLM call. These calls are then sent as one batch, and the
+    evaluations resume with the results. Answer relevancy and completeness are
+    called in parallel by default so that they are sent in the same wave, and the
+    calls depending on the answer relevancy and usefulness scores are sent in later
+    waves.
+    """
+
+    def __init__(
+        self,
+        batch_service: BatchService,
+        work_dir: str,
+        poll_interval: float = 60.0,
+        cost_factor: float = BATCH_COST_FACTOR,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            batch_service (BatchService): Service running the batches.
+            work_dir (str): Directory where the request and result files of the
+            batches are written.
+            poll_interval (float): Number of seconds between two checks of the
+            status of a batch.
+            cost_factor (float): Price of batched requests relative to regular
+            requests.
+            **kwargs: Arguments of GroundedQAEvaluator.
+        """
+        kwargs.setdefault("parallel_metrics", True)
+        super().__init__(**kwargs)
+        self.batch_service = batch_service
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.cost_factor = cost_factor
+        self.waves = 0
+        self.pending_requests: List[
+            Tuple[
+                Dict[str, Any],
+                asyncio.Future[litellm.ModelResponse],
+                Optional[SampleRequests],
+            ]
+        ] = []
+        os.makedirs(work_dir, exist_ok=True)
+
+    def record_cost(self, pair_model: ScorePair, cost: float) -> None:
+        super().record_cost(pair_model, cost * self.cost_factor)
+
+    async def complete(
+        self, metric: str, messages: List[Dict[str, str]]
+    ) -> litellm.ModelResponse:
+        future: asyncio.Future[litellm.ModelResponse] = (
+            asyncio.get_running_loop().create_future()
+        )
+        body = {
+            "model": self.batch_service.get_model(self.model_name),
+            "messages": messages,
+            **self.completion_kwargs(),
+        }
+        sample_requests = _sample_requests.get()
+        self.pending_requests.append((body, future, sample_requests))
+        if sample_requests is None:
+            return await future
+        sample_requests.update(requests=1)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                sample_requests.update(requests=-1)
+            raise
+
+    def __track_evaluation(
+        self, evaluation: Coroutine[Any, Any, Result]
+    ) -> Coroutine[Any, Any, Result]:
+        """Count a metric evaluation as in progress from the creation of its
+        coroutine, before it runs, so that a wave is not sent without it."""
+        sample_requests = _sample_requests.get()
+        if sample_requests is None:
+            return evaluation
+        sample_requests.update(evaluations=1)
+
+        async def tracked_evaluation() -> Result:
+            try:
+                return await evaluation
+            finally:
+                sample_requests.update(evaluations=-1)
+
+        return tracked_evaluation()
+
+    def evaluate_answer_relevancy(
+        self, eval_sample: EvaluationSample
+    ) -> Coroutine[Any, Any, AnswerRelevancy | Failed]:
+        return self.__track_evaluation(super().evaluate_answer_relevancy(eval_sample))
+
+    def evaluate_completeness(
+        self, eval_sample: EvaluationSample
+    ) -> Coroutine[Any, Any, Completeness | Failed]:
+        return self.__track_evaluation(super().evaluate_completeness(eval_sample))
+
+    def evaluate_faithfulness(
+        self, eval_sample: EvaluationSample
+    ) -> Coroutine[Any, Any, Faithfulness | Failed]:
+        return self.__track_evaluation(super().evaluate_faithfulness(eval_sample))
+
+    def evaluate_usefulness(
+        self, eval_sample: EvaluationSample
+    ) -> Coroutine[Any, Any, Usefulness | Failed]:
+        return self.__track_evaluation(super().evaluate_usefulness(eval_sample))
+
+    async def __evaluate_with_requests(
+        self, eval_sample: EvaluationSample, sample_requests: SampleRequests
+    ) -> GroundedQAEvaluation:
+        _sample_requests.set(sample_requests)
+        return await self.evaluate_single_sample(eval_sample)
+
+    @staticmethod
+    async def __wait_until_blocked(
+        samples: Dict["asyncio.Task[GroundedQAEvaluation]", SampleRequests],
+        progress: asyncio.Event,
+    ) -> None:
+        """Let the evaluations run until each one is done or all its metric
+        evaluations in progress wait for a request."""
+        while not all(
+            task.done() or sample_requests.blocked
+            for task, sample_requests in samples.items()
+        ):
+            progress.clear()
+            await progress.wait()
+
+    async def __run_wave(self) -> None:
+        requests = [
+            (body, future, sample_requests)
+            for body, future, sample_requests in self.pending_requests
+            if not future.cancelled()
+        ]
+        self.pending_requests = []
+        requests_path = os.path.join(self.work_dir, f"wave_{self.waves}_requests.jsonl")
+        results_path = os.path.join(self.work_dir, f"wave_{self.waves}_results.jsonl")
+        self.waves += 1
+
+        with open(requests_path, "w", encoding="utf-8") as file:
+            for request_index, (body, _, _) in enumerate(requests):
+                request = {
+                    "custom_id": f"request-{request_index}",
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": body,
+                }
+                file.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        batch_id = await self.batch_service.submit(requests_path)
+        self.logger.info(f"Submitted batch {batch_id} with {len(requests)} requests")
+        while not await self.batch_service.retrieve(batch_id, results_path):
+            await asyncio.sleep(self.poll_interval)
+
+        results = {}
+        with open(results_path, encoding="utf-8") as file:
+            for line in file:
+                result = json.loads(line)
+                results[result["custom_id"]] = result
+
+        for request_index, (_, future, sample_requests) in enumerate(requests):
+            if future.cancelled():
+                continue
+            # The request stops being pending as soon as its result is set, before
+            # its evaluation resumes
+            if sample_requests is not None:
+                sample_requests.update(requests=-1)
+            result = results.get(f"request-{request_index}")
+            if result is None:
+                future.set_exception(ValueError("Missing batch result"))
+            elif result.get("error") or result["response"]["status_code"] != 200:
+                future.set_exception(
+                    ValueError(f"Batch request failed: {result.get('error')}")
+                )
+            else:
+                future.set_result(litellm.ModelResponse(**result["response"]["body"]))
+
+    async def aiter_evaluate(
+        self,
+        eval_samples: Iterable[EvaluationSample],
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+    ) -> AsyncIterator[Tuple[int, GroundedQAEvaluation]]:
+        """Evaluate samples with batches of requests and yield each evaluation once
+        its last wave is completed, along with the index of its sample.
+
+        All samples are evaluated at the same time, so semaphore_size is not used.
+        If a journal is given, each evaluation is recorded in it before being yielded
+        and the samples already present in the journal are not evaluated again.
+        """
+        tasks: Dict[
+            asyncio.Task[GroundedQAEvaluation], Tuple[int, EvaluationSample]
+        ] = {}
+        samples: Dict[asyncio.Task[GroundedQAEvaluation], SampleRequests] = {}
+        progress = asyncio.Event()
+        try:
+            for index, eval_sample in enumerate(eval_samples):
+                journaled_evaluation = (
+                    journal.get(eval_sample) if journal is not None else None
+                )
+                if journaled_evaluation is not None:
+                    yield index, journaled_evaluation
+                    continue
+                sample_requests = SampleRequests(progress)
+                task = asyncio.create_task(
+                    self.__evaluate_with_requests(eval_sample, sample_requests)
+                )
+                task.add_done_callback(lambda _: progress.set())
+                tasks[task] = (index, eval_sample)
+                samples[task] = sample_requests
+
+            while tasks:
+                await self.__wait_until_blocked(samples, progress)
+                for task in [task for task in tasks if task.done()]:
+                    index, eval_sample = tasks.pop(task)
+                    del samples[task]
+                    evaluation = task.result()
+                    if journal is not None:
+                        journal.record(eval_sample, evaluation)
+                    yield index, evaluation
+                if tasks:
+                    if not self.pending_requests:
+                        raise RuntimeError("Evaluations are stuck without requests")
+                    await self.__run_wave()
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,404 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from grouse.dtos import (
+    EvaluationSample,
+    Failed,
+    GroundedQAEvaluation,
+    GroundedQAEvaluationReport,
+    GroupReport,
+)
+
+SCORE_METRICS = ("answer_relevancy", "completeness", "faithfulness", "usefulness")
+RATE_METRICS = ("positive_acceptance", "negative_rejection")
+COLUMNS = SCORE_METRICS + RATE_METRICS
+PARSING_SUCCESS_FIELDS = {
+    "answer_relevancy": "answer_relevancy_parsing_success",
+    "completeness": "completeness_parsing_success",
+    "faithfulness": "faithfulness_parsing_success",
+    "usefulness": "usefulness_parse_success",
+}
+REPORT_FIELDS = COLUMNS + tuple(PARSING_SUCCESS_FIELDS.values()) + ("mean",)
+# Maximum number of resampled counts held in memory at once
+BOOTSTRAP_BATCH_SIZE = 2**22
+
+
+class EvaluationColumns:
+    """Columnar representation of evaluations, with the values of each metric in a
+    NumPy array and masks of the null and failed values.
+
+    Args:
+        values (Dict[str, np.ndarray]): Float values of each metric, NaN when the
+        value is null or failed.
+        failed (Dict[str, np.ndarray]): Boolean mask of the failed values of each
+        metric.
+        weights (Optional[np.ndarray]): Weight of each evaluation in the averages,
+        such as the inverse of the sampling rate of its stratum. All evaluations
+        have the same weight by default.
+    """
+
+    def __init__(
+        self,
+        values: Dict[str, np.ndarray],
+        failed: Dict[str, np.ndarray],
+        weights: Optional[np.ndarray] = None,
+    ):
+        self.values = values
+        self.failed = failed
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.values[COLUMNS[0]])
+
+    def __getitem__(self, index: Any) -> "EvaluationColumns":
+        """Select the evaluations of a boolean mask, a slice or an array of
+        indices."""
+        return EvaluationColumns(
+            values={column: values[index] for column, values in self.values.items()},
+            failed={column: failed[index] for column, failed in self.failed.items()},
+            weights=self.weights[index] if self.weights is not None else None,
+        )
+
+    def get_weights(self) -> np.ndarray:
+        """Weight of each evaluation, 1 if the evaluations are not weighted."""
+        if self.weights is None:
+            return np.ones(len(self))
+        return self.weights
+
+    def valid(self, column: str) -> np.ndarray:
+        """Mask of the values that are neither null nor failed."""
+        return ~np.isnan(self.values[column])
+
+    def null(self, column: str) -> np.ndarray:
+        """Mask of the null values."""
+        return np.isnan(self.values[column]) & ~self.failed[column]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "EvaluationColumns":
+        """Build the columns from evaluations dumped as dictionaries, such as the
+        lines of evaluations.jsonl, without validating them. Rows with the index of
+        their sample are put back in the order of the samples."""
+        values: Dict[str, List[float]] = {column: [] for column in COLUMNS}
+        failed: Dict[str, List[bool]] = {column: [] for column in COLUMNS}
+        indices: List[int] = []
+        for row in rows:
+            if "index" in row:
+                indices.append(row["index"])
+            for column in COLUMNS:
+                value = row.get(column)
+                if isinstance(value, dict):
+                    # Scores are nested in their judgement, failed values only
+                    # have an error
+                    is_failed = column not in value
+                    value = value.get(column)
+                else:
+                    is_failed = False
+                failed[column].append(is_failed)
+                values[column].append(np.nan if value is None else value)
+        columns = cls(
+            values={
+                column: np.array(column_values, dtype=np.float64)
+                for column, column_values in values.items()
+            },
+            failed={
+                column: np.array(column_failed, dtype=bool)
+                for column, column_failed in failed.items()
+            },
+        )
+        if indices:
+            # Streamed evaluations are written in completion order
+            return columns[np.argsort(indices, kind="stable")]
+        return columns
+
+    @classmethod
+    def from_evaluations(
+        cls, evaluations: Iterable[GroundedQAEvaluation]
+    ) -> "EvaluationColumns":
+        rows = []
+        for evaluation in evaluations:
+            row: Dict[str, Any] = {}
+            for column in COLUMNS:
+                value = getattr(evaluation, column)
+                if isinstance(value, Failed):
+                    row[column] = {}
+                elif column in SCORE_METRICS:
+                    row[column] = {column: getattr(value, column)}
+                else:
+                    row[column] = value
+            rows.append(row)
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> "EvaluationColumns":
+        """Build the columns from an evaluations.jsonl file."""
+        with open(path, encoding="utf-8") as file:
+            return cls.from_rows(json.loads(line) for line in file if line.strip())
+
+    @classmethod
+    def from_parquet(cls, path: str) -> "EvaluationColumns":
+        """Build the columns from an evaluations.parquet file, memory mapped and
+        reading only the score columns and their masks of failed values."""
+        import pyarrow
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.read_table(
+            path,
+            columns=["index", *COLUMNS, *(f"{column}_failed" for column in COLUMNS)],
+            memory_map=True,
+        )
+        columns = cls(
+            values={
+                column: table[column]
+                .cast(pyarrow.float64())
+                .fill_null(np.nan)
+                .to_numpy()
+                for column in COLUMNS
+            },
+            failed={column: table[f"{column}_failed"].to_numpy() for column in COLUMNS},
+        )
+        # Streamed evaluations are written in completion order
+        return columns[np.argsort(table["index"].to_numpy(), kind="stable")]
+
+    def mean(self, column: str) -> float:
+        """Weighted mean of the values that are neither null nor failed, NaN if
+        there is none."""
+        valid = self.valid(column)
+        if not valid.any():
+            return float("nan")
+        weights = self.get_weights()[valid]
+        return float((self.values[column][valid] * weights).sum() / weights.sum())
+
+    def parsing_success(self, column: str) -> float:
+        """Weighted share of the values that did not fail, NaN if there is no
+        evaluation."""
+        if len(self) == 0:
+            return float("nan")
+        weights = self.get_weights()
+        return float(1 - weights[self.failed[column]].sum() / weights.sum())
+
+    def __compute_reports(
+        self, group_indices: np.ndarray, num_groups: int
+    ) -> List[GroundedQAEvaluationReport]:
+        """Compute the reports of all groups at once, given the group index of each
+        evaluation."""
+        weights = self.get_weights()
+        sizes = np.bincount(group_indices, weights=weights, minlength=num_groups)
+        means = {}
+        parsing_success = {}
+        for column in COLUMNS:
+            valid = self.valid(column)
+            sums = np.bincount(
+                group_indices,
+                weights=np.where(valid, self.values[column], 0) * weights,
+                minlength=num_groups,
+            )
+            counts = np.bincount(
+                group_indices, weights=valid * weights, minlength=num_groups
+            )
+            failures = np.bincount(
+                group_indices,
+                weights=self.failed[column] * weights,
+                minlength=num_groups,
+            )
+            means[column] = np.divide(
+                sums, counts, out=np.full(num_groups, np.nan), where=counts > 0
+            )
+            parsing_success[column] = np.divide(
+                sizes - failures,
+                sizes,
+                out=np.full(num_groups, np.nan),
+                where=sizes > 0,
+            )
+        mean = np.mean([means[column] for column in COLUMNS], axis=0)
+        return [
+            GroundedQAEvaluationReport(
+                **{column: float(means[column][group]) for column in COLUMNS},
+                **{
+                    field: float(parsing_success[column][group])
+                    for column, field in PARSING_SUCCESS_FIELDS.items()
+                },
+                mean=float(mean[group]),
+            )
+            for group in range(num_groups)
+        ]
+
+    def compute_confidence_intervals(
+        self,
+        num_resamples: int = 10000,
+        confidence_level: float = 0.95,
+        seed: Optional[int | np.random.Generator] = None,
+    ) -> Dict[str, Tuple[float, float]]:
+        """Percentile bootstrap confidence interval of each field of the report.
+
+        Evaluations only take a few distinct values, so the resamples are drawn as
+        multinomial counts of the distinct evaluations, and the averages of a batch
+        of resamples are computed with matrix products. The cost therefore depends
+        on the number of distinct evaluations rather than on the number of
+        evaluations.
+
+        Args:
+            num_resamples (int): Number of bootstrap resamples.
+            confidence_level (float): Confidence level of the intervals.
+            seed (Optional[int | np.random.Generator]): Seed of the random number
+            generator, or the generator itself.
+        """
+        if len(self) == 0:
+            return {field: (float("nan"), float("nan")) for field in REPORT_FIELDS}
+        # The averages depend on each other through the evaluations, whose distinct
+        # values are resampled jointly. Each evaluation is coded by the indices of
+        # its values in all columns, failed values being null, and by its weight.
+        weights = self.get_weights()
+        codes = np.zeros(len(self), dtype=np.int64)
+        for column_values in [
+            np.nan_to_num(self.values[column], nan=-1) for column in COLUMNS
+        ] + [weights]:
+            _, column_codes = np.unique(column_values, return_inverse=True)
+            codes = codes * (column_codes.max() + 1) + column_codes.reshape(-1)
+        _, first_indices, counts = np.unique(
+            codes, return_index=True, return_counts=True
+        )
+        valid = (
+            np.stack([self.valid(column)[first_indices] for column in COLUMNS], axis=1)
+            * weights[first_indices, None]
+        )
+        values = (
+            np.stack(
+                [
+                    np.nan_to_num(self.values[column][first_indices])
+                    for column in COLUMNS
+                ],
+                axis=1,
+            )
+            * weights[first_indices, None]
+        )
+
+        rng = np.random.default_rng(seed)
+        statistics: Dict[str, List[np.ndarray]] = {field: [] for field in REPORT_FIELDS}
+        batch_size = max(1, BOOTSTRAP_BATCH_SIZE // len(counts))
+        for start in range(0, num_resamples, batch_size):
+            resampled_counts = rng.multinomial(
+                len(self),
+                counts / len(self),
+                size=min(batch_size, num_resamples - start),
+            ).astype(np.float64)
+            sums = resampled_counts @ values
+            valid_counts = resampled_counts @ valid
+            means = np.divide(
+                sums,
+                valid_counts,
+                out=np.full_like(sums, np.nan),
+                where=valid_counts > 0,
+            )
+            for index, column in enumerate(COLUMNS):
+                statistics[column].append(means[:, index])
+            statistics["mean"].append(means.mean(axis=1))
+        # Parsing success rates are resampled on their own as binomial counts
+        for column, field in PARSING_SUCCESS_FIELDS.items():
+            statistics[field].append(
+                rng.binomial(
+                    len(self), self.parsing_success(column), size=num_resamples
+                )
+                / len(self)
+            )
+
+        alpha = (1 - confidence_level) / 2
+        confidence_intervals = {}
+        for field in REPORT_FIELDS:
+            resampled = np.concatenate(statistics[field])
+            resampled = resampled[~np.isnan(resampled)]
+            if len(resampled) == 0:
+                confidence_intervals[field] = (float("nan"), float("nan"))
+                continue
+            low, high = np.quantile(resampled, [alpha, 1 - alpha])
+            confidence_intervals[field] = (float(low), float(high))
+        return confidence_intervals
+
+    def compute_report(
+        self,
+        usage: Optional[Dict[str, Any]] = None,
+        num_resamples: int = 0,
+        confidence_level: float = 0.95,
+        seed: Optional[int] = None,
+    ) -> GroundedQAEvaluationReport:
+        """Compute the report of the evaluations.
+
+        Args:
+            usage (Optional[Dict[str, Any]]): Usage statistics of the report.
+            num_resamples (int): Number of bootstrap resamples of the confidence
+            intervals of the report, which are not computed if 0.
+            confidence_level (float): Confidence level of the intervals.
+            seed (Optional[int]): Seed of the bootstrap resampling.
+        """
+        report = self.__compute_reports(np.zeros(len(self), dtype=np.int64), 1)[0]
+        report.usage = usage
+        if num_resamples > 0:
+            report.confidence_intervals = self.compute_confidence_intervals(
+                num_resamples, confidence_level, seed
+            )
+        return report
+
+    def compute_group_reports(
+        self,
+        groups: Sequence[Dict[str, Any]],
+        num_resamples: int = 0,
+        confidence_level: float = 0.95,
+        seed: Optional[int] = None,
+    ) -> List[GroupReport]:
+        """Compute the report of each group of evaluations in a single pass.
+
+        Args:
+            groups (Sequence[Dict[str, Any]]): Group of each evaluation, such as the
+            values of some metadata keys of its sample.
+            num_resamples (int): Number of bootstrap resamples of the confidence
+            intervals of each group, which are not computed if 0.
+            confidence_level (float): Confidence level of the intervals.
+            seed (Optional[int]): Seed of the bootstrap resampling.
+        """
+        labels = np.array(
+            [json.dumps(group, sort_keys=True, default=str) for group in groups]
+        )
+        unique_labels, first_indices, group_indices = np.unique(
+            labels, return_index=True, return_inverse=True
+        )
+        reports = self.__compute_reports(group_indices.reshape(-1), len(unique_labels))
+        sizes = np.bincount(group_indices.reshape(-1), minlength=len(unique_labels))
+        if num_resamples > 0:
+            rng = np.random.default_rng(seed)
+            for group, report in enumerate(reports):
+                report.confidence_intervals = self[
+                    group_indices.reshape(-1) == group
+                ].compute_confidence_intervals(num_resamples, confidence_level, rng)
+        return [
+            GroupReport(
+                group=groups[first_index],
+                num_samples=int(size),
+                report=report,
+            )
+            for first_index, size, report in zip(first_indices, sizes, reports)
+        ]
+
+
+def get_metadata_value(eval_sample: EvaluationSample, key: str) -> Any:
+    """Value of a metadata key of a sample, null if it is missing.
+
+    The key can be prefixed by "metadata." and nested keys are separated by dots.
+    """
+    value: Any = eval_sample.metadata
+    for name in key.removeprefix("metadata.").split("."):
+        value = value.get(name) if isinstance(value, dict) else None
+    return value
+
+
+def get_metadata_groups(
+    eval_samples: Iterable[EvaluationSample], group_by: Sequence[str]
+) -> List[Dict[str, Any]]:
+    """Group of each sample, made of the values of the metadata keys to group by."""
+    return [
+        {
+            key.removeprefix("metadata."): get_metadata_value(eval_sample, key)
+            for key in group_by
+        }
+        for eval_sample in eval_samples
+    ]
@@ -0,0 +1,171 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from grouse.columnar import BOOTSTRAP_BATCH_SIZE, COLUMNS, EvaluationColumns
+from grouse.dtos import (
+    ComparisonReport,
+    EvaluationSample,
+    EvaluationsAndReport,
+    MetricComparison,
+)
+from grouse.grounded_qa_evaluator import GroundedQAEvaluator
+from grouse.utils import get_question_hash
+
+
+def pair_samples(
+    eval_samples_a: Sequence[EvaluationSample],
+    eval_samples_b: Sequence[EvaluationSample],
+) -> List[Tuple[EvaluationSample, EvaluationSample]]:
+    """Pair the samples of two systems answering the same question, identified by
+    its input and expected output, in the order of the samples of system A.
+    Questions answered by only one system are left out."""
+    samples_b = {
+        get_question_hash(eval_sample): eval_sample for eval_sample in eval_samples_b
+    }
+    return [
+        (eval_sample, samples_b[get_question_hash(eval_sample)])
+        for eval_sample in eval_samples_a
+        if get_question_hash(eval_sample) in samples_b
+    ]
+
+
+def sign_test_p_value(wins_a: int, wins_b: int) -> float:
+    """Two-sided p-value of the exact sign test, ties being left out."""
+    num_trials = wins_a + wins_b
+    if num_trials == 0:
+        return 1.0
+    successes = np.arange(min(wins_a, wins_b))
+    # Binomial coefficients in log space, as they overflow floats, with
+    # C(n, k + 1) = C(n, k) * (n - k) / (k + 1)
+    log_coefficients = np.concatenate(
+        [[0.0], np.cumsum(np.log(num_trials - successes) - np.log(successes + 1))]
+    )
+    log_probabilities = log_coefficients - num_trials * math.log(2)
+    return min(1.0, 2 * float(np.exp(log_probabilities).sum()))
+
+
+def bootstrap_mean_interval(
+    values: np.ndarray,
+    num_resamples: int = 10000,
+    confidence_level: float = 0.95,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the mean of values taking a few
+    distinct values, resampled as multinomial counts of the distinct values."""
+    if len(values) == 0:
+        return float("nan"), float("nan")
+    rng = rng if rng is not None else np.random.default_rng()
+    distinct_values, counts = np.unique(values, return_counts=True)
+    batch_size = max(1, BOOTSTRAP_BATCH_SIZE // len(distinct_values))
+    means = []
+    for start in range(0, num_resamples, batch_size):
+        resampled_counts = rng.multinomial(
+            len(values),
+            counts / len(values),
+            size=min(batch_size, num_resamples - start),
+        )
+        means.append(resampled_counts @ distinct_values / len(values))
+    alpha = (1 - confidence_level) / 2
+    low, high = np.quantile(np.concatenate(means), [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def compare_columns(
+    columns_a: EvaluationColumns,
+    columns_b: EvaluationColumns,
+    num_resamples: int = 10000,
+    confidence_level: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict[str, MetricComparison]:
+    """Paired comparison of each metric of the evaluations of two systems on the
+    same questions, in the same order. Questions where either system has a null or
+    failed value are left out of the comparison of a metric.
+
+    Args:
+        columns_a (EvaluationColumns): Evaluations of system A.
+        columns_b (EvaluationColumns): Evaluations of system B.
+        num_resamples (int): Number of paired bootstrap resamples.
+        confidence_level (float): Confidence level of the intervals.
+        seed (Optional[int]): Seed of the bootstrap resampling.
+    """
+    rng = np.random.default_rng(seed)
+    comparisons = {}
+    for column in COLUMNS:
+        paired = columns_a.valid(column) & columns_b.valid(column)
+        values_a = columns_a.values[column][paired]
+        values_b = columns_b.values[column][paired]
+        deltas = values_b - values_a
+        wins_a = int(np.count_nonzero(deltas < 0))
+        wins_b = int(np.count_nonzero(deltas > 0))
+        comparisons[column] = MetricComparison(
+            num_pairs=len(deltas),
+            mean_a=float(values_a.mean()) if len(deltas) else float("nan"),
+            mean_b=float(values_b.mean()) if len(deltas) else float("nan"),
+            delta=float(deltas.mean()) if len(deltas) else float("nan"),
+            confidence_interval=bootstrap_mean_interval(
+                deltas, num_resamples, confidence_level, rng
+            ),
+            wins_a=wins_a,
+            wins_b=wins_b,
+            ties=len(deltas) - wins_a - wins_b,
+            p_value=sign_test_p_value(wins_a, wins_b),
+        )
+    return comparisons
+
+
+def compare_systems(
+    evaluator: GroundedQAEvaluator,
+    eval_samples_a: Sequence[EvaluationSample],
+    eval_samples_b: Sequence[EvaluationSample],
+    num_resamples: int = 10000,
+    confidence_level: float = 0.95,
+    seed: Optional[int] = None,
+) -> Tuple[EvaluationsAndReport, EvaluationsAndReport, ComparisonReport]:
+    """Evaluate two systems on the same questions and compare them.
+
+    The samples of both systems are paired by question and interleaved, so that
+    they are evaluated in a single run of the evaluator sharing its concurrency
+    window, and the prompts of the two answers to a question are sent back to back.
+    With cache friendly prompts, the second prompt then reuses the cached prefix of
+    the first one.
+
+    Args:
+        evaluator (GroundedQAEvaluator): Evaluator of both systems.
+        eval_samples_a (Sequence[EvaluationSample]): Samples of system A.
+        eval_samples_b (Sequence[EvaluationSample]): Samples of system B.
+        num_resamples (int): Number of paired bootstrap resamples.
+        confidence_level (float): Confidence level of the intervals.
+        seed (Optional[int]): Seed of the bootstrap resampling.
+
+    Returns:
+        Tuple[EvaluationsAndReport, EvaluationsAndReport, ComparisonReport]: The
+        evaluations and report of each system on the paired questions, and their
+        comparison.
+    """
+    pairs = pair_samples(eval_samples_a, eval_samples_b)
+    if not pairs:
+        raise ValueError("No question is answered by both systems")
+    results = evaluator.evaluate(
+        [eval_sample for pair in pairs for eval_sample in pair]
+    )
+    evaluations_a = results.evaluations[::2]
+    evaluations_b = results.evaluations[1::2]
+    columns_a = EvaluationColumns.from_evaluations(evaluations_a)
+    columns_b = EvaluationColumns.from_evaluations(evaluations_b)
+    report_a = columns_a.compute_report()
+    report_b = columns_b.compute_report()
+    comparison = ComparisonReport(
+        report_a=report_a,
+        report_b=report_b,
+        metrics=compare_columns(
+            columns_a, columns_b, num_resamples, confidence_level, seed
+        ),
+        usage=results.report.usage,
+    )
+    return (
+        EvaluationsAndReport(evaluations=evaluations_a, report=report_a),
+        EvaluationsAndReport(evaluations=evaluations_b, report=report_b),
+        comparison,
+    )
@@ -0,0 +1,145 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, List, Optional
+
+import litellm
+
+# Errors showing that the provider is overloaded by our calls
+OVERLOAD_ERRORS = (litellm.RateLimitError, litellm.Timeout, asyncio.TimeoutError)
+
+
+class LimitedCall:
+    """Call made under an AdaptiveConcurrencyLimiter. Calls answered from a cache
+    should set cache_hit, so that their latency is not used to adapt the limit."""
+
+    def __init__(self):
+        self.cache_hit = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """Concurrency limiter for LLM calls following an additive increase /
+    multiplicative decrease (AIMD) policy.
+
+    The limit grows by one call per window of successful calls as long as the
+    latency stays below latency_tolerance times the lowest latency observed, and is
+    multiplied by backoff_factor when a call fails with a rate limit error or a
+    timeout.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 512,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        throughput_window: float = 30.0,
+    ):
+        """
+        Args:
+            initial_limit (int): Number of concurrent calls allowed at the start.
+            min_limit (int): Minimum number of concurrent calls.
+            max_limit (int): Maximum number of concurrent calls.
+            backoff_factor (float): Factor applied to the limit on overload errors.
+            latency_tolerance (float): Ratio between the current and the lowest
+            observed latencies above which the limit stops growing.
+            throughput_window (float): Duration in seconds over which the throughput
+            is measured.
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits should verify 1 <= min <= initial <= max")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.throughput_window = throughput_window
+
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.min_latency: Optional[float] = None
+        self.last_backoff = -math.inf
+        self.completions: Deque[float] = deque()
+        # Futures are created in the running loop, as the limiter can be used
+        # across several event loops
+        self.waiters: List[asyncio.Future[None]] = []
+
+    @property
+    def window(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def throughput(self) -> float:
+        """Number of calls completed per second over the throughput window."""
+        self.__drop_old_completions(time.monotonic())
+        return len(self.completions) / self.throughput_window
+
+    def __drop_old_completions(self, now: float) -> None:
+        while self.completions and self.completions[0] < now - self.throughput_window:
+            self.completions.popleft()
+
+    async def acquire(self) -> None:
+        while self.in_flight >= self.window:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.__wake_up_waiters()
+
+    def __wake_up_waiters(self) -> None:
+        for waiter in self.waiters[: max(0, self.window - self.in_flight)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        now = time.monotonic()
+        self.completions.append(now)
+        self.__drop_old_completions(now)
+
+        self.latency = (
+            latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+        )
+        if self.min_latency is None or self.latency < self.min_latency:
+            self.min_latency = self.latency
+        if self.latency <= self.latency_tolerance * self.min_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.__wake_up_waiters()
+
+    def on_overload(self, start: float) -> None:
+        # Calls started before the last backoff were sent with the previous limit,
+        # their errors should not reduce the limit again
+        if start < self.last_backoff:
+            return
+        self.last_backoff = time.monotonic()
+        self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+
+    @asynccontextmanager
+    async def limit_concurrency(self) -> AsyncIterator[LimitedCall]:
+        await self.acquire()
+        start = time.monotonic()
+        call = LimitedCall()
+        try:
+            yield call
+        except OVERLOAD_ERRORS:
+            self.on_overload(start)
+            raise
+        else:
+            # Cache hits would drive the lowest latency close to zero and stop the
+            # limit from growing for the rest of the run
+            if not call.cache_hit:
+                self.on_success(time.monotonic() - start)
+        finally:
+            self.release()
+
+    def __str__(self) -> str:
+        return f"window={self.window}, throughput={self.throughput:.2f} calls/s"
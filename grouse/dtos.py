@@ -1,4 +1,4 @@
-from typing import List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 from pydantic import BaseModel, Field
 from typing_extensions import override
@@ -92,6 +92,95 @@ ScorePair = Union[
     AnswerRelevancyPair, CompletenessPair, FaithfulnessPair, UsefulnessPair
 ]
 
+PAIR_MODEL_METRICS = {
+    AnswerRelevancyPair: "answer_relevancy",
+    CompletenessPair: "completeness",
+    FaithfulnessPair: "faithfulness",
+    UsefulnessPair: "usefulness",
+}
+
+
+# Usage DTOs
+class MetricRoute(BaseModel, frozen=True):
+    """Model and prompts used to evaluate a metric
+
+    Args:
+        model_name (str): Name of the evaluator model of the metric.
+        prompts_path (Optional[str]): Path to the folder containing the prompts of
+        the metric. By default, the prompts of the evaluator are used.
+    """
+
+    model_name: str
+    prompts_path: Optional[str] = None
+
+
+class MetricUsage(BaseModel):
+    """Usage statistics of the LLM calls made for one metric.
+
+    Args:
+        calls (int): Number of calls that returned a parsed score.
+        cost (float): Total cost of the calls in dollars, including the discarded
+        speculative calls.
+        speculative_calls (int): Number of calls started before knowing whether
+        their result would be needed.
+        discarded_calls (int): Number of speculative calls that completed but whose
+        result was not needed.
+        discarded_cost (float): Cost of the discarded speculative calls in dollars.
+        cancelled_calls (int): Number of speculative calls cancelled before
+        completion.
+        rate_limited_seconds (float): Total time the calls waited for the
+        requests and tokens per minute limits.
+        retries (int): Number of calls retried after a transient provider error.
+        backoff_seconds (float): Total time waited before retrying calls.
+        reused_reference_judgements (int): Number of calls where the stored
+        judgement of the expected output was reused.
+        prompt_tokens (int): Total number of prompt tokens.
+        cached_prompt_tokens (int): Number of prompt tokens read from the prompt
+        cache of the provider.
+        completion_tokens (int): Total number of generated tokens.
+        cascade_calls (int): Number of judgements first made by the cascade model.
+        escalated_calls (int): Number of judgements of the cascade model escalated
+        to the evaluator model.
+        cascade_cost (float): Cost of the calls to the cascade model in dollars.
+        model_name (Optional[str]): Name of the model evaluating the metric.
+        repaired_responses (int): Number of responses whose JSON was extracted from
+        the surrounding text or repaired before being parsed.
+        recovered_answers (int): Number of judgements of answer 2 recovered alone,
+        as the judgement of answer 1 was invalid.
+        repair_calls (int): Number of follow-up calls asking the model to correct
+        its response.
+        repair_successes (int): Number of judgements parsed after a repair call.
+        judgements (int): Number of judgements kept in the evaluations that were
+        returned by a call, without the discarded speculative calls and escalated
+        cascade judgements.
+        first_pass_failures (int): Number of these judgements whose first response
+        failed to be parsed.
+    """
+
+    calls: int = 0
+    cost: float = 0.0
+    speculative_calls: int = 0
+    discarded_calls: int = 0
+    discarded_cost: float = 0.0
+    cancelled_calls: int = 0
+    rate_limited_seconds: float = 0.0
+    retries: int = 0
+    backoff_seconds: float = 0.0
+    reused_reference_judgements: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cascade_calls: int = 0
+    escalated_calls: int = 0
+    cascade_cost: float = 0.0
+    model_name: Optional[str] = None
+    repaired_responses: int = 0
+    recovered_answers: int = 0
+    repair_calls: int = 0
+    repair_successes: int = 0
+    judgements: int = 0
+    first_pass_failures: int = 0
+
 
 # Evaluation DTOs
 class EvaluationSample(BaseModel):
@@ -105,6 +194,27 @@ class EvaluationSample(BaseModel):
     metadata: Optional[dict] = None
 
 
+class UsageEstimate(BaseModel):
+    """Estimate of the usage of the evaluator model over a dataset
+
+    Args:
+        num_samples (int): Number of samples.
+        calls (Dict[str, int]): Expected number of calls per metric.
+        prompt_tokens (Dict[str, int]): Number of prompt tokens per metric.
+        output_tokens (int): Expected number of generated tokens.
+        cost (float): Expected cost in dollars.
+        duration_seconds (float): Expected duration of the evaluation, given the
+        rate limits and the concurrency.
+    """
+
+    num_samples: int
+    calls: Dict[str, int]
+    prompt_tokens: Dict[str, int]
+    output_tokens: int
+    cost: float
+    duration_seconds: float
+
+
 class GroundedQAEvaluationReport(BaseModel):
     """Model that contains the average scores of the evaluations
 
@@ -124,6 +234,23 @@ class GroundedQAEvaluationReport(BaseModel):
         negative_rejection (float): Negative rejection rate.
         mean (float): Average of answer_relevancy, completeness, faithfulness,
         usefulness, positive_acceptance and negative_rejection.
+        usage (Optional[Dict[str, MetricUsage]]): Usage statistics of the LLM calls
+        per metric.
+        escalation_rate (Optional[float]): Share of the judgements of the cascade
+        model escalated to the evaluator model.
+        cost_saved (Optional[float]): Estimated cost saved by the cascade in dollars,
+        compared to calling the evaluator model only.
+        first_pass_parsing_success (Optional[Dict[str, float]]): Success rate of
+        parsing the JSONs of each metric before any repair call, over the
+        judgements kept in the evaluations.
+        confidence_intervals (Optional[Dict[str, Tuple[float, float]]]): Bootstrap
+        confidence interval of each of the above averages and success rates.
+        num_samples (Optional[int]): Number of evaluated samples, when only part of
+        the dataset was evaluated.
+        stopped_early (Optional[bool]): Whether the target precision was reached
+        before evaluating all samples.
+        population_size (Optional[int]): Number of samples of the dataset, when the
+        evaluated samples were drawn from it.
     """
 
     answer_relevancy: float
@@ -137,6 +264,14 @@ class GroundedQAEvaluationReport(BaseModel):
     positive_acceptance: float
     negative_rejection: float
     mean: float
+    usage: Optional[Dict[str, MetricUsage]] = None
+    escalation_rate: Optional[float] = None
+    cost_saved: Optional[float] = None
+    first_pass_parsing_success: Optional[Dict[str, float]] = None
+    confidence_intervals: Optional[Dict[str, Tuple[float, float]]] = None
+    num_samples: Optional[int] = None
+    stopped_early: Optional[bool] = None
+    population_size: Optional[int] = None
 
 
 class GroundedQAEvaluation(BaseModel):
@@ -153,11 +288,124 @@ class GroundedQAEvaluation(BaseModel):
 class EvaluationsAndReport(BaseModel):
     """
     Final output of the evaluation containing the individual evaluations and
-    the aggregated results.
+    the aggregated results. When only part of the samples were evaluated,
+    sample_indices gives the index of the sample of each evaluation.
     """
 
     evaluations: List[GroundedQAEvaluation]
     report: GroundedQAEvaluationReport
+    sample_indices: Optional[List[int]] = None
+
+
+class EvaluationDiff(BaseModel):
+    """Comparison of the evaluations of a run with those of a baseline run
+
+    Args:
+        unchanged_samples (int): Number of samples whose evaluation was reused.
+        changed_samples (int): Number of samples answering a question of the
+        baseline with another actual output or references.
+        new_samples (int): Number of samples of questions absent from the baseline.
+        removed_samples (int): Number of samples of the baseline absent from the
+        run.
+        report_deltas (Optional[Dict[str, float]]): Difference between each field
+        of the report and of the report of the baseline, if it was found.
+        score_deltas (Dict[str, float]): Average difference between the scores of
+        the changed samples and their baseline scores, for each metric.
+        improved_samples (Dict[str, int]): Number of changed samples whose score
+        increased, for each metric.
+        regressed_samples (Dict[str, int]): Number of changed samples whose score
+        decreased, for each metric.
+    """
+
+    unchanged_samples: int
+    changed_samples: int
+    new_samples: int
+    removed_samples: int
+    report_deltas: Optional[Dict[str, float]]
+    score_deltas: Dict[str, float]
+    improved_samples: Dict[str, int]
+    regressed_samples: Dict[str, int]
+
+
+class MetricComparison(BaseModel):
+    """Paired comparison of two systems on one metric
+
+    Args:
+        num_pairs (int): Number of questions where both systems have a value.
+        mean_a (float): Average of system A on these questions.
+        mean_b (float): Average of system B on these questions.
+        delta (float): Average difference between system B and system A.
+        confidence_interval (Tuple[float, float]): Paired bootstrap confidence
+        interval of the average difference.
+        wins_a (int): Number of questions where system A scored higher.
+        wins_b (int): Number of questions where system B scored higher.
+        ties (int): Number of questions where both systems scored the same.
+        p_value (float): Two-sided sign test p-value of the wins of both systems.
+    """
+
+    num_pairs: int
+    mean_a: float
+    mean_b: float
+    delta: float
+    confidence_interval: Tuple[float, float]
+    wins_a: int
+    wins_b: int
+    ties: int
+    p_value: float
+
+
+class ComparisonReport(BaseModel):
+    """Report of the comparison of two systems on the same questions
+
+    Args:
+        report_a (GroundedQAEvaluationReport): Report of system A on the paired
+        questions.
+        report_b (GroundedQAEvaluationReport): Report of system B on the paired
+        questions.
+        metrics (Dict[str, MetricComparison]): Paired comparison of each metric.
+        usage (Optional[Dict[str, MetricUsage]]): Usage statistics of the LLM calls
+        of both systems per metric.
+    """
+
+    report_a: GroundedQAEvaluationReport
+    report_b: GroundedQAEvaluationReport
+    metrics: Dict[str, MetricComparison]
+    usage: Optional[Dict[str, MetricUsage]] = None
+
+
+class GroupReport(BaseModel):
+    """Report of the evaluations of a group of samples
+
+    Args:
+        group (Dict[str, Any]): Values of the keys defining the group.
+        num_samples (int): Number of samples in the group.
+        report (GroundedQAEvaluationReport): Report of the group.
+    """
+
+    group: Dict[str, Any]
+    num_samples: int
+    report: GroundedQAEvaluationReport
+
+
+class MultiJudgeEvaluation(BaseModel):
+    """Evaluations of one sample by several judges.
+
+    Args:
+        judges (Dict[str, GroundedQAEvaluation]): Evaluation of each judge, keyed by
+        model name.
+        jury (Optional[GroundedQAEvaluation]): Aggregated evaluation of the jury.
+    """
+
+    judges: Dict[str, GroundedQAEvaluation]
+    jury: Optional[GroundedQAEvaluation] = None
+
+
+class MultiJudgeEvaluationsAndReports(BaseModel):
+    """Final output of a multi-judge evaluation, with the evaluations and report
+    of each judge and of the jury."""
+
+    judges: Dict[str, EvaluationsAndReport]
+    jury: Optional[EvaluationsAndReport] = None
 
 
 # Meta Evaluation DTOs
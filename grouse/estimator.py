@@ -0,0 +1,235 @@
+import itertools
+import os
+import re
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import litellm
+
+from grouse.dtos import EvaluationSample, UsageEstimate
+from grouse.prompts import PromptRenderer
+from grouse.register_models import RATE_LIMITERS, register_models
+
+METRICS = ("answer_relevancy", "completeness", "faithfulness", "usefulness")
+# Average number of tokens generated per call, the JSON judges both answers
+DEFAULT_OUTPUT_TOKENS = 600
+# Average latency of a call, in seconds
+DEFAULT_LATENCY = 15.0
+CHUNK_SIZE = 1000
+# Number of chunks submitted ahead of the results, per worker process
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Answers are asked to begin with this sentence when no reference answers the request
+NO_DOCUMENT_PATTERN = re.compile(r"\s*no document", re.IGNORECASE)
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+# Prompt renderer of the worker process, created once per process. Workers do not
+# build an evaluator, which would enable the LiteLLM disk cache in each process.
+_prompt_renderer: Optional[PromptRenderer] = None
+
+
+def get_expected_metrics(
+    eval_sample: EvaluationSample, speculative_metrics: Sequence[str] = ()
+) -> List[str]:
+    """Metrics expected to be called for a sample.
+
+    Whether faithfulness and usefulness are called depends on the answer relevancy
+    and usefulness judgements, which are guessed from the actual output: an answer
+    asserting that no document answers the request gets a null answer relevancy,
+    and a null usefulness unless it adds related information.
+    """
+    metrics = ["answer_relevancy", "completeness"]
+    if NO_DOCUMENT_PATTERN.match(eval_sample.actual_output):
+        metrics.append("usefulness")
+        _, _, related_information = eval_sample.actual_output.strip().partition(".")
+        if related_information.strip() or "faithfulness" in speculative_metrics:
+            metrics.append("faithfulness")
+    else:
+        metrics.append("faithfulness")
+        if "usefulness" in speculative_metrics:
+            metrics.append("usefulness")
+    return metrics
+
+
+def _init_worker(
+    model_name: str, prompts_path: Optional[str], cache_friendly_prompts: bool
+) -> None:
+    global _prompt_renderer
+    register_models()
+    _prompt_renderer = PromptRenderer(
+        model_name=model_name,
+        prompts_path=prompts_path,
+        cache_friendly_prompts=cache_friendly_prompts,
+    )
+
+
+def _count_chunk(
+    samples: List[Dict[str, Any]], speculative_metrics: Sequence[str]
+) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+    """Number of samples, and number of calls and prompt tokens per metric, of a
+    chunk of samples."""
+    assert _prompt_renderer is not None
+    calls = dict.fromkeys(METRICS, 0)
+    prompt_tokens = dict.fromkeys(METRICS, 0)
+    for obj in samples:
+        eval_sample = EvaluationSample(**obj)
+        for metric in get_expected_metrics(eval_sample, speculative_metrics):
+            prompt = _prompt_renderer.render_prompt(metric, eval_sample)
+            calls[metric] += 1
+            prompt_tokens[metric] += litellm.token_counter(
+                model=_prompt_renderer.model_name,
+                messages=_prompt_renderer.build_messages(prompt),
+            )
+    return len(samples), calls, prompt_tokens
+
+
+def _chunked(samples: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(samples)
+    while chunk := list(itertools.islice(iterator, CHUNK_SIZE)):
+        yield chunk
+
+
+def map_bounded(
+    executor: Executor,
+    function: Callable[..., Result],
+    items: Iterable[Item],
+    max_in_flight: int,
+    *args: Any,
+) -> Iterator[Result]:
+    """Map a function over items with an executor, in order, with at most
+    max_in_flight items submitted ahead of the results. Unlike Executor.map, the
+    items are pulled lazily, so they are not all held in memory at once.
+
+    Args:
+        executor (Executor): Executor running the function.
+        function (Callable[..., Result]): Function called with each item and args.
+        items (Iterable[Item]): Items to map the function over.
+        max_in_flight (int): Maximum number of items submitted and not yielded.
+        *args: Other arguments of the function.
+    """
+    futures: Deque[Future[Result]] = deque()
+    try:
+        for item in items:
+            if len(futures) >= max_in_flight:
+                yield futures.popleft().result()
+            futures.append(executor.submit(function, item, *args))
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def get_rate_limited_duration(
+    model_name: str, calls: Dict[str, int], tokens: Dict[str, int]
+) -> float:
+    """Minimum duration in seconds allowed by the rate limits registered for the
+    model, and for each of its metrics."""
+    duration = 0.0
+    scopes = [(None, sum(calls.values()), sum(tokens.values()))] + [
+        (metric, calls[metric], tokens[metric]) for metric in METRICS
+    ]
+    for metric, scope_calls, scope_tokens in scopes:
+        rate_limiter = RATE_LIMITERS.get((model_name, metric))
+        if rate_limiter is None:
+            continue
+        if rate_limiter.rpm is not None:
+            duration = max(duration, 60 * scope_calls / rate_limiter.rpm)
+        if rate_limiter.tpm is not None:
+            duration = max(duration, 60 * scope_tokens / rate_limiter.tpm)
+    return duration
+
+
+def estimate_usage(
+    samples: Iterable[Dict[str, Any]],
+    model_name: str = "gpt-4",
+    prompts_path: Optional[str] = None,
+    speculative_metrics: Sequence[str] = (),
+    cache_friendly_prompts: bool = False,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+    concurrency: int = 20,
+    latency: float = DEFAULT_LATENCY,
+    num_workers: Optional[int] = None,
+) -> UsageEstimate:
+    """Estimate the number of calls, tokens, cost and duration of the evaluation
+    of a dataset, before running it.
+
+    The prompts are rendered and their tokens counted with the tokenizer of the
+    model in worker processes, by chunks of samples read lazily, with a few chunks
+    per worker in flight.
+
+    Args:
+        samples (Iterable[Dict[str, Any]]): Raw evaluation samples, as read from
+        the dataset.
+        model_name (str): Name of the evaluator model.
+        prompts_path (Optional[str]): Path to the folder containing the prompts.
+        speculative_metrics (Sequence[str]): Metrics called speculatively.
+        cache_friendly_prompts (bool): Whether the prompts are restructured for
+        prompt caching.
+        output_tokens (int): Average number of tokens generated per call.
+        concurrency (int): Number of concurrent calls.
+        latency (float): Average latency of a call in seconds.
+        num_workers (Optional[int]): Number of worker processes, defaults to the
+        number of CPUs.
+    """
+    num_samples = 0
+    calls = dict.fromkeys(METRICS, 0)
+    prompt_tokens = dict.fromkeys(METRICS, 0)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(model_name, prompts_path, cache_friendly_prompts),
+    ) as executor:
+        for chunk_samples, chunk_calls, chunk_prompt_tokens in map_bounded(
+            executor,
+            _count_chunk,
+            _chunked(samples),
+            num_workers * CHUNKS_IN_FLIGHT_PER_WORKER,
+            speculative_metrics,
+        ):
+            num_samples += chunk_samples
+            for metric in METRICS:
+                calls[metric] += chunk_calls[metric]
+                prompt_tokens[metric] += chunk_prompt_tokens[metric]
+
+    total_calls = sum(calls.values())
+    total_prompt_tokens = sum(prompt_tokens.values())
+    prompt_cost, output_cost = litellm.cost_per_token(
+        model=model_name,
+        prompt_tokens=total_prompt_tokens,
+        completion_tokens=total_calls * output_tokens,
+    )
+    tokens = {
+        metric: prompt_tokens[metric] + calls[metric] * output_tokens
+        for metric in METRICS
+    }
+    duration = max(
+        total_calls * latency / concurrency,
+        get_rate_limited_duration(model_name, calls, tokens),
+    )
+
+    return UsageEstimate(
+        num_samples=num_samples,
+        calls=calls,
+        prompt_tokens=prompt_tokens,
+        output_tokens=total_calls * output_tokens,
+        cost=prompt_cost + output_cost,
+        duration_seconds=duration,
+    )
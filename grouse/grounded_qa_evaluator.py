@@ -1,18 +1,36 @@
 import asyncio
+import hashlib
 import json
 import logging
+import random
 import re
 import sys
-from typing import List, Optional
+from collections import defaultdict
+from contextlib import aclosing, nullcontext
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import litellm
-import numpy as np
-from importlib_resources import files
-from jinja2 import Environment, FileSystemLoader
+from diskcache import Cache
 from pydantic_core import ValidationError
 from tqdm.asyncio import tqdm
 
+from grouse.columnar import EvaluationColumns
+from grouse.concurrency import AdaptiveConcurrencyLimiter, LimitedCall
 from grouse.dtos import (
+    PAIR_MODEL_METRICS,
     AnswerRelevancy,
     AnswerRelevancyPair,
     Completeness,
@@ -24,13 +42,53 @@ from grouse.dtos import (
     FaithfulnessPair,
     GroundedQAEvaluation,
     GroundedQAEvaluationReport,
+    MetricRoute,
+    MetricUsage,
     Score,
     ScorePair,
     Usefulness,
     UsefulnessPair,
 )
+from grouse.journal import EvaluationJournal
+from grouse.json_repair import loads_tolerant
+from grouse.prompts import PromptRenderer
+from grouse.rate_limiter import TokenBucketRateLimiter
+from grouse.register_models import get_rate_limiters
+from grouse.retry import TRANSIENT_ERRORS, RetryPolicy
+from grouse.scheduler import SampleScheduler
+from grouse.sequential import SequentialStoppingRule
 from grouse.utils import get_positive_acceptance_negative_rejection
 
+SPECULATIVE_METRICS = ("faithfulness", "usefulness")
+MAX_TOKENS = 2048
+REFERENCE_JUDGEMENT_TEMPLATE = "reference_judgement.txt.jinja"
+REPAIR_TEMPLATE = "repair.txt.jinja"
+# Scores of the cascade model escalated by default, the middle of the 1 to 5 scales
+DEFAULT_BORDERLINE_SCORES: Dict[str, Sequence[int]] = {
+    "answer_relevancy": (3,),
+    "completeness": (3,),
+}
+CASCADE_TEMPERATURE = 0.7
+
+# A speculative call task along with the costs of the LLM calls it made
+SpeculativeCall = Tuple["asyncio.Task[Score | Failed]", List[float]]
+
+# Vote of the cascade model sampled by the current task, if any
+_cascade_vote: ContextVar[Optional[int]] = ContextVar("cascade_vote", default=None)
+
+# Costs of the LLM calls made by the current task, only set for speculative calls
+_speculative_costs: ContextVar[Optional[List[float]]] = ContextVar(
+    "speculative_costs", default=None
+)
+
+# Judgements returned for the sample being evaluated, along with whether their first
+# response failed to be parsed, keyed by their id. The judgements are kept in the
+# values so that their ids are not reused while the sample is evaluated.
+FirstPassFailures = Dict[int, Tuple[Score | Failed, bool]]
+_first_pass_failures: ContextVar[Optional[FirstPassFailures]] = ContextVar(
+    "first_pass_failures", default=None
+)
+
 
 class GroundedQAEvaluator:
     def __init__(
@@ -38,28 +96,161 @@ class GroundedQAEvaluator:
         model_name: str = "gpt-4",
         prompts_path: Optional[str] = None,
         cache_path: Optional[str] = None,
+        parallel_metrics: bool = False,
+        speculative_metrics: Sequence[str] = (),
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        reference_judgements_path: Optional[str] = None,
+        cache_friendly_prompts: bool = False,
+        cascade_model_name: Optional[str] = None,
+        cascade_votes: int = 1,
+        cascade_borderline_scores: Optional[Dict[str, Sequence[int]]] = None,
+        metric_routes: Optional[Dict[str, MetricRoute]] = None,
+        repair_attempts: int = 0,
     ):
+        """
+        Args:
+            model_name (str): Name of the evaluator model. It can be any LiteLLM model.
+            prompts_path (Optional[str]): Path to the folder containing the prompts of
+            the evaluator. By default, the prompts are those optimized for GPT-4.
+            cache_path (Optional[str]): Path to the LiteLLM disk cache.
+            parallel_metrics (bool): Call answer relevancy and completeness at the same
+            time instead of one after the other.
+            speculative_metrics (Sequence[str]): Metrics among faithfulness and
+            usefulness to call at the same time as answer relevancy when
+            parallel_metrics is set, before knowing whether they are needed. The
+            results that are not needed are discarded and their cost is reported
+            in the usage statistics. It requires parallel_metrics.
+            concurrency_limiter (Optional[AdaptiveConcurrencyLimiter]): Limiter
+            adapting the number of concurrent LLM calls to the provider. When set, it
+            replaces the fixed number of samples evaluated at the same time.
+            retry_policy (Optional[RetryPolicy]): Policy used to retry the calls
+            failing with transient provider errors. By default, calls are retried
+            up to 5 times. Calls still failing are scored as Failed.
+            reference_judgements_path (Optional[str]): Path to a disk store of the
+            judgements of the expected outputs (answer 1). When set, the judgement
+            of answer 1 is stored the first time a sample is evaluated for a metric,
+            and given to the evaluator in the following prompts so that it only
+            evaluates answer 2. This is useful to compare several systems on the
+            same dataset.
+            cache_friendly_prompts (bool): Put the task and the sample section of
+            each prompt at its start, followed by the metric instructions and the
+            answers, so that provider-side prompt caching applies to this prefix,
+            shared by the prompts of the other answers to the same sample. The
+            sections are only moved. Cache control hints are sent to the providers
+            that need them.
+            cascade_model_name (Optional[str]): Name of a cheaper model judging each
+            metric first. Its judgement is escalated to model_name when it fails to
+            be parsed, when its score is borderline, or when its votes disagree.
+            cascade_votes (int): Number of judgements sampled from the cascade model
+            for each metric. With more than one vote, they are sampled with a higher
+            temperature and escalated when they disagree.
+            cascade_borderline_scores (Optional[Dict[str, Sequence[int]]]): Scores
+            of the cascade model escalated for each metric. By default, the middle
+            score of answer relevancy and completeness.
+            metric_routes (Optional[Dict[str, MetricRoute]]): Model and prompts path
+            of the metrics that are not evaluated with model_name and prompts_path.
+            Each route tracks its own cost, and has its own LiteLLM and reference
+            judgement cache entries.
+            repair_attempts (int): Number of follow-up turns asking the model to
+            correct a response that can not be parsed or validated, giving it the
+            error and the JSON schema of the judgement, before scoring it as Failed.
+        """
+        if speculative_metrics and not parallel_metrics:
+            raise ValueError("Speculative metrics require parallel_metrics")
+        for metric in speculative_metrics:
+            if metric not in SPECULATIVE_METRICS:
+                raise ValueError(
+                    f"Speculative metric should be one of {SPECULATIVE_METRICS}, "
+                    f"got {metric}"
+                )
         self.model_name = model_name
-        if prompts_path is None:
-            self.environment = Environment(
-                loader=FileSystemLoader(files("grouse").joinpath("gpt4_prompts"))
-            )
-        else:
-            self.environment = Environment(loader=FileSystemLoader(prompts_path))
+        self.prompts_path = prompts_path
+        self.cache_friendly_prompts = cache_friendly_prompts
+        self.parallel_metrics = parallel_metrics
+        self.speculative_metrics = tuple(speculative_metrics)
+        self.concurrency_limiter = concurrency_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.prompt_renderer = PromptRenderer(
+            model_name, prompts_path, cache_friendly_prompts
+        )
+        self.reference_judgements = (
+            Cache(reference_judgements_path)
+            if reference_judgements_path is not None
+            else None
+        )
 
         self.logger = logging.getLogger("LLM Call Tracker")
         self.logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        # The logger is shared by all evaluators, its handler is only added once
+        if not self.logger.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setLevel(logging.INFO)
+            formatter = logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+            )
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
 
-        litellm.enable_cache("disk", cache_path)
+        litellm.enable_cache("disk", disk_cache_dir=cache_path)
+
+        self.repair_attempts = repair_attempts
+        self.cascade_votes = cascade_votes
+        self.cascade_borderline_scores = (
+            cascade_borderline_scores
+            if cascade_borderline_scores is not None
+            else DEFAULT_BORDERLINE_SCORES
+        )
+        self.cascade_evaluator = (
+            GroundedQAEvaluator(
+                model_name=cascade_model_name,
+                prompts_path=prompts_path,
+                cache_path=cache_path,
+                concurrency_limiter=concurrency_limiter,
+                retry_policy=self.retry_policy,
+                reference_judgements_path=reference_judgements_path,
+                cache_friendly_prompts=cache_friendly_prompts,
+                repair_attempts=repair_attempts,
+            )
+            if cascade_model_name is not None
+            else None
+        )
 
         self.cost = 0
+        self.usage: Dict[str, MetricUsage] = defaultdict(MetricUsage)
+
+        route_kwargs = dict(
+            cache_path=cache_path,
+            concurrency_limiter=concurrency_limiter,
+            retry_policy=self.retry_policy,
+            reference_judgements_path=reference_judgements_path,
+            cache_friendly_prompts=cache_friendly_prompts,
+            cascade_model_name=cascade_model_name,
+            cascade_votes=cascade_votes,
+            cascade_borderline_scores=cascade_borderline_scores,
+            repair_attempts=repair_attempts,
+        )
+        self.metric_routes: Dict[str, GroundedQAEvaluator] = {}
+        routes: Dict[MetricRoute, GroundedQAEvaluator] = {}
+        for metric, metric_route in (metric_routes or {}).items():
+            if metric not in PAIR_MODEL_METRICS.values():
+                raise ValueError(
+                    f"Routed metric should be one of "
+                    f"{tuple(PAIR_MODEL_METRICS.values())}, got {metric}"
+                )
+            if metric_route not in routes:
+                routes[metric_route] = GroundedQAEvaluator(
+                    model_name=metric_route.model_name,
+                    prompts_path=(
+                        metric_route.prompts_path
+                        if metric_route.prompts_path is not None
+                        else prompts_path
+                    ),
+                    **route_kwargs,
+                )
+                # Usage statistics are tracked per metric, hence per route
+                routes[metric_route].usage = self.usage
+            self.metric_routes[metric] = routes[metric_route]
 
     @staticmethod
     def postprocess_response(response_str: str) -> str:
@@ -71,100 +262,509 @@ class GroundedQAEvaluator:
         else:
             return response_str.strip()
 
-    async def call_llm(self, prompt: str, pair_model: ScorePair) -> Score | Failed:
-        try:
-            if "o1" in self.model_name:
-                kwargs = {}
-            else:
-                kwargs = {"temperature": 0.01, "max_tokens": 2048}
-            if "-turbo" in self.model_name or "4o" in self.model_name:
-                response = await litellm.acompletion(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"},
-                    **kwargs,
-                )
-            else:
-                response = await litellm.acompletion(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    **kwargs,
+    def __limit_concurrency(self) -> AsyncContextManager[LimitedCall]:
+        if self.concurrency_limiter is None:
+            return nullcontext(LimitedCall())
+        return self.concurrency_limiter.limit_concurrency()
+
+    def record_cost(self, pair_model: ScorePair, cost: float) -> None:
+        usage = self.usage[PAIR_MODEL_METRICS[pair_model]]
+        usage.calls += 1
+        usage.cost += cost
+        self.cost += cost
+        speculative_costs = _speculative_costs.get()
+        if speculative_costs is not None:
+            speculative_costs.append(cost)
+
+    async def __wait_for_rate_limits(
+        self, metric: str, messages: List[Dict[str, str]]
+    ) -> Tuple[List[TokenBucketRateLimiter], int]:
+        rate_limiters = get_rate_limiters(self.model_name, metric)
+        if not rate_limiters:
+            return rate_limiters, 0
+        tokens = litellm.token_counter(model=self.model_name, messages=messages)
+        tokens += MAX_TOKENS
+        waited = await asyncio.gather(
+            *[rate_limiter.acquire(tokens) for rate_limiter in rate_limiters]
+        )
+        self.usage[metric].rate_limited_seconds += max(waited)
+        return rate_limiters, tokens
+
+    def completion_kwargs(self) -> Dict[str, Any]:
+        if "o1" in self.model_name:
+            kwargs: Dict[str, Any] = {}
+        else:
+            kwargs = {"temperature": 0.01, "max_tokens": MAX_TOKENS}
+        if "-turbo" in self.model_name or "4o" in self.model_name:
+            kwargs["response_format"] = {"type": "json_object"}
+        vote = _cascade_vote.get()
+        if vote is not None:
+            # Votes are sampled with distinct seeds so that they are cached apart
+            kwargs.update(temperature=CASCADE_TEMPERATURE, seed=vote, drop_params=True)
+        return kwargs
+
+    async def complete(
+        self, metric: str, messages: List[Dict[str, str]]
+    ) -> litellm.ModelResponse:
+        kwargs = self.completion_kwargs()
+        attempt = 0
+        while True:
+            rate_limiters, reserved_tokens = await self.__wait_for_rate_limits(
+                metric, messages
+            )
+            try:
+                async with self.__limit_concurrency() as call:
+                    response = await litellm.acompletion(
+                        model=self.model_name, messages=messages, **kwargs
+                    )
+                    call.cache_hit = bool(
+                        (getattr(response, "_hidden_params", None) or {}).get(
+                            "cache_hit"
+                        )
+                    )
+                break
+            except TRANSIENT_ERRORS as error:
+                if not self.retry_policy.can_retry(attempt):
+                    raise
+                delay = self.retry_policy.get_delay(attempt, error)
+                logging.debug(
+                    f"Call to {self.model_name} failed with {error!r}, "
+                    f"retrying in {delay:.1f}s"
                 )
-            postprocessed_response = self.postprocess_response(
-                response.choices[0].message.content
+                self.usage[metric].retries += 1
+                self.usage[metric].backoff_seconds += delay
+                await asyncio.sleep(delay)
+                attempt += 1
+        if rate_limiters and getattr(response, "usage", None) is not None:
+            for rate_limiter in rate_limiters:
+                rate_limiter.refund(reserved_tokens - response.usage.total_tokens)
+        return response
+
+    def __get_reference_judgement_key(
+        self, metric: str, eval_sample: EvaluationSample
+    ) -> str:
+        content = json.dumps(
+            [
+                self.model_name,
+                self.prompts_path,
+                metric,
+                eval_sample.input,
+                eval_sample.expected_output,
+                eval_sample.references,
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def __render_reference_judgement(self, answer_1: Dict[str, Any]) -> str:
+        template = self.prompt_renderer.get_template(REFERENCE_JUDGEMENT_TEMPLATE)
+        return template.render(answer_1=json.dumps(answer_1, indent=4))
+
+    def build_messages(self, prompt: str) -> List[Dict[str, Any]]:
+        return self.prompt_renderer.build_messages(prompt)
+
+    def record_tokens(self, metric: str, response: litellm.ModelResponse) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        self.usage[metric].prompt_tokens += usage.prompt_tokens
+        self.usage[metric].completion_tokens += usage.completion_tokens
+        self.usage[metric].cached_prompt_tokens += cached_tokens
+        if usage.prompt_tokens:
+            logging.debug(
+                f"Call to {self.model_name} for {metric}: "
+                f"{cached_tokens / usage.prompt_tokens:.0%} of "
+                f"{usage.prompt_tokens} prompt tokens cached"
             )
-            loaded_response = json.loads(postprocessed_response)
-            if isinstance(loaded_response, dict):
-                pair = pair_model(**loaded_response)
-                self.cost += litellm.completion_cost(response, model=self.model_name)
-                return pair.answer_2
-            else:
-                raise ValueError("Response is not a dictionary")
 
-        except (ValidationError, json.decoder.JSONDecodeError, ValueError) as val_error:
+    async def call_llm(
+        self,
+        prompt: str,
+        pair_model: ScorePair,
+        eval_sample: Optional[EvaluationSample] = None,
+    ) -> Score | Failed:
+        if self.cascade_evaluator is not None:
+            return await self.__call_cascade(prompt, pair_model, eval_sample)
+        return await self.__call_model(prompt, pair_model, eval_sample)
+
+    async def __call_cascade_vote(
+        self,
+        vote: int,
+        prompt: str,
+        pair_model: ScorePair,
+        eval_sample: Optional[EvaluationSample],
+    ) -> Score | Failed:
+        assert self.cascade_evaluator is not None
+        _cascade_vote.set(vote)
+        return await self.cascade_evaluator.call_llm(prompt, pair_model, eval_sample)
+
+    async def __call_cascade(
+        self,
+        prompt: str,
+        pair_model: ScorePair,
+        eval_sample: Optional[EvaluationSample],
+    ) -> Score | Failed:
+        assert self.cascade_evaluator is not None
+        metric = PAIR_MODEL_METRICS[pair_model]
+        if self.cascade_votes == 1:
+            scores = [
+                await self.cascade_evaluator.call_llm(prompt, pair_model, eval_sample)
+            ]
+        else:
+            scores = await asyncio.gather(
+                *[
+                    self.__call_cascade_vote(vote, prompt, pair_model, eval_sample)
+                    for vote in range(self.cascade_votes)
+                ]
+            )
+        self.usage[metric].cascade_calls += 1
+        if not self.__needs_escalation(metric, scores):
+            return scores[0]
+        self.usage[metric].escalated_calls += 1
+        return await self.__call_model(prompt, pair_model, eval_sample)
+
+    def __needs_escalation(self, metric: str, scores: List[Score | Failed]) -> bool:
+        if any(isinstance(score, Failed) for score in scores):
+            return True
+        values = {getattr(score, metric) for score in scores}
+        return len(values) > 1 or values.pop() in self.cascade_borderline_scores.get(
+            metric, ()
+        )
+
+    async def __call_model(
+        self,
+        prompt: str,
+        pair_model: ScorePair,
+        eval_sample: Optional[EvaluationSample] = None,
+    ) -> Score | Failed:
+        metric = PAIR_MODEL_METRICS[pair_model]
+        reference_judgement_key = None
+        reference_judgement = None
+        if self.reference_judgements is not None and eval_sample is not None:
+            reference_judgement_key = self.__get_reference_judgement_key(
+                metric, eval_sample
+            )
+            reference_judgement = self.reference_judgements.get(reference_judgement_key)
+            if reference_judgement is not None:
+                prompt += self.__render_reference_judgement(reference_judgement)
+        try:
+            messages = self.build_messages(prompt)
+            response = await self.complete(metric, messages)
+            cost = 0.0
+            try:
+                for repair_attempt in range(self.repair_attempts + 1):
+                    self.record_tokens(metric, response)
+                    cost += litellm.completion_cost(response, model=self.model_name)
+                    try:
+                        answer_2 = self.__parse_response(
+                            response,
+                            pair_model,
+                            reference_judgement_key,
+                            reference_judgement,
+                        )
+                    except (ValidationError, ValueError) as error:
+                        if repair_attempt == self.repair_attempts:
+                            raise
+                        messages = messages + self.__build_repair_messages(
+                            response, pair_model, error
+                        )
+                        self.usage[metric].repair_calls += 1
+                        response = await self.complete(metric, messages)
+                        continue
+                    if repair_attempt > 0:
+                        self.usage[metric].repair_successes += 1
+                    self.__record_first_pass(answer_2, repair_attempt > 0)
+                    return answer_2
+            finally:
+                # The calls are paid for even when their responses are not parsed
+                self.record_cost(pair_model, cost)
+
+        except (
+            ValidationError,
+            json.decoder.JSONDecodeError,
+            ValueError,
+            *TRANSIENT_ERRORS,
+        ) as val_error:
             logging.debug(
                 f"Call to {self.model_name} with prompt: {prompt}\n"
                 f"returned the following error:\n{val_error}"
             )
-            return Failed(error=str(val_error))
+            failed = Failed(error=str(val_error))
+            self.__record_first_pass(failed, True)
+            return failed
+
+    @staticmethod
+    def __record_first_pass(judgement: Score | Failed, failed: bool) -> None:
+        first_pass_failures = _first_pass_failures.get()
+        if first_pass_failures is not None:
+            first_pass_failures[id(judgement)] = (judgement, failed)
+
+    def __record_first_pass_parsing(
+        self, evaluation: GroundedQAEvaluation, first_pass_failures: FirstPassFailures
+    ) -> None:
+        """Count the judgements kept in the evaluation that were returned by a call,
+        leaving out the discarded speculative calls, the escalated cascade
+        judgements and the judgements deduced from another metric."""
+        for metric in PAIR_MODEL_METRICS.values():
+            judgement = getattr(evaluation, metric)
+            judgement_failures = first_pass_failures.get(id(judgement))
+            if judgement_failures is None or judgement_failures[0] is not judgement:
+                continue
+            _, failed = judgement_failures
+            usage = self.usage[metric]
+            usage.judgements += 1
+            usage.first_pass_failures += failed
+
+    def __parse_response(
+        self,
+        response: litellm.ModelResponse,
+        pair_model: ScorePair,
+        reference_judgement_key: Optional[str],
+        reference_judgement: Optional[Dict[str, Any]],
+    ) -> Score:
+        metric = PAIR_MODEL_METRICS[pair_model]
+        postprocessed_response = self.postprocess_response(
+            response.choices[0].message.content
+        )
+        loaded_response, repaired = loads_tolerant(postprocessed_response)
+        if not isinstance(loaded_response, dict):
+            raise ValueError("Response is not a dictionary")
+        if repaired:
+            self.usage[metric].repaired_responses += 1
+        if reference_judgement is not None:
+            loaded_response["answer_1"] = reference_judgement
+        try:
+            answer_2 = pair_model(**loaded_response).answer_2
+        except ValidationError:
+            answer_2 = self.__recover_answer_2(pair_model, loaded_response)
+        else:
+            # A repaired judgement of answer 1 may have been cut
+            if (
+                reference_judgement_key is not None
+                and reference_judgement is None
+                and not repaired
+            ):
+                self.reference_judgements[reference_judgement_key] = loaded_response[
+                    "answer_1"
+                ]
+        if reference_judgement is not None:
+            self.usage[metric].reused_reference_judgements += 1
+        return answer_2
+
+    def __build_repair_messages(
+        self,
+        response: litellm.ModelResponse,
+        pair_model: ScorePair,
+        error: Exception,
+    ) -> List[Dict[str, Any]]:
+        """Follow-up turn asking the model to correct its response, given the error
+        and the expected JSON schema."""
+        template = self.prompt_renderer.get_template(REPAIR_TEMPLATE)
+        return [
+            {"role": "assistant", "content": response.choices[0].message.content},
+            {
+                "role": "user",
+                "content": template.render(
+                    error=str(error),
+                    schema=json.dumps(pair_model.model_json_schema(), indent=4),
+                ),
+            },
+        ]
+
+    def __recover_answer_2(
+        self, pair_model: ScorePair, loaded_response: Dict[str, Any]
+    ) -> Score:
+        """Validate the judgement of answer 2 alone, when the judgement of answer 1
+        is invalid or was cut."""
+        answer_model = pair_model.model_fields["answer_2"].annotation
+        try:
+            answer_2 = answer_model(**loaded_response.get("answer_2", {}))
+        except (ValidationError, TypeError):
+            # Raise the validation error of the whole pair
+            pair_model(**loaded_response)
+            raise
+        self.usage[PAIR_MODEL_METRICS[pair_model]].recovered_answers += 1
+        return answer_2
+
+    def render_prompt(self, metric: str, eval_sample: EvaluationSample) -> str:
+        return self.prompt_renderer.render_prompt(metric, eval_sample)
+
+    def get_route(self, metric: str) -> "GroundedQAEvaluator":
+        """Evaluator rendering the prompts and calling the model of a metric."""
+        return self.metric_routes.get(metric, self)
+
+    def get_config_hash(self) -> str:
+        """Stable hash of the configuration determining the judgements of the
+        evaluator: its model and prompts, and those of its cascade model and metric
+        routes. Evaluations recorded with another configuration are not reused."""
+        config = {
+            "model_name": self.model_name,
+            "prompts_path": self.prompts_path,
+            "cache_friendly_prompts": self.cache_friendly_prompts,
+            "cascade": (
+                {
+                    "model_name": self.cascade_evaluator.model_name,
+                    "votes": self.cascade_votes,
+                    "borderline_scores": {
+                        metric: list(scores)
+                        for metric, scores in self.cascade_borderline_scores.items()
+                    },
+                }
+                if self.cascade_evaluator is not None
+                else None
+            ),
+            "metric_routes": {
+                metric: route.get_config_hash()
+                for metric, route in self.metric_routes.items()
+            },
+        }
+        content = json.dumps(config, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get_total_cost(self) -> float:
+        """Cost of the calls of the evaluator, of its metric routes and of their
+        cascade models, counting each evaluator once."""
+        evaluators = dict.fromkeys([self, *self.metric_routes.values()])
+        cascade_evaluators = [
+            evaluator.cascade_evaluator
+            for evaluator in evaluators
+            if evaluator.cascade_evaluator is not None
+        ]
+        return sum(
+            evaluator.cost
+            for evaluator in dict.fromkeys([*evaluators, *cascade_evaluators])
+        )
 
     async def evaluate_answer_relevancy(
         self, eval_sample: EvaluationSample
     ) -> AnswerRelevancy | Failed:
-        template = self.environment.get_template("answer_relevancy.txt.jinja")
-        prompt = template.render(
-            input=eval_sample.input,
-            actual_output=eval_sample.actual_output,
-            expected_output=eval_sample.expected_output,
-        )
-        return await self.call_llm(prompt, AnswerRelevancyPair)
+        route = self.get_route("answer_relevancy")
+        prompt = route.render_prompt("answer_relevancy", eval_sample)
+        return await route.call_llm(prompt, AnswerRelevancyPair, eval_sample)
 
     async def evaluate_completeness(
         self, eval_sample: EvaluationSample
     ) -> Completeness | Failed:
-        template = self.environment.get_template("completeness.txt.jinja")
-        prompt = template.render(
-            input=eval_sample.input,
-            actual_output=eval_sample.actual_output,
-            expected_output=eval_sample.expected_output,
-            contexts=eval_sample.references,
-        )
-        return await self.call_llm(prompt, CompletenessPair)
+        route = self.get_route("completeness")
+        prompt = route.render_prompt("completeness", eval_sample)
+        return await route.call_llm(prompt, CompletenessPair, eval_sample)
 
     async def evaluate_faithfulness(
         self, eval_sample: EvaluationSample
     ) -> Faithfulness | Failed:
-        template = self.environment.get_template("faithfulness.txt.jinja")
-        prompt = template.render(
-            actual_output=eval_sample.actual_output,
-            expected_output=eval_sample.expected_output,
-            contexts=eval_sample.references,
-        )
-        return await self.call_llm(prompt, FaithfulnessPair)
+        route = self.get_route("faithfulness")
+        prompt = route.render_prompt("faithfulness", eval_sample)
+        return await route.call_llm(prompt, FaithfulnessPair, eval_sample)
 
     async def evaluate_usefulness(
         self, eval_sample: EvaluationSample
     ) -> Usefulness | Failed:
-        template = self.environment.get_template("usefulness.txt.jinja")
-        prompt = template.render(
-            input=eval_sample.input,
-            actual_output=eval_sample.actual_output,
-            expected_output=eval_sample.expected_output,
+        route = self.get_route("usefulness")
+        prompt = route.render_prompt("usefulness", eval_sample)
+        return await route.call_llm(prompt, UsefulnessPair, eval_sample)
+
+    def __start_speculative_call(
+        self, metric: str, eval_sample: EvaluationSample
+    ) -> SpeculativeCall:
+        costs: List[float] = []
+        # The evaluation is started along with the task, which runs it in its own
+        # context
+        evaluation = getattr(self, f"evaluate_{metric}")(eval_sample)
+
+        async def speculative_call() -> Score | Failed:
+            _speculative_costs.set(costs)
+            return await evaluation
+
+        self.usage[metric].speculative_calls += 1
+        return asyncio.create_task(speculative_call()), costs
+
+    def __discard_speculative_calls(
+        self, speculative_calls: Dict[str, SpeculativeCall]
+    ) -> None:
+        for metric, (task, costs) in speculative_calls.items():
+            usage = self.usage[metric]
+            if task.done() and not task.cancelled():
+                # Retrieve the exception, if any, so that it is not logged by asyncio
+                task.exception()
+                usage.discarded_calls += 1
+                usage.discarded_cost += sum(costs)
+            else:
+                task.cancel()
+                usage.cancelled_calls += 1
+
+    async def __evaluate_single_sample_in_parallel(
+        self, eval_sample: EvaluationSample
+    ) -> GroundedQAEvaluation:
+        speculative_calls = {
+            metric: self.__start_speculative_call(metric, eval_sample)
+            for metric in self.speculative_metrics
+        }
+
+        async def evaluate_metric(metric: str) -> Score | Failed:
+            if metric in speculative_calls:
+                task, _ = speculative_calls.pop(metric)
+                return await task
+            return await getattr(self, f"evaluate_{metric}")(eval_sample)
+
+        try:
+            answer_relevancy, completeness = await asyncio.gather(
+                self.evaluate_answer_relevancy(eval_sample),
+                self.evaluate_completeness(eval_sample),
+            )
+            usefulness, faithfulness = await self.__evaluate_dependent_metrics(
+                answer_relevancy, evaluate_metric
+            )
+        finally:
+            self.__discard_speculative_calls(speculative_calls)
+
+        return self.__build_evaluation(
+            answer_relevancy, completeness, faithfulness, usefulness
         )
-        return await self.call_llm(prompt, UsefulnessPair)
 
     async def evaluate_single_sample(
         self, eval_sample: EvaluationSample
     ) -> GroundedQAEvaluation:
+        first_pass_failures: FirstPassFailures = {}
+        token = _first_pass_failures.set(first_pass_failures)
+        try:
+            evaluation = await self.__evaluate_single_sample(eval_sample)
+        finally:
+            _first_pass_failures.reset(token)
+        self.__record_first_pass_parsing(evaluation, first_pass_failures)
+        return evaluation
+
+    async def __evaluate_single_sample(
+        self, eval_sample: EvaluationSample
+    ) -> GroundedQAEvaluation:
+        if self.parallel_metrics:
+            return await self.__evaluate_single_sample_in_parallel(eval_sample)
+
         answer_relevancy = await self.evaluate_answer_relevancy(eval_sample)
         completeness = await self.evaluate_completeness(eval_sample)
 
+        async def evaluate_metric(metric: str) -> Score | Failed:
+            return await getattr(self, f"evaluate_{metric}")(eval_sample)
+
+        usefulness, faithfulness = await self.__evaluate_dependent_metrics(
+            answer_relevancy, evaluate_metric
+        )
+        return self.__build_evaluation(
+            answer_relevancy, completeness, faithfulness, usefulness
+        )
+
+    @staticmethod
+    async def __evaluate_dependent_metrics(
+        answer_relevancy: AnswerRelevancy | Failed,
+        evaluate_metric: Callable[[str], Awaitable[Score | Failed]],
+    ) -> Tuple[Usefulness | Failed, Faithfulness | Failed]:
         if isinstance(answer_relevancy, Failed):
             usefulness = Failed(error="answer_relevancy failed")
             faithfulness = Failed(error="answer_relevancy failed")
         else:
             if answer_relevancy.answer_relevancy is None:
-                usefulness = await self.evaluate_usefulness(eval_sample)
+                usefulness = await evaluate_metric("usefulness")
                 if isinstance(usefulness, Failed):
                     faithfulness = Failed(error="usefulness failed")
                 elif usefulness.usefulness is None:
@@ -172,11 +772,19 @@ class GroundedQAEvaluator:
                         faithfulness_justification="", faithfulness=None
                     )
                 else:
-                    faithfulness = await self.evaluate_faithfulness(eval_sample)
+                    faithfulness = await evaluate_metric("faithfulness")
             else:
                 usefulness = Usefulness(usefulness_justification="", usefulness=None)
-                faithfulness = await self.evaluate_faithfulness(eval_sample)
+                faithfulness = await evaluate_metric("faithfulness")
+        return usefulness, faithfulness
 
+    @staticmethod
+    def __build_evaluation(
+        answer_relevancy: AnswerRelevancy | Failed,
+        completeness: Completeness | Failed,
+        faithfulness: Faithfulness | Failed,
+        usefulness: Usefulness | Failed,
+    ) -> GroundedQAEvaluation:
         positive_acceptance, negative_rejection = (
             get_positive_acceptance_negative_rejection(answer_relevancy, completeness)
         )
@@ -190,105 +798,311 @@ class GroundedQAEvaluator:
             negative_rejection=negative_rejection,
         )
 
-    async def __evaluate_sample_with_semaphore(
-        self, sample: EvaluationSample, semaphore: asyncio.Semaphore
-    ):
-        async with semaphore:
-            return await self.evaluate_single_sample(sample)
+    async def __evaluate_journaled_sample(
+        self, eval_sample: EvaluationSample, journal: Optional[EvaluationJournal]
+    ) -> GroundedQAEvaluation:
+        evaluation = journal.get(eval_sample) if journal is not None else None
+        if evaluation is None:
+            evaluation = await self.evaluate_single_sample(eval_sample)
+            if journal is not None:
+                journal.record(eval_sample, evaluation)
+        return evaluation
+
+    async def aiter_evaluate(
+        self,
+        eval_samples: Iterable[EvaluationSample],
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+    ) -> AsyncIterator[Tuple[int, GroundedQAEvaluation]]:
+        """Evaluate samples and yield each evaluation as soon as it is completed,
+        along with the index of its sample.
+
+        Samples are evaluated by the workers of a SampleScheduler, pulling them
+        from eval_samples through a bounded queue, so the memory used does not
+        grow with the number of samples. At most semaphore_size samples are
+        evaluated at the same time, or the current window of the concurrency
+        limiter of the evaluator if it has one.
+
+        If a journal is given, each evaluation is recorded in it before being yielded
+        and the samples already present in the journal are not evaluated again.
+        """
+        scheduler: SampleScheduler[EvaluationSample, GroundedQAEvaluation] = (
+            SampleScheduler(
+                lambda eval_sample: self.__evaluate_journaled_sample(
+                    eval_sample, journal
+                ),
+                num_workers=semaphore_size,
+                concurrency_limiter=self.concurrency_limiter,
+            )
+        )
+        evaluations = scheduler.aiter(eval_samples)
+        async with aclosing(evaluations):
+            async for index, evaluation in evaluations:
+                yield index, evaluation
 
     async def async_evaluate_multiple_samples(
-        self, eval_samples: List[EvaluationSample], semaphore_size: int = 20
+        self,
+        eval_samples: List[EvaluationSample],
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
     ) -> List[GroundedQAEvaluation]:
-        semaphore = asyncio.Semaphore(semaphore_size)
-        evaluation_coroutines = [
-            asyncio.create_task(
-                self.__evaluate_sample_with_semaphore(eval_sample, semaphore)
-            )
-            for eval_sample in eval_samples
-        ]
-        evaluations = await tqdm.gather(*evaluation_coroutines)
+        evaluations: List[GroundedQAEvaluation] = [None] * len(eval_samples)
+        with tqdm(total=len(eval_samples)) as progress_bar:
+            async for index, evaluation in self.aiter_evaluate(
+                eval_samples, semaphore_size, journal
+            ):
+                evaluations[index] = evaluation
+                self.update_progress_bar(progress_bar)
         return evaluations
 
-    def evaluate_multiple_samples(
-        self, eval_samples: List[EvaluationSample], semaphore_size: int = 20
-    ) -> List[GroundedQAEvaluation]:
-        results = asyncio.run(
-            self.async_evaluate_multiple_samples(eval_samples, semaphore_size)
+    async def aiter_evaluate_until_precision(
+        self,
+        eval_samples: Sequence[EvaluationSample],
+        stopping_rule: SequentialStoppingRule,
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+        seed: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, GroundedQAEvaluation]]:
+        """Evaluate samples in a random order and yield each evaluation as soon as it
+        is completed, along with the index of its sample, until the stopping rule is
+        reached. No sample is started afterwards and the evaluations still running
+        are cancelled.
+
+        Args:
+            eval_samples (Sequence[EvaluationSample]): Samples to evaluate.
+            stopping_rule (SequentialStoppingRule): Rule updated with each
+            evaluation.
+            semaphore_size (int): Number of samples evaluated at the same time.
+            journal (Optional[EvaluationJournal]): Journal of the evaluations.
+            seed (Optional[int]): Seed of the random order of the samples.
+        """
+        order = list(range(len(eval_samples)))
+        random.Random(seed).shuffle(order)
+        evaluations = self.aiter_evaluate(
+            (eval_samples[index] for index in order), semaphore_size, journal
         )
-        self.logger.info(f"Cost: {self.cost:.4f}$")
-        return results
+        async with aclosing(evaluations):
+            async for position, evaluation in evaluations:
+                stopping_rule.update(evaluation)
+                yield order[position], evaluation
+                if stopping_rule.is_reached():
+                    return
 
-    def evaluate(
-        self, eval_samples: List[EvaluationSample], semaphore_size: int = 20
+    async def async_evaluate_until_precision(
+        self,
+        eval_samples: Sequence[EvaluationSample],
+        stopping_rule: SequentialStoppingRule,
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+        seed: Optional[int] = None,
+    ) -> Dict[int, GroundedQAEvaluation]:
+        evaluations: Dict[int, GroundedQAEvaluation] = {}
+        with tqdm(total=len(eval_samples)) as progress_bar:
+            async for index, evaluation in self.aiter_evaluate_until_precision(
+                eval_samples, stopping_rule, semaphore_size, journal, seed
+            ):
+                evaluations[index] = evaluation
+                progress_bar.set_postfix_str(str(stopping_rule), refresh=False)
+                progress_bar.update()
+        return evaluations
+
+    def evaluate_until_precision(
+        self,
+        eval_samples: Sequence[EvaluationSample],
+        stopping_rule: SequentialStoppingRule,
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+        seed: Optional[int] = None,
     ) -> EvaluationsAndReport:
-        evaluations = self.evaluate_multiple_samples(eval_samples, semaphore_size)
-        ar_mean = np.mean(
-            [
-                e.answer_relevancy.answer_relevancy
-                for e in evaluations
-                if bool(e.answer_relevancy)
-                and e.answer_relevancy.answer_relevancy is not None
-            ]
-        )
-        ar_parsing_success = np.mean(
-            [int(e.answer_relevancy is not None) for e in evaluations]
-        )
-        c_mean = np.mean(
-            [
-                e.completeness.completeness
-                for e in evaluations
-                if bool(e.completeness) and e.completeness.completeness is not None
-            ]
-        )
-        c_parsing_success = np.mean(
-            [int(e.completeness is not None) for e in evaluations]
-        )
-        f_mean = np.mean(
-            [
-                e.faithfulness.faithfulness
-                for e in evaluations
-                if bool(e.faithfulness) and e.faithfulness.faithfulness is not None
-            ]
-        )
-        f_parsing_success = np.mean(
-            [int(e.faithfulness is not None) for e in evaluations]
-        )
-        u_mean = np.mean(
-            [
-                e.usefulness.usefulness
-                for e in evaluations
-                if bool(e.usefulness) and e.usefulness.usefulness is not None
-            ]
+        """Evaluate samples in a random order until the stopping rule is reached.
+        The evaluations are returned in the order of the samples, along with the
+        indices of the evaluated samples."""
+        evaluations = asyncio.run(
+            self.async_evaluate_until_precision(
+                eval_samples, stopping_rule, semaphore_size, journal, seed
+            )
         )
-        u_parsing_success = np.mean(
-            [int(e.usefulness is not None) for e in evaluations]
+        self.log_usage()
+        sample_indices = sorted(evaluations)
+        report = self.compute_report([evaluations[index] for index in sample_indices])
+        report.num_samples = len(sample_indices)
+        report.stopped_early = len(sample_indices) < len(eval_samples)
+        return EvaluationsAndReport(
+            evaluations=[evaluations[index] for index in sample_indices],
+            report=report,
+            sample_indices=sample_indices,
         )
-        pa_mean = np.mean(
-            [
-                e.positive_acceptance
-                for e in evaluations
-                if isinstance(e.positive_acceptance, int)
+
+    def update_progress_bar(self, progress_bar: tqdm) -> None:
+        if self.concurrency_limiter is not None:
+            progress_bar.set_postfix_str(str(self.concurrency_limiter), refresh=False)
+        progress_bar.update()
+
+    def log_usage(self) -> None:
+        self.logger.info(f"Cost: {self.get_total_cost():.4f}$")
+        for route in dict.fromkeys(self.metric_routes.values()):
+            metrics = [
+                metric
+                for metric, metric_route in self.metric_routes.items()
+                if metric_route is route
             ]
+            self.logger.info(
+                f"Cost of {route.model_name} on {', '.join(metrics)}: "
+                f"{route.cost:.4f}$"
+            )
+        if self.speculative_metrics:
+            discarded_cost = sum(usage.discarded_cost for usage in self.usage.values())
+            discarded_calls = sum(
+                usage.discarded_calls + usage.cancelled_calls
+                for usage in self.usage.values()
+            )
+            self.logger.info(
+                f"Speculative execution: {discarded_calls} calls discarded, "
+                f"{discarded_cost:.4f}$ wasted"
+            )
+        retries = sum(usage.retries for usage in self.usage.values())
+        if retries > 0:
+            backoff_seconds = sum(
+                usage.backoff_seconds for usage in self.usage.values()
+            )
+            self.logger.info(
+                f"Retries: {retries} calls retried after {backoff_seconds:.1f}s "
+                "of backoff"
+            )
+        repair_calls = sum(usage.repair_calls for usage in self.usage.values())
+        if repair_calls > 0:
+            repair_successes = sum(
+                usage.repair_successes for usage in self.usage.values()
+            )
+            self.logger.info(
+                f"Repair: {repair_successes} judgements parsed after "
+                f"{repair_calls} repair calls"
+            )
+        repaired_responses = sum(
+            usage.repaired_responses for usage in self.usage.values()
         )
-        nr_mean = np.mean(
-            [
-                e.negative_rejection
-                for e in evaluations
-                if isinstance(e.negative_rejection, int)
-            ]
+        if repaired_responses > 0:
+            recovered_answers = sum(
+                usage.recovered_answers for usage in self.usage.values()
+            )
+            self.logger.info(
+                f"Parse recovery: {repaired_responses} responses repaired, "
+                f"{recovered_answers} judgements of answer 2 recovered alone"
+            )
+        if self.cascade_evaluator is not None:
+            cascade_calls = sum(usage.cascade_calls for usage in self.usage.values())
+            escalated_calls = sum(
+                usage.escalated_calls for usage in self.usage.values()
+            )
+            cascade_cost = sum(
+                self.__get_cascade_usage(metric).cost for metric in self.usage
+            )
+            self.logger.info(
+                f"Cascade: {escalated_calls}/{cascade_calls} judgements escalated, "
+                f"{cascade_cost:.4f}$ spent on the cascade model, "
+                f"{self.__get_cascade_cost_saved():.4f}$ saved"
+            )
+        prompt_tokens = sum(usage.prompt_tokens for usage in self.usage.values())
+        if prompt_tokens > 0:
+            cached_prompt_tokens = sum(
+                usage.cached_prompt_tokens for usage in self.usage.values()
+            )
+            self.logger.info(
+                f"Prompt caching: {cached_prompt_tokens / prompt_tokens:.0%} of "
+                f"{prompt_tokens} prompt tokens cached"
+            )
+
+    def evaluate_multiple_samples(
+        self,
+        eval_samples: List[EvaluationSample],
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+    ) -> List[GroundedQAEvaluation]:
+        results = asyncio.run(
+            self.async_evaluate_multiple_samples(eval_samples, semaphore_size, journal)
         )
-        mean = np.mean([ar_mean, c_mean, f_mean, u_mean, pa_mean, nr_mean])
-        report = GroundedQAEvaluationReport(
-            answer_relevancy=float(ar_mean),
-            answer_relevancy_parsing_success=float(ar_parsing_success),
-            completeness=float(c_mean),
-            completeness_parsing_success=float(c_parsing_success),
-            faithfulness=float(f_mean),
-            faithfulness_parsing_success=float(f_parsing_success),
-            usefulness=float(u_mean),
-            usefulness_parse_success=float(u_parsing_success),
-            positive_acceptance=float(pa_mean),
-            negative_rejection=float(nr_mean),
-            mean=mean,
+        self.log_usage()
+        return results
+
+    def evaluate(
+        self,
+        eval_samples: List[EvaluationSample],
+        semaphore_size: int = 20,
+        journal: Optional[EvaluationJournal] = None,
+    ) -> EvaluationsAndReport:
+        evaluations = self.evaluate_multiple_samples(
+            eval_samples, semaphore_size, journal
         )
+        report = self.compute_report(evaluations)
         return EvaluationsAndReport(evaluations=evaluations, report=report)
+
+    def compute_report(
+        self, evaluations: List[GroundedQAEvaluation]
+    ) -> GroundedQAEvaluationReport:
+        return self.compute_report_from_columns(
+            EvaluationColumns.from_evaluations(evaluations)
+        )
+
+    def compute_report_from_columns(
+        self, columns: EvaluationColumns
+    ) -> GroundedQAEvaluationReport:
+        report = columns.compute_report(usage=self.__get_usage_report())
+        if self.cascade_evaluator is not None:
+            cascade_calls = sum(usage.cascade_calls for usage in self.usage.values())
+            escalated_calls = sum(
+                usage.escalated_calls for usage in self.usage.values()
+            )
+            report.escalation_rate = (
+                escalated_calls / cascade_calls if cascade_calls > 0 else None
+            )
+            report.cost_saved = self.__get_cascade_cost_saved()
+        if self.repair_attempts > 0:
+            report.first_pass_parsing_success = {}
+            for metric in PAIR_MODEL_METRICS.values():
+                usage = self.usage.get(metric, MetricUsage())
+                report.first_pass_parsing_success[metric] = (
+                    1 - usage.first_pass_failures / usage.judgements
+                    if usage.judgements > 0
+                    else float("nan")
+                )
+        return report
+
+    def __get_usage_report(self) -> Dict[str, MetricUsage]:
+        usage_report = {}
+        for metric, usage in self.usage.items():
+            route = self.get_route(metric)
+            usage_report[metric] = usage.model_copy(
+                update={"model_name": route.model_name}
+            )
+            if route.cascade_evaluator is not None:
+                usage_report[metric].cascade_cost = self.__get_cascade_usage(
+                    metric
+                ).cost
+        return usage_report
+
+    def __get_cascade_usage(self, metric: str) -> MetricUsage:
+        cascade_evaluator = self.get_route(metric).cascade_evaluator
+        assert cascade_evaluator is not None
+        return cascade_evaluator.usage.get(metric, MetricUsage())
+
+    def __get_cascade_cost_saved(self) -> float:
+        """Cost the evaluator model would have had on the judgements that were not
+        escalated, estimated from the tokens of the cascade model, minus the cost
+        of the cascade model."""
+        cost_saved = 0.0
+        for metric, usage in self.usage.items():
+            if usage.cascade_calls == 0:
+                continue
+            cascade_usage = self.__get_cascade_usage(metric)
+            prompt_cost, completion_cost = litellm.cost_per_token(
+                model=self.get_route(metric).model_name,
+                prompt_tokens=cascade_usage.prompt_tokens,
+                completion_tokens=cascade_usage.completion_tokens,
+            )
+            # Share of the cascade tokens spent on a single vote of the judgements
+            # that were not escalated
+            share = (usage.cascade_calls - usage.escalated_calls) / (
+                usage.cascade_calls * self.cascade_votes
+            )
+            cost_saved += (prompt_cost + completion_cost) * share - cascade_usage.cost
+        return cost_saved
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Type
+
+from grouse.dtos import EvaluationSample, Failed, GroundedQAEvaluation
+from grouse.utils import get_question_hash, get_sample_hash
+
+if TYPE_CHECKING:
+    from grouse.baseline import Baseline
+
+JOURNAL_FILE_NAME = "journal.jsonl"
+
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """Read the entries of a journal, skipping the truncated ones."""
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.decoder.JSONDecodeError:
+                logging.warning(f"Skipping truncated entry of journal {path}")
+
+
+def has_failed_metric(evaluation: GroundedQAEvaluation) -> bool:
+    return any(isinstance(value, Failed) for _, value in evaluation)
+
+
+class EvaluationJournal:
+    """Append-only journal of the evaluations, keyed by the hash of their sample.
+
+    Each evaluation is written and flushed as soon as it is completed, so that an
+    interrupted run can be resumed without evaluating the journaled samples again.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        resume: bool = False,
+        baseline: Optional["Baseline"] = None,
+        config_hash: Optional[str] = None,
+    ):
+        """
+        Args:
+            path (str): Path to the journal file.
+            resume (bool): Load the evaluations of an existing journal and append
+            the new ones to it, leaving out the evaluations with a failed metric
+            so that they are evaluated again. Otherwise, the journal is
+            overwritten.
+            baseline (Optional[Baseline]): Evaluations of a previous run, reused for
+            the unchanged samples and copied to the journal.
+            config_hash (Optional[str]): Hash of the configuration of the evaluator,
+            recorded with each evaluation. When resuming, the evaluations recorded
+            with another configuration are evaluated again.
+        """
+        self.path = path
+        self.baseline = baseline
+        self.config_hash = config_hash
+        self.evaluations: Dict[str, GroundedQAEvaluation] = {}
+        if resume and os.path.exists(path):
+            self.__load()
+            self.file = open(path, "a", encoding="utf-8")
+            if self.file.tell() > 0 and not self.__ends_with_newline():
+                # The last entry was truncated by an interruption
+                self.file.write("\n")
+        else:
+            self.file = open(path, "w", encoding="utf-8")
+
+    def __load(self) -> None:
+        for entry in read_journal(self.path):
+            if (
+                self.config_hash is not None
+                and entry.get("config_hash") != self.config_hash
+            ):
+                continue
+            evaluation = GroundedQAEvaluation(**entry["evaluation"])
+            # Failures, such as calls out of retries on rate limits, are evaluated
+            # again when resuming
+            if not has_failed_metric(evaluation):
+                self.evaluations[entry["sample_hash"]] = evaluation
+
+    def __ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read() == b"\n"
+
+    def get(self, eval_sample: EvaluationSample) -> Optional[GroundedQAEvaluation]:
+        evaluation = self.evaluations.get(get_sample_hash(eval_sample))
+        if evaluation is None and self.baseline is not None:
+            evaluation = self.baseline.get(eval_sample)
+            if evaluation is not None:
+                self.evaluations[get_sample_hash(eval_sample)] = evaluation
+                self.record(eval_sample, evaluation)
+        return evaluation
+
+    def record(
+        self, eval_sample: EvaluationSample, evaluation: GroundedQAEvaluation
+    ) -> None:
+        entry = {
+            "sample_hash": get_sample_hash(eval_sample),
+            "question_hash": get_question_hash(eval_sample),
+            "evaluation": evaluation.model_dump(mode="json"),
+        }
+        if self.config_hash is not None:
+            entry["config_hash"] = self.config_hash
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "EvaluationJournal":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
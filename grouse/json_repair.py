@@ -0,0 +1,166 @@
+import json
+import re
+from typing import Any, List, Tuple
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+JSON_LITERALS = ("true", "false", "null")
+CLOSING_BRACKETS = {"{": "}", "[": "]"}
+
+
+def find_json_object(text: str) -> Tuple[str, bool]:
+    """Find the first JSON object in a text, skipping the prose around it.
+
+    Braces are balanced outside of strings, with single or double quotes.
+
+    Returns:
+        Tuple[str, bool]: The object, and whether it is complete. An object cut
+        before its closing brace is returned up to the end of the text.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object found")
+    depth = 0
+    quote = None
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start : index + 1], True
+    return text[start:], False
+
+
+def _remove_incomplete_member(output: List[str], stack: List[str]) -> None:
+    """Remove the last member of a truncated object or array if it has no value."""
+    text = "".join(output).rstrip()
+    while True:
+        stripped = text.rstrip()
+        if stripped.endswith((",", ":")):
+            text = stripped[:-1]
+            continue
+        word = re.search(r"[^\W\d]\w*$", stripped)
+        if word is not None and word.group() not in JSON_LITERALS:
+            # Truncated literal
+            text = stripped[: word.start()]
+            continue
+        if len(stack) > 1 and stripped.endswith(stack[-1]):
+            # Nested object or array cut right after its opening bracket
+            text = stripped[:-1]
+            stack.pop()
+            continue
+        if stack and stack[-1] == "{" and stripped.endswith('"'):
+            # A key without value is preceded by the opening brace or a comma
+            key = re.search(r'(^|[{,])\s*"(?:[^"\\]|\\.)*"$', stripped)
+            if key is not None:
+                text = stripped[: key.start() + len(key.group(1))]
+                continue
+        text = stripped
+        break
+    output[:] = [text]
+
+
+def repair_json(text: str) -> str:
+    """Fix the common syntax errors of JSON written by language models.
+
+    Single quoted strings are double quoted, Python literals are converted, trailing
+    commas are removed, and a truncated object is closed after removing its
+    incomplete last member.
+    """
+    output: List[str] = []
+    stack: List[str] = []
+    quote = None
+    escaped = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if quote is not None:
+            if escaped:
+                escaped = False
+                output.append(char)
+            elif char == "\\":
+                escaped = True
+                output.append(char)
+            elif char == quote:
+                quote = None
+                output.append('"')
+            elif char == '"':
+                # Double quote inside a single quoted string
+                output.append('\\"')
+            elif char == "\n":
+                output.append("\\n")
+            else:
+                output.append(char)
+        elif char in "\"'":
+            quote = char
+            output.append('"')
+        elif char in "{[":
+            stack.append(char)
+            output.append(char)
+        elif char in "}]":
+            while output and output[-1].isspace():
+                output.pop()
+            if output and output[-1] == ",":
+                output.pop()
+            if stack:
+                stack.pop()
+            output.append(char)
+        elif char.isalpha() or char == "_":
+            # \w matches every character for which isalpha is true
+            word = re.match(r"\w+", text[index:]).group()
+            if re.match(r"\s*:", text[index + len(word) :]):
+                # Unquoted key
+                output.append(f'"{word}"')
+            else:
+                output.append(PYTHON_LITERALS.get(word, word))
+            index += len(word)
+            continue
+        else:
+            output.append(char)
+        index += 1
+
+    if quote is not None or stack:
+        if escaped:
+            output.pop()
+        if quote is not None:
+            output.append('"')
+        _remove_incomplete_member(output, stack)
+        output.extend(CLOSING_BRACKETS[bracket] for bracket in reversed(stack))
+    return "".join(output)
+
+
+def loads_tolerant(text: str) -> Tuple[Any, bool]:
+    """Load the JSON object of a judge response, repairing it if needed.
+
+    Returns:
+        Tuple[Any, bool]: The loaded object, and whether it had to be repaired.
+
+    Raises:
+        ValueError: If no JSON object can be recovered from the text, including
+        json.JSONDecodeError if the repaired object is still invalid.
+    """
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+    json_object, _ = find_json_object(text)
+    try:
+        return json.loads(json_object), True
+    except json.JSONDecodeError:
+        pass
+    try:
+        repaired_json = repair_json(json_object)
+    except (AttributeError, IndexError, KeyError) as error:
+        raise ValueError(f"JSON object could not be repaired: {error}") from error
+    return json.loads(repaired_json), True
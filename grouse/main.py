@@ -1,16 +1,55 @@
+import asyncio
+import contextlib
 import json
 import os
-from typing import Optional
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sized, Tuple
 
 import click
 import jsonlines
+import numpy as np
+from pydantic import BaseModel
+from tqdm import tqdm
 
-from grouse.dtos import EvaluationSample, MetaTestCaseResult
-from grouse.grounded_qa_evaluator import GroundedQAEvaluator
+from grouse.baseline import Baseline
+from grouse.batch import BatchGroundedQAEvaluator, LiteLLMBatchService
+from grouse.columnar import (
+    REPORT_FIELDS,
+    EvaluationColumns,
+    get_metadata_groups,
+    get_metadata_value,
+)
+from grouse.compare import compare_systems
+from grouse.concurrency import AdaptiveConcurrencyLimiter
+from grouse.dtos import (
+    EvaluationSample,
+    GroundedQAEvaluation,
+    GroundedQAEvaluationReport,
+    GroupReport,
+    MetaTestCaseResult,
+    MetricRoute,
+)
+from grouse.estimator import DEFAULT_LATENCY, DEFAULT_OUTPUT_TOKENS, estimate_usage
+from grouse.grounded_qa_evaluator import SPECULATIVE_METRICS, GroundedQAEvaluator
+from grouse.journal import JOURNAL_FILE_NAME, EvaluationJournal
 from grouse.meta_evaluator import meta_evaluate_pipeline
+from grouse.multi_judge import JURY_AGGREGATIONS, MultiJudgeEvaluator
 from grouse.plot import plot_matrices
-from grouse.register_models import register_models
+from grouse.readers import read_rows, read_samples
+from grouse.register_models import register_models, register_rate_limits
+from grouse.retry import RetryPolicy
+from grouse.sampling import StratifiedReservoirSampler
+from grouse.sequential import (
+    DEFAULT_TARGET_METRICS,
+    SCORE_METRICS,
+    SequentialStoppingRule,
+)
 from grouse.utils import NanConverter, load_unit_tests
+from grouse.writers import (
+    EVALUATIONS_FILE_NAMES,
+    OUTPUT_FORMATS,
+    open_evaluation_writer,
+)
 
 register_models()
 
@@ -26,11 +65,38 @@ def cli() -> None:
 @click.option(
     "--evaluator_model_name",
     type=str,
+    multiple=True,
     help=(
         "Name of the evaluator model. It can be any LiteLLM model. "
-        "The default model is GPT-4."
+        "The default model is GPT-4. Can be repeated to evaluate with several "
+        "judges in the same run."
     ),
-    default="gpt-4",
+    default=("gpt-4",),
+)
+@click.option(
+    "--jury_aggregation",
+    type=click.Choice(JURY_AGGREGATIONS),
+    help=(
+        "Aggregation of the judgements of several evaluator models into the "
+        "evaluations of a jury."
+    ),
+    default=None,
+)
+@click.option(
+    "--cascade_model_name",
+    type=str,
+    help=(
+        "Name of a cheaper model judging each metric first. Its judgements are "
+        "escalated to the evaluator model when they fail to be parsed, when their "
+        "score is borderline or when its votes disagree."
+    ),
+    default=None,
+)
+@click.option(
+    "--cascade_votes",
+    type=int,
+    help="Number of judgements sampled from the cascade model for each metric.",
+    default=1,
 )
 @click.option(
     "--prompts_path",
@@ -41,42 +107,860 @@ def cli() -> None:
     ),
     default=None,
 )
+@click.option(
+    "--metric_routes",
+    type=str,
+    help=(
+        "Path to a JSON file mapping metrics to the model_name, and optionally the "
+        "prompts_path, used to evaluate them instead of the evaluator model."
+    ),
+    default=None,
+)
+@click.option(
+    "--parallel_metrics",
+    is_flag=True,
+    help="Optional flag to call answer relevancy and completeness at the same time.",
+)
+@click.option(
+    "--speculative_metrics",
+    type=click.Choice(SPECULATIVE_METRICS),
+    multiple=True,
+    help=(
+        "Metric to call at the same time as answer relevancy when "
+        "--parallel_metrics is set, before knowing whether it is needed. "
+        "Can be repeated."
+    ),
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help=(
+        "Optional flag to append each evaluation to the evaluations file, along with "
+        "the index of its sample, as soon as it is completed."
+    ),
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help=(
+        "Optional flag to resume an interrupted run from the journal of the output "
+        "directory. The samples already evaluated are not evaluated again."
+    ),
+)
+@click.option(
+    "--adaptive_concurrency",
+    is_flag=True,
+    help=(
+        "Optional flag to adapt the number of concurrent calls to the evaluator "
+        "model, growing it while the latency stays low and backing off on rate "
+        "limit errors and timeouts."
+    ),
+)
+@click.option(
+    "--max_concurrency",
+    type=int,
+    help="Maximum number of concurrent calls with --adaptive_concurrency.",
+    default=512,
+)
+@click.option(
+    "--rpm",
+    type=int,
+    help="Maximum number of requests per minute sent to the evaluator model.",
+    default=None,
+)
+@click.option(
+    "--tpm",
+    type=int,
+    help=(
+        "Maximum number of tokens per minute sent to the evaluator model, "
+        "counting the prompt tokens and the maximum number of generated tokens."
+    ),
+    default=None,
+)
+@click.option(
+    "--max_retries",
+    type=int,
+    help=(
+        "Maximum number of retries of a call failing with a transient provider "
+        "error, such as a rate limit error or a timeout."
+    ),
+    default=5,
+)
+@click.option(
+    "--repair_attempts",
+    type=int,
+    help=(
+        "Maximum number of follow-up turns asking the evaluator model to correct a "
+        "response that can not be parsed, before scoring it as failed."
+    ),
+    default=0,
+)
+@click.option(
+    "--batch_mode",
+    is_flag=True,
+    help=(
+        "Optional flag to send the calls to the evaluator model through the batch "
+        "API of its provider, in dependent waves. Results come back hours later at "
+        "reduced prices."
+    ),
+)
+@click.option(
+    "--batch_provider",
+    type=str,
+    help="LiteLLM provider of the batch API used with --batch_mode.",
+    default="openai",
+)
+@click.option(
+    "--poll_interval",
+    type=float,
+    help="Number of seconds between two checks of the status of a batch.",
+    default=60.0,
+)
+@click.option(
+    "--reference_judgements_path",
+    type=str,
+    help=(
+        "Path to a store of the judgements of the expected outputs. The judgement "
+        "of an expected output is made once per sample and metric and reused in "
+        "the following prompts, which is useful to compare several systems on the "
+        "same dataset."
+    ),
+    default=None,
+)
+@click.option(
+    "--cache_friendly_prompts",
+    is_flag=True,
+    help=(
+        "Optional flag to put the sample and its references at the start of the "
+        "prompts of all metrics, so that the provider caches this shared prefix."
+    ),
+)
+@click.option(
+    "--group_by",
+    type=str,
+    help=(
+        "Comma-separated metadata keys of the samples, nested keys being separated "
+        "by dots. A report is also computed for each group of samples sharing the "
+        "same values and written to report_by_group.json."
+    ),
+    default=None,
+)
+@click.option(
+    "--bootstrap_resamples",
+    type=int,
+    help=(
+        "Number of bootstrap resamples of the confidence intervals written in the "
+        "reports, which are not computed if 0."
+    ),
+    default=0,
+)
+@click.option(
+    "--confidence_level",
+    type=float,
+    help="Confidence level of the bootstrap confidence intervals.",
+    default=0.95,
+)
+@click.option(
+    "--seed",
+    type=int,
+    help=(
+        "Seed of the random number generator of the bootstrap resampling, of "
+        "--sample and of the order of the samples with --target_precision."
+    ),
+    default=None,
+)
+@click.option(
+    "--target_precision",
+    type=float,
+    help=(
+        "Optional maximum half width of the confidence intervals of the target "
+        "metrics, as a share of the range of their scale (0.1 is 0.4 points on the "
+        "1 to 5 scales). Samples are evaluated in a random order until it is "
+        "reached."
+    ),
+    default=None,
+)
+@click.option(
+    "--target_metrics",
+    type=click.Choice(SCORE_METRICS),
+    multiple=True,
+    help=(
+        "Metric whose confidence interval should reach --target_precision. It can "
+        "be repeated, defaults to answer_relevancy, completeness and faithfulness."
+    ),
+    default=DEFAULT_TARGET_METRICS,
+)
+@click.option(
+    "--min_samples",
+    type=int,
+    help=(
+        "Minimum number of values of each target metric before stopping with "
+        "--target_precision."
+    ),
+    default=30,
+)
+@click.option(
+    "--sample",
+    type=int,
+    help=(
+        "Optional number of samples drawn at random from the dataset, which is "
+        "read once without being loaded in memory. Only these samples are "
+        "evaluated."
+    ),
+    default=None,
+)
+@click.option(
+    "--stratify_by",
+    type=str,
+    help=(
+        "Metadata key of the strata of --sample, nested keys being separated by "
+        "dots. Samples are drawn from each stratum in proportion to its size, and "
+        "the report is reweighted to the share of each stratum in the dataset."
+    ),
+    default=None,
+)
+@click.option(
+    "--baseline",
+    type=str,
+    help=(
+        "Optional output directory of a previous run. The evaluations of the "
+        "unchanged samples are copied from its journal, only the new and changed "
+        "samples are evaluated, and report_diff.json compares both runs."
+    ),
+    default=None,
+)
+@click.option(
+    "--output_format",
+    type=click.Choice(OUTPUT_FORMATS),
+    help=(
+        "Format of the evaluations, written to evaluations.jsonl or to "
+        "evaluations.parquet with one column per score and compressed "
+        "justifications."
+    ),
+    default="jsonl",
+)
 def evaluate(
     dataset_path: str,
     output_dir_path: str,
-    evaluator_model_name: Optional[str] = None,
+    evaluator_model_name: Tuple[str, ...] = ("gpt-4",),
+    jury_aggregation: Optional[str] = None,
+    cascade_model_name: Optional[str] = None,
+    cascade_votes: int = 1,
     prompts_path: Optional[str] = None,
+    metric_routes: Optional[str] = None,
+    parallel_metrics: bool = False,
+    speculative_metrics: Tuple[str, ...] = (),
+    stream: bool = False,
+    resume: bool = False,
+    adaptive_concurrency: bool = False,
+    max_concurrency: int = 512,
+    rpm: Optional[int] = None,
+    tpm: Optional[int] = None,
+    max_retries: int = 5,
+    repair_attempts: int = 0,
+    batch_mode: bool = False,
+    batch_provider: str = "openai",
+    poll_interval: float = 60.0,
+    reference_judgements_path: Optional[str] = None,
+    cache_friendly_prompts: bool = False,
+    group_by: Optional[str] = None,
+    bootstrap_resamples: int = 0,
+    confidence_level: float = 0.95,
+    seed: Optional[int] = None,
+    target_precision: Optional[float] = None,
+    target_metrics: Tuple[str, ...] = DEFAULT_TARGET_METRICS,
+    min_samples: int = 30,
+    sample: Optional[int] = None,
+    stratify_by: Optional[str] = None,
+    baseline: Optional[str] = None,
+    output_format: str = "jsonl",
 ) -> None:
     """Evaluate models on grounded question answering using any LiteLLM model.
     The default model is GPT-4.
 
     Args:
-        DATASET_PATH (str): Path to jsonlines file with references, input,
-        actual_output (generation from the model to evaluate) and expected_output.
+        DATASET_PATH (str): Path to jsonlines file (optionally compressed as .gz or
+        .zst) or Parquet file with references, input, actual_output (generation
+        from the model to evaluate) and expected_output.
         OUTPUT_DIR_PATH (str): Path to directory where results report and
         evaluations are saved.
     """
-    evaluator = GroundedQAEvaluator(
-        model_name=evaluator_model_name, prompts_path=prompts_path
+    if len(evaluator_model_name) > 1 and (batch_mode or stream):
+        raise click.UsageError(
+            "--batch_mode and --stream are not supported with several evaluator models"
+        )
+    # Metrics are always called in parallel in batch mode
+    if speculative_metrics and not (parallel_metrics or batch_mode):
+        raise click.UsageError("--speculative_metrics requires --parallel_metrics")
+    if jury_aggregation is not None and len(evaluator_model_name) == 1:
+        raise click.UsageError("--jury_aggregation requires several evaluator models")
+    if batch_mode and (cascade_model_name is not None or metric_routes is not None):
+        raise click.UsageError(
+            "--batch_mode does not support --cascade_model_name and --metric_routes"
+        )
+    if baseline is not None and len(evaluator_model_name) > 1:
+        raise click.UsageError(
+            "--baseline is not supported with several evaluator models"
+        )
+    if target_precision is not None and (
+        len(evaluator_model_name) > 1 or batch_mode or stream
+    ):
+        raise click.UsageError(
+            "--target_precision is not supported with several evaluator models, "
+            "--batch_mode and --stream"
+        )
+    if stratify_by is not None and sample is None:
+        raise click.UsageError("--stratify_by requires --sample")
+    if rpm is not None or tpm is not None:
+        for model_name in evaluator_model_name:
+            register_rate_limits(model_name, rpm=rpm, tpm=tpm)
+    evaluator_kwargs = dict(
+        prompts_path=prompts_path,
+        parallel_metrics=parallel_metrics,
+        speculative_metrics=speculative_metrics,
+        concurrency_limiter=(
+            AdaptiveConcurrencyLimiter(
+                initial_limit=min(20, max_concurrency), max_limit=max_concurrency
+            )
+            if adaptive_concurrency
+            else None
+        ),
+        retry_policy=RetryPolicy(max_retries=max_retries),
+        repair_attempts=repair_attempts,
+        reference_judgements_path=reference_judgements_path,
+        cache_friendly_prompts=cache_friendly_prompts,
+        cascade_model_name=cascade_model_name,
+        cascade_votes=cascade_votes,
+        metric_routes=(
+            load_metric_routes(metric_routes) if metric_routes is not None else None
+        ),
+    )
+    samples = read_samples(dataset_path)
+    sampler = None
+    weights = None
+    if sample is not None:
+        sampler = StratifiedReservoirSampler(sample, seed)
+        for eval_sample in samples:
+            sampler.add(
+                eval_sample,
+                (
+                    get_metadata_value(eval_sample, stratify_by)
+                    if stratify_by is not None
+                    else None
+                ),
+            )
+        eval_samples, weights = sampler.sample()
+    elif stream and group_by is None and baseline is None:
+        # The samples are read chunk by chunk while they are evaluated
+        eval_samples = samples
+    else:
+        eval_samples = list(samples)
+    report_options = ReportOptions(
+        groups=(
+            get_metadata_groups(eval_samples, group_by.split(","))
+            if group_by is not None
+            else None
+        ),
+        num_resamples=bootstrap_resamples,
+        confidence_level=confidence_level,
+        seed=seed,
+        weights=weights,
+        population_size=sampler.population_size if sampler is not None else None,
     )
-    eval_samples = []
-    with jsonlines.open(dataset_path) as reader:
-        for obj in reader:
-            eval_samples.append(EvaluationSample(**obj))
 
-    results = evaluator.evaluate(eval_samples)
+    if len(evaluator_model_name) > 1:
+        evaluate_with_judges(
+            eval_samples,
+            output_dir_path,
+            MultiJudgeEvaluator(
+                evaluator_model_name,
+                jury_aggregation=jury_aggregation,
+                **evaluator_kwargs,
+            ),
+            resume,
+            report_options,
+            EVALUATIONS_FILE_NAMES[output_format],
+        )
+        return
+
+    if batch_mode:
+        evaluator = BatchGroundedQAEvaluator(
+            batch_service=LiteLLMBatchService(batch_provider),
+            work_dir=os.path.join(output_dir_path, "batches"),
+            poll_interval=poll_interval,
+            model_name=evaluator_model_name[0],
+            # Answer relevancy and completeness are always sent in the same wave
+            **{**evaluator_kwargs, "parallel_metrics": True},
+        )
+    else:
+        evaluator = GroundedQAEvaluator(
+            model_name=evaluator_model_name[0], **evaluator_kwargs
+        )
 
     os.makedirs(output_dir_path, exist_ok=True)
+    evaluations_path = os.path.join(
+        output_dir_path, EVALUATIONS_FILE_NAMES[output_format]
+    )
+    evaluated_samples = eval_samples
+    config_hash = evaluator.get_config_hash()
+    try:
+        baseline_evaluations = (
+            Baseline(baseline, config_hash) if baseline is not None else None
+        )
+    except ValueError as error:
+        raise click.UsageError(str(error)) from error
+    with EvaluationJournal(
+        os.path.join(output_dir_path, JOURNAL_FILE_NAME),
+        resume=resume,
+        baseline=baseline_evaluations,
+        config_hash=config_hash,
+    ) as journal:
+        if stream:
+            asyncio.run(
+                stream_evaluations(evaluator, eval_samples, evaluations_path, journal)
+            )
+            evaluator.log_usage()
+            columns = (
+                EvaluationColumns.from_parquet(evaluations_path)
+                if output_format == "parquet"
+                else EvaluationColumns.from_jsonl(evaluations_path)
+            )
+            report = evaluator.compute_report_from_columns(columns)
+        elif target_precision is not None:
+            results = evaluator.evaluate_until_precision(
+                eval_samples,
+                SequentialStoppingRule(
+                    max_half_width=target_precision,
+                    metrics=target_metrics,
+                    confidence_level=confidence_level,
+                    min_samples=min_samples,
+                ),
+                journal=journal,
+                seed=seed,
+            )
+            report = results.report
+            write_evaluations(
+                evaluations_path, results.evaluations, results.sample_indices
+            )
+            columns = EvaluationColumns.from_evaluations(results.evaluations)
+            report_options = report_options.select(results.sample_indices)
+            evaluated_samples = [
+                eval_samples[index] for index in results.sample_indices
+            ]
+        else:
+            results = evaluator.evaluate(eval_samples, journal=journal)
+            report = results.report
+            write_evaluations(evaluations_path, results.evaluations)
+            columns = EvaluationColumns.from_evaluations(results.evaluations)
+
+    report = write_reports(output_dir_path, report, columns, report_options)
+    if journal.baseline is not None:
+        diff = journal.baseline.compute_diff(evaluated_samples, columns, report)
+        with open(
+            os.path.join(output_dir_path, "report_diff.json"), "w", encoding="utf-8"
+        ) as file:
+            json.dump(diff.model_dump(mode="json"), file, cls=NanConverter)
+
+
+def load_metric_routes(metric_routes_path: str) -> Dict[str, MetricRoute]:
+    with open(metric_routes_path, encoding="utf-8") as file:
+        return {
+            metric: MetricRoute(**metric_route)
+            for metric, metric_route in json.load(file).items()
+        }
+
+
+def write_evaluations(
+    evaluations_path: str,
+    evaluations: List[GroundedQAEvaluation],
+    sample_indices: Optional[List[int]] = None,
+) -> None:
+    with open_evaluation_writer(evaluations_path) as writer:
+        for position, evaluation in enumerate(evaluations):
+            writer.write(
+                evaluation,
+                sample_indices[position] if sample_indices is not None else None,
+            )
+
+
+def write_report(output_dir_path: str, report: GroundedQAEvaluationReport) -> None:
     with open(
         os.path.join(output_dir_path, "report.json"), "w", encoding="utf-8"
     ) as file:
-        json.dump(results.report.model_dump(mode="json"), file, cls=NanConverter)
+        json.dump(report.model_dump(mode="json"), file, cls=NanConverter)
 
-    with jsonlines.open(
-        os.path.join(output_dir_path, "evaluations.jsonl"), "w"
-    ) as writer:
-        for evaluation in results.evaluations:
-            writer.write(evaluation.model_dump(mode="json"))
+
+def write_group_reports(output_dir_path: str, group_reports: List[GroupReport]) -> None:
+    with open(
+        os.path.join(output_dir_path, "report_by_group.json"), "w", encoding="utf-8"
+    ) as file:
+        json.dump(
+            [group_report.model_dump(mode="json") for group_report in group_reports],
+            file,
+            cls=NanConverter,
+        )
+
+
+class ReportOptions(BaseModel):
+    """Options of the reports written after an evaluation.
+
+    Args:
+        groups (Optional[List[Dict[str, Any]]]): Group of each sample, to also write
+        a report per group.
+        num_resamples (int): Number of bootstrap resamples of the confidence
+        intervals, which are not computed if 0.
+        confidence_level (float): Confidence level of the intervals.
+        seed (Optional[int]): Seed of the bootstrap resampling.
+        weights (Optional[List[float]]): Weight of each sample drawn from a larger
+        dataset, to reweight the averages to the whole dataset.
+        population_size (Optional[int]): Number of samples of the dataset the
+        samples were drawn from.
+    """
+
+    groups: Optional[List[Dict[str, Any]]] = None
+    num_resamples: int = 0
+    confidence_level: float = 0.95
+    seed: Optional[int] = None
+    weights: Optional[List[float]] = None
+    population_size: Optional[int] = None
+
+    def select(self, sample_indices: List[int]) -> "ReportOptions":
+        """Options of the reports of a subset of the samples."""
+        return self.model_copy(
+            update={
+                "groups": (
+                    [self.groups[index] for index in sample_indices]
+                    if self.groups is not None
+                    else None
+                ),
+                "weights": (
+                    [self.weights[index] for index in sample_indices]
+                    if self.weights is not None
+                    else None
+                ),
+            }
+        )
+
+
+def write_reports(
+    output_dir_path: str,
+    report: GroundedQAEvaluationReport,
+    columns: EvaluationColumns,
+    report_options: ReportOptions,
+) -> GroundedQAEvaluationReport:
+    """Write the report, with its confidence intervals if requested, and the
+    reports by group if groups are given. The written report is returned."""
+    if report_options.weights is not None:
+        columns.weights = np.array(report_options.weights)
+        # Reweight the averages of the drawn samples to the whole dataset
+        weighted_report = columns.compute_report()
+        report = report.model_copy(
+            update={
+                **{field: getattr(weighted_report, field) for field in REPORT_FIELDS},
+                "num_samples": len(columns),
+                "population_size": report_options.population_size,
+            }
+        )
+    if report_options.num_resamples > 0:
+        report.confidence_intervals = columns.compute_confidence_intervals(
+            report_options.num_resamples,
+            report_options.confidence_level,
+            report_options.seed,
+        )
+    write_report(output_dir_path, report)
+    if report_options.groups is not None:
+        write_group_reports(
+            output_dir_path,
+            columns.compute_group_reports(
+                report_options.groups,
+                report_options.num_resamples,
+                report_options.confidence_level,
+                report_options.seed,
+            ),
+        )
+    return report
+
+
+def evaluate_with_judges(
+    eval_samples: List[EvaluationSample],
+    output_dir_path: str,
+    evaluator: MultiJudgeEvaluator,
+    resume: bool,
+    report_options: ReportOptions,
+    evaluations_file_name: str = "evaluations.jsonl",
+) -> None:
+    """Evaluate samples with several judges and write the evaluations, reports and
+    journal of each judge to its own directory, and those of the jury if any."""
+    judge_dir_paths = {
+        model_name: os.path.join(
+            output_dir_path, "judges", re.sub(r"[^\w.-]+", "_", model_name)
+        )
+        for model_name in evaluator.judges
+    }
+    with contextlib.ExitStack() as stack:
+        journals = {}
+        for model_name, judge_dir_path in judge_dir_paths.items():
+            os.makedirs(judge_dir_path, exist_ok=True)
+            journals[model_name] = stack.enter_context(
+                EvaluationJournal(
+                    os.path.join(judge_dir_path, JOURNAL_FILE_NAME),
+                    resume=resume,
+                    config_hash=evaluator.judges[model_name].get_config_hash(),
+                )
+            )
+        results = evaluator.evaluate(eval_samples, journals=journals)
+
+    for model_name, judge_results in results.judges.items():
+        judge_dir_path = judge_dir_paths[model_name]
+        write_evaluations(
+            os.path.join(judge_dir_path, evaluations_file_name),
+            judge_results.evaluations,
+        )
+        write_reports(
+            judge_dir_path,
+            judge_results.report,
+            EvaluationColumns.from_evaluations(judge_results.evaluations),
+            report_options,
+        )
+    if results.jury is not None:
+        jury_dir_path = os.path.join(output_dir_path, "jury")
+        os.makedirs(jury_dir_path, exist_ok=True)
+        write_evaluations(
+            os.path.join(jury_dir_path, evaluations_file_name),
+            results.jury.evaluations,
+        )
+        write_reports(
+            jury_dir_path,
+            results.jury.report,
+            EvaluationColumns.from_evaluations(results.jury.evaluations),
+            report_options,
+        )
+
+
+async def stream_evaluations(
+    evaluator: GroundedQAEvaluator,
+    eval_samples: Iterable[EvaluationSample],
+    evaluations_path: str,
+    journal: EvaluationJournal,
+) -> None:
+    with (
+        open_evaluation_writer(evaluations_path) as writer,
+        tqdm(
+            total=len(eval_samples) if isinstance(eval_samples, Sized) else None
+        ) as progress_bar,
+    ):
+        async for index, evaluation in evaluator.aiter_evaluate(
+            eval_samples, journal=journal
+        ):
+            writer.write(evaluation, index)
+            evaluator.update_progress_bar(progress_bar)
+
+
+@cli.command()
+@click.argument("dataset_path_a", type=str)
+@click.argument("dataset_path_b", type=str)
+@click.argument("output_dir_path", type=str)
+@click.option(
+    "--evaluator_model_name",
+    type=str,
+    help="Optional LLM to use for the evaluation.",
+    default="gpt-4",
+)
+@click.option(
+    "--prompts_path",
+    type=str,
+    help="Optional path to the folder containing the prompts of the evaluator.",
+    default=None,
+)
+@click.option(
+    "--parallel_metrics",
+    is_flag=True,
+    help="Optional flag to call independent metrics of a sample in parallel.",
+)
+@click.option(
+    "--cache_friendly_prompts",
+    is_flag=True,
+    help=(
+        "Optional flag to put the sample and its references at the start of the "
+        "prompts, so that the answers of both systems to a question share a cached "
+        "prefix."
+    ),
+)
+@click.option(
+    "--max_retries",
+    type=int,
+    help="Maximum number of retries of a call failing with a transient error.",
+    default=5,
+)
+@click.option(
+    "--bootstrap_resamples",
+    type=int,
+    help="Number of paired bootstrap resamples of the confidence intervals.",
+    default=10000,
+)
+@click.option(
+    "--confidence_level",
+    type=float,
+    help="Confidence level of the paired bootstrap confidence intervals.",
+    default=0.95,
+)
+@click.option(
+    "--seed",
+    type=int,
+    help="Seed of the random number generator of the bootstrap resampling.",
+    default=None,
+)
+def compare(
+    dataset_path_a: str,
+    dataset_path_b: str,
+    output_dir_path: str,
+    evaluator_model_name: str = "gpt-4",
+    prompts_path: Optional[str] = None,
+    parallel_metrics: bool = False,
+    cache_friendly_prompts: bool = False,
+    max_retries: int = 5,
+    bootstrap_resamples: int = 10000,
+    confidence_level: float = 0.95,
+    seed: Optional[int] = None,
+) -> None:
+    """Compare two systems answering the same questions, evaluated in a single run.
+
+    Args:
+        DATASET_PATH_A (str): Path to dataset file with the samples of system A.
+        DATASET_PATH_B (str): Path to dataset file with the samples of system B,
+        paired with those of system A by input and expected output.
+        OUTPUT_DIR_PATH (str): Path to directory where the evaluations and report
+        of each system and their comparison are saved.
+    """
+    eval_samples = {}
+    for system, dataset_path in (("a", dataset_path_a), ("b", dataset_path_b)):
+        eval_samples[system] = list(read_samples(dataset_path))
+    evaluator = GroundedQAEvaluator(
+        model_name=evaluator_model_name,
+        prompts_path=prompts_path,
+        parallel_metrics=parallel_metrics,
+        cache_friendly_prompts=cache_friendly_prompts,
+        retry_policy=RetryPolicy(max_retries=max_retries),
+    )
+    results_a, results_b, comparison = compare_systems(
+        evaluator,
+        eval_samples["a"],
+        eval_samples["b"],
+        num_resamples=bootstrap_resamples,
+        confidence_level=confidence_level,
+        seed=seed,
+    )
+    for system, results in (("a", results_a), ("b", results_b)):
+        system_dir_path = os.path.join(output_dir_path, system)
+        os.makedirs(system_dir_path, exist_ok=True)
+        write_evaluations(
+            os.path.join(system_dir_path, "evaluations.jsonl"), results.evaluations
+        )
+        write_report(system_dir_path, results.report)
+    with open(
+        os.path.join(output_dir_path, "comparison.json"), "w", encoding="utf-8"
+    ) as file:
+        json.dump(comparison.model_dump(mode="json"), file, cls=NanConverter)
+
+
+@cli.command()
+@click.argument("dataset_path", type=str)
+@click.option(
+    "--evaluator_model_name",
+    type=str,
+    help="Name of the evaluator model. The default model is GPT-4.",
+    default="gpt-4",
+)
+@click.option(
+    "--prompts_path",
+    type=str,
+    help=(
+        "Path to the folder containing the prompts of the evaluator. "
+        "By default, the prompts are those optimized for GPT-4."
+    ),
+    default=None,
+)
+@click.option(
+    "--speculative_metrics",
+    type=click.Choice(SPECULATIVE_METRICS),
+    multiple=True,
+    help="Metric called speculatively during the evaluation. Can be repeated.",
+)
+@click.option(
+    "--cache_friendly_prompts",
+    is_flag=True,
+    help="Optional flag to count the tokens of the prompts restructured for caching.",
+)
+@click.option(
+    "--rpm",
+    type=int,
+    help="Maximum number of requests per minute sent to the evaluator model.",
+    default=None,
+)
+@click.option(
+    "--tpm",
+    type=int,
+    help="Maximum number of tokens per minute sent to the evaluator model.",
+    default=None,
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    help="Number of concurrent calls to the evaluator model.",
+    default=20,
+)
+@click.option(
+    "--output_tokens",
+    type=int,
+    help="Average number of tokens generated per call.",
+    default=DEFAULT_OUTPUT_TOKENS,
+)
+@click.option(
+    "--latency",
+    type=float,
+    help="Average latency of a call in seconds.",
+    default=DEFAULT_LATENCY,
+)
+@click.option(
+    "--num_workers",
+    type=int,
+    help="Number of processes rendering and tokenizing the prompts.",
+    default=None,
+)
+def estimate(
+    dataset_path: str,
+    evaluator_model_name: str = "gpt-4",
+    prompts_path: Optional[str] = None,
+    speculative_metrics: Tuple[str, ...] = (),
+    cache_friendly_prompts: bool = False,
+    rpm: Optional[int] = None,
+    tpm: Optional[int] = None,
+    concurrency: int = 20,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+    latency: float = DEFAULT_LATENCY,
+    num_workers: Optional[int] = None,
+) -> None:
+    """Estimate the cost, tokens and duration of an evaluation before running it.
+
+    Args:
+        DATASET_PATH (str): Path to jsonlines file (optionally compressed as .gz or
+        .zst) or Parquet file with references, input, actual_output (generation
+        from the model to evaluate) and expected_output.
+    """
+    if rpm is not None or tpm is not None:
+        register_rate_limits(evaluator_model_name, rpm=rpm, tpm=tpm)
+    usage_estimate = estimate_usage(
+        read_rows(dataset_path),
+        model_name=evaluator_model_name,
+        prompts_path=prompts_path,
+        speculative_metrics=speculative_metrics,
+        cache_friendly_prompts=cache_friendly_prompts,
+        output_tokens=output_tokens,
+        concurrency=concurrency,
+        latency=latency,
+        num_workers=num_workers,
+    )
+    click.echo(json.dumps(usage_estimate.model_dump(mode="json"), indent=4))
 
 
 @cli.command()
@@ -0,0 +1,296 @@
+import asyncio
+import statistics
+from collections import Counter, OrderedDict
+from contextlib import aclosing
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from tqdm import tqdm
+
+from grouse.columnar import EvaluationColumns
+from grouse.dtos import (
+    EvaluationSample,
+    EvaluationsAndReport,
+    Failed,
+    GroundedQAEvaluation,
+    MultiJudgeEvaluation,
+    MultiJudgeEvaluationsAndReports,
+    Score,
+)
+from grouse.grounded_qa_evaluator import GroundedQAEvaluator
+from grouse.journal import EvaluationJournal
+from grouse.scheduler import SampleScheduler
+from grouse.utils import get_positive_acceptance_negative_rejection
+
+JURY_AGGREGATIONS = ("majority", "median")
+SCORE_METRICS = ("answer_relevancy", "completeness", "faithfulness", "usefulness")
+
+
+class PromptCache:
+    """Prompts rendered for the samples being evaluated, shared by several judges
+    so that each prompt is only rendered once."""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.prompts: OrderedDict[Tuple[str, int], Tuple[EvaluationSample, str]] = (
+            OrderedDict()
+        )
+
+    def get_or_render(
+        self,
+        metric: str,
+        eval_sample: EvaluationSample,
+        render: Callable[[str, EvaluationSample], str],
+    ) -> str:
+        # Samples are keyed by identity, they are kept in the cache so that their
+        # id can not be reused by another sample
+        key = (metric, id(eval_sample))
+        cached = self.prompts.get(key)
+        if cached is not None and cached[0] is eval_sample:
+            return cached[1]
+        prompt = render(metric, eval_sample)
+        self.prompts[key] = (eval_sample, prompt)
+        if len(self.prompts) > self.max_size:
+            self.prompts.popitem(last=False)
+        return prompt
+
+
+class JudgeEvaluator(GroundedQAEvaluator):
+    """Evaluator of one of the judges of a MultiJudgeEvaluator, rendering its
+    prompts through the cache shared by all judges."""
+
+    def __init__(self, prompt_cache: PromptCache, **kwargs):
+        super().__init__(**kwargs)
+        self.prompt_cache = prompt_cache
+
+    def render_prompt(self, metric: str, eval_sample: EvaluationSample) -> str:
+        return self.prompt_cache.get_or_render(
+            metric, eval_sample, super().render_prompt
+        )
+
+
+def aggregate_scores(
+    scores: Sequence[Score | Failed], metric: str, aggregation: str
+) -> Score | Failed:
+    """Aggregate the scores given by several judges to one metric of a sample.
+
+    Failed judgements are left out. The aggregated score is the one of the first
+    judge that gave the most common value (majority) or the median value (median).
+    The median is only taken over the numeric values, unless most judges gave a
+    null value.
+    """
+    valid_scores = [score for score in scores if not isinstance(score, Failed)]
+    if not valid_scores:
+        return Failed(error=f"all judges failed on {metric}")
+    values = [getattr(score, metric) for score in valid_scores]
+    if aggregation == "majority":
+        counts = Counter(values)
+        value = max(values, key=lambda value: counts[value])
+    elif aggregation == "median":
+        numeric_values = [value for value in values if value is not None]
+        if len(numeric_values) * 2 <= len(values):
+            value = None
+        else:
+            value = statistics.median_low(numeric_values)
+    else:
+        raise ValueError(
+            f"Jury aggregation should be one of {JURY_AGGREGATIONS}, "
+            f"got {aggregation}"
+        )
+    return valid_scores[values.index(value)]
+
+
+def aggregate_evaluations(
+    evaluations: Sequence[GroundedQAEvaluation], aggregation: str
+) -> GroundedQAEvaluation:
+    """Aggregate the evaluations of one sample by several judges into the
+    evaluation of the jury."""
+    scores = {
+        metric: aggregate_scores(
+            [getattr(evaluation, metric) for evaluation in evaluations],
+            metric,
+            aggregation,
+        )
+        for metric in SCORE_METRICS
+    }
+    positive_acceptance, negative_rejection = (
+        get_positive_acceptance_negative_rejection(
+            scores["answer_relevancy"], scores["completeness"]
+        )
+    )
+    return GroundedQAEvaluation(
+        **scores,
+        positive_acceptance=positive_acceptance,
+        negative_rejection=negative_rejection,
+    )
+
+
+class MultiJudgeEvaluator:
+    def __init__(
+        self,
+        model_names: Sequence[str],
+        jury_aggregation: Optional[str] = None,
+        **kwargs,
+    ):
+        """Evaluator running several judge models on the same samples.
+
+        Each sample is evaluated by all judges at the same time, each prompt being
+        rendered once for all judges, and the samples are scheduled in a single
+        window shared by all judges.
+
+        Args:
+            model_names (Sequence[str]): Names of the judge models. They can be any
+            LiteLLM models.
+            jury_aggregation (Optional[str]): Aggregation of the judgements of all
+            judges into a jury evaluation, majority or median. By default, no jury
+            evaluation is made.
+            **kwargs: Arguments of the GroundedQAEvaluator of each judge.
+        """
+        if len(set(model_names)) != len(model_names):
+            raise ValueError(f"Judge models should be distinct, got {model_names}")
+        if jury_aggregation is not None and jury_aggregation not in JURY_AGGREGATIONS:
+            raise ValueError(
+                f"Jury aggregation should be one of {JURY_AGGREGATIONS}, "
+                f"got {jury_aggregation}"
+            )
+        self.jury_aggregation = jury_aggregation
+        self.prompt_cache = PromptCache()
+        self.judges = {
+            model_name: JudgeEvaluator(
+                self.prompt_cache, model_name=model_name, **kwargs
+            )
+            for model_name in model_names
+        }
+        self.concurrency_limiter = kwargs.get("concurrency_limiter")
+
+    async def __evaluate_judge(
+        self,
+        judge: GroundedQAEvaluator,
+        eval_sample: EvaluationSample,
+        journal: Optional[EvaluationJournal],
+    ) -> GroundedQAEvaluation:
+        evaluation = journal.get(eval_sample) if journal is not None else None
+        if evaluation is None:
+            evaluation = await judge.evaluate_single_sample(eval_sample)
+            if journal is not None:
+                journal.record(eval_sample, evaluation)
+        return evaluation
+
+    async def evaluate_single_sample(
+        self,
+        eval_sample: EvaluationSample,
+        journals: Optional[Dict[str, EvaluationJournal]] = None,
+    ) -> MultiJudgeEvaluation:
+        evaluations = await asyncio.gather(
+            *[
+                self.__evaluate_judge(
+                    judge,
+                    eval_sample,
+                    journals.get(model_name) if journals is not None else None,
+                )
+                for model_name, judge in self.judges.items()
+            ]
+        )
+        return MultiJudgeEvaluation(
+            judges=dict(zip(self.judges, evaluations)),
+            jury=(
+                aggregate_evaluations(evaluations, self.jury_aggregation)
+                if self.jury_aggregation is not None
+                else None
+            ),
+        )
+
+    async def aiter_evaluate(
+        self,
+        eval_samples: Iterable[EvaluationSample],
+        semaphore_size: int = 20,
+        journals: Optional[Dict[str, EvaluationJournal]] = None,
+    ) -> AsyncIterator[Tuple[int, MultiJudgeEvaluation]]:
+        """Evaluate samples with all judges and yield the evaluations of each
+        sample as soon as they are completed, along with the index of the sample.
+
+        At most semaphore_size samples are evaluated at the same time by the
+        workers of a SampleScheduler, or the window of the concurrency limiter
+        shared by the judges if there is one. The journals of the judges, keyed by
+        model name, record their evaluations and skip those already recorded.
+        """
+        scheduler: SampleScheduler[EvaluationSample, MultiJudgeEvaluation] = (
+            SampleScheduler(
+                lambda eval_sample: self.evaluate_single_sample(eval_sample, journals),
+                num_workers=semaphore_size,
+                concurrency_limiter=self.concurrency_limiter,
+            )
+        )
+        evaluations = scheduler.aiter(eval_samples)
+        async with aclosing(evaluations):
+            async for index, evaluation in evaluations:
+                yield index, evaluation
+
+    async def async_evaluate_multiple_samples(
+        self,
+        eval_samples: List[EvaluationSample],
+        semaphore_size: int = 20,
+        journals: Optional[Dict[str, EvaluationJournal]] = None,
+    ) -> List[MultiJudgeEvaluation]:
+        evaluations: List[MultiJudgeEvaluation] = [None] * len(eval_samples)
+        with tqdm(total=len(eval_samples)) as progress_bar:
+            async for index, evaluation in self.aiter_evaluate(
+                eval_samples, semaphore_size, journals
+            ):
+                evaluations[index] = evaluation
+                if self.concurrency_limiter is not None:
+                    progress_bar.set_postfix_str(
+                        str(self.concurrency_limiter), refresh=False
+                    )
+                progress_bar.update()
+        return evaluations
+
+    def log_usage(self) -> None:
+        for model_name, judge in self.judges.items():
+            judge.logger.info(f"Judge {model_name}")
+            judge.log_usage()
+
+    def compute_reports(
+        self, evaluations: List[MultiJudgeEvaluation]
+    ) -> MultiJudgeEvaluationsAndReports:
+        judges = {}
+        for model_name, judge in self.judges.items():
+            judge_evaluations = [
+                evaluation.judges[model_name] for evaluation in evaluations
+            ]
+            judges[model_name] = EvaluationsAndReport(
+                evaluations=judge_evaluations,
+                report=judge.compute_report(judge_evaluations),
+            )
+        jury = None
+        if self.jury_aggregation is not None:
+            jury_evaluations = [evaluation.jury for evaluation in evaluations]
+            # The usage and cascade statistics of the judges do not apply to the
+            # aggregated evaluations
+            jury = EvaluationsAndReport(
+                evaluations=jury_evaluations,
+                report=EvaluationColumns.from_evaluations(
+                    jury_evaluations
+                ).compute_report(),
+            )
+        return MultiJudgeEvaluationsAndReports(judges=judges, jury=jury)
+
+    def evaluate(
+        self,
+        eval_samples: List[EvaluationSample],
+        semaphore_size: int = 20,
+        journals: Optional[Dict[str, EvaluationJournal]] = None,
+    ) -> MultiJudgeEvaluationsAndReports:
+        evaluations = asyncio.run(
+            self.async_evaluate_multiple_samples(eval_samples, semaphore_size, journals)
+        )
+        self.log_usage()
+        return self.compute_reports(evaluations)
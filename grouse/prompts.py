@@ -0,0 +1,98 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from importlib_resources import files
+from jinja2 import Environment, FileSystemLoader, Template, TemplateNotFound
+
+from grouse.dtos import EvaluationSample
+
+SAMPLE_END_TAG = "[/SAMPLE]\n"
+
+
+class PromptRenderer:
+    def __init__(
+        self,
+        model_name: str = "gpt-4",
+        prompts_path: Optional[str] = None,
+        cache_friendly_prompts: bool = False,
+    ):
+        """Render the prompts of the metrics and build the messages sent to the
+        evaluator model, without calling it.
+
+        Args:
+            model_name (str): Name of the evaluator model.
+            prompts_path (Optional[str]): Path to the folder containing the prompts.
+            The default prompts are used for the templates it does not override.
+            cache_friendly_prompts (bool): Whether to put the task and the sample
+            at the start of the prompts, marked as cacheable for the providers
+            needing it.
+        """
+        self.model_name = model_name
+        self.cache_friendly_prompts = cache_friendly_prompts
+        self.default_environment = Environment(
+            loader=FileSystemLoader(files("grouse").joinpath("gpt4_prompts"))
+        )
+        if prompts_path is None:
+            self.environment = self.default_environment
+        else:
+            self.environment = Environment(loader=FileSystemLoader(prompts_path))
+
+    def get_template(self, name: str) -> Template:
+        """Get a template from the prompts path, or from the default prompts if
+        it is not overridden."""
+        try:
+            return self.environment.get_template(name)
+        except TemplateNotFound:
+            return self.default_environment.get_template(name)
+
+    def render_prompt(self, metric: str, eval_sample: EvaluationSample) -> str:
+        template = self.environment.get_template(f"{metric}.txt.jinja")
+        prompt = template.render(
+            input=eval_sample.input,
+            actual_output=eval_sample.actual_output,
+            expected_output=eval_sample.expected_output,
+            contexts=eval_sample.references,
+        )
+        if self.cache_friendly_prompts:
+            prompt = self.__move_sample_first(prompt)
+        return prompt
+
+    def __move_sample_first(self, prompt: str) -> str:
+        """Put the task and the sample section of the prompt at its start, before
+        the instructions and the answers, so that the prompts sharing the same
+        sample, such as those of another answer or judge, share this prefix. The
+        sections are only moved, the judge is given the same content."""
+        task_match = re.match(r"\[TASK\].*?\[/TASK\]\n", prompt, re.DOTALL)
+        sample_match = re.search(r"\[SAMPLE\].*?\[/SAMPLE\]\n?", prompt, re.DOTALL)
+        if task_match is None or sample_match is None:
+            logging.debug("Prompt without [TASK] or [SAMPLE] sections is not moved")
+            return prompt
+        instructions = (
+            prompt[task_match.end() : sample_match.start()]
+            + prompt[sample_match.end() :]
+        )
+        return task_match.group() + sample_match.group().strip() + "\n" + instructions
+
+    def build_messages(self, prompt: str) -> List[Dict[str, Any]]:
+        if self.cache_friendly_prompts:
+            prefix, separator, suffix = prompt.partition(SAMPLE_END_TAG)
+            if separator and self.__supports_cache_control():
+                return [
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prefix + separator,
+                                "cache_control": {"type": "ephemeral"},
+                            },
+                            {"type": "text", "text": suffix},
+                        ],
+                    }
+                ]
+        return [{"role": "user", "content": prompt}]
+
+    def __supports_cache_control(self) -> bool:
+        # Other providers, like OpenAI, cache the prompt prefixes automatically
+        return self.model_name.startswith("anthropic/") or "claude" in self.model_name
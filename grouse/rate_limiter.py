@@ -0,0 +1,67 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucketRateLimiter:
+    """Rate limiter enforcing both a number of requests per minute (RPM) and a
+    number of tokens per minute (TPM), each with a token bucket.
+
+    Each call reserves its request and tokens right away, possibly leaving the
+    buckets in debt, and waits until the debt is paid back. Calls are thus admitted
+    in the order they arrive, without holding any lock.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        """
+        Args:
+            rpm (Optional[int]): Maximum number of requests per minute.
+            tpm (Optional[int]): Maximum number of tokens (input and output) per
+            minute.
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.available_requests = float(rpm or 0)
+        self.available_tokens = float(tpm or 0)
+        self.last_refill = time.monotonic()
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        elapsed_minutes = (now - self.last_refill) / 60
+        self.last_refill = now
+        if self.rpm is not None:
+            self.available_requests = min(
+                self.rpm, self.available_requests + elapsed_minutes * self.rpm
+            )
+        if self.tpm is not None:
+            self.available_tokens = min(
+                self.tpm, self.available_tokens + elapsed_minutes * self.tpm
+            )
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve a request of the given number of tokens and return the number of
+        seconds to wait before sending it."""
+        self.__refill()
+        delay = 0.0
+        if self.rpm is not None:
+            self.available_requests -= 1
+            delay = max(delay, -self.available_requests / self.rpm * 60)
+        if self.tpm is not None:
+            # A request larger than the bucket is only delayed until it is full
+            self.available_tokens -= min(tokens, self.tpm)
+            delay = max(delay, -self.available_tokens / self.tpm * 60)
+        return delay
+
+    def refund(self, tokens: int) -> None:
+        """Give back reserved tokens that were not used."""
+        if self.tpm is not None:
+            self.__refill()
+            self.available_tokens = min(self.tpm, self.available_tokens + tokens)
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until a request of the given number of tokens can be sent and return
+        the number of seconds waited."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
@@ -0,0 +1,120 @@
+import gzip
+import io
+import itertools
+import json
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List
+
+from pydantic import TypeAdapter
+
+from grouse.dtos import EvaluationSample
+
+try:
+    import orjson
+
+    loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    loads = json.loads
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Reader of the rows of a dataset, keyed by the suffix of its path
+READERS: Dict[str, Callable[[str], Iterator[Dict[str, Any]]]] = {}
+
+_samples_adapter = TypeAdapter(List[EvaluationSample])
+
+
+def register_reader(
+    suffix: str, reader: Callable[[str], Iterator[Dict[str, Any]]]
+) -> None:
+    """Register the reader of the datasets whose path ends with a suffix.
+
+    Args:
+        suffix (str): Suffix of the paths, such as ".jsonl.gz".
+        reader (Callable[[str], Iterator[Dict[str, Any]]]): Function yielding the
+        rows of a dataset given its path, without loading it in memory.
+    """
+    READERS[suffix] = reader
+
+
+def _iter_json_lines(file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    for line in file:
+        if line.strip():
+            yield loads(line)
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as file:
+        yield from _iter_json_lines(file)
+
+
+def read_jsonl_gz(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rb") as file:
+        yield from _iter_json_lines(file)
+
+
+def read_jsonl_zst(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError(
+            "zstandard is required to read .zst datasets, install grouse[formats]"
+        ) from error
+    with open(path, "rb") as file:
+        with zstandard.ZstdDecompressor().stream_reader(file) as reader:
+            yield from _iter_json_lines(io.BufferedReader(reader))
+
+
+def read_parquet(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "pyarrow is required to read Parquet datasets, install grouse[formats]"
+        ) from error
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=DEFAULT_CHUNK_SIZE):
+        yield from batch.to_pylist()
+
+
+register_reader(".jsonl", read_jsonl)
+register_reader(".jsonl.gz", read_jsonl_gz)
+register_reader(".jsonl.zst", read_jsonl_zst)
+register_reader(".parquet", read_parquet)
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Read the rows of a dataset lazily, with the reader registered for the
+    longest suffix of its path. Paths without a registered suffix are read as
+    JSON lines."""
+    suffixes = sorted(
+        (suffix for suffix in READERS if path.endswith(suffix)), key=len, reverse=True
+    )
+    reader = READERS[suffixes[0]] if suffixes else read_jsonl
+    return reader(path)
+
+
+def iter_chunks(
+    rows: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[List[EvaluationSample]]:
+    """Validate rows into evaluation samples by chunks."""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield _samples_adapter.validate_python(chunk)
+
+
+def read_samples(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[EvaluationSample]:
+    """Read the evaluation samples of a dataset lazily, in chunks of chunk_size
+    rows validated at once, so that only one chunk is held in memory.
+
+    JSON lines datasets can be compressed with gzip (.jsonl.gz) or zstandard
+    (.jsonl.zst), and Parquet datasets (.parquet) are read by batches of rows.
+    Other formats can be supported with register_reader.
+
+    Args:
+        path (str): Path to the dataset.
+        chunk_size (int): Number of rows validated at once.
+    """
+    for chunk in iter_chunks(read_rows(path), chunk_size):
+        yield from chunk
@@ -1,5 +1,11 @@
+from typing import Dict, List, Optional, Tuple
+
 import litellm
 
+from grouse.rate_limiter import TokenBucketRateLimiter
+
+RATE_LIMITERS: Dict[Tuple[str, Optional[str]], TokenBucketRateLimiter] = {}
+
 
 def register_models():
     litellm.register_model(
@@ -21,3 +27,25 @@ def register_models():
             },
         }
     )
+
+
+def register_rate_limits(
+    model_name: str,
+    rpm: Optional[int] = None,
+    tpm: Optional[int] = None,
+    metric: Optional[str] = None,
+) -> None:
+    """Register the requests per minute and tokens per minute limits of a model.
+
+    If a metric is given, the limits only apply to the calls made for this metric,
+    on top of the limits of the model.
+    """
+    RATE_LIMITERS[(model_name, metric)] = TokenBucketRateLimiter(rpm=rpm, tpm=tpm)
+
+
+def get_rate_limiters(model_name: str, metric: str) -> List[TokenBucketRateLimiter]:
+    return [
+        RATE_LIMITERS[key]
+        for key in ((model_name, None), (model_name, metric))
+        if key in RATE_LIMITERS
+    ]
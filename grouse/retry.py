@@ -0,0 +1,84 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import litellm
+
+# Errors that may not happen again if the call is retried later
+TRANSIENT_ERRORS = (
+    litellm.RateLimitError,
+    litellm.Timeout,
+    litellm.APIConnectionError,
+    litellm.InternalServerError,
+    litellm.ServiceUnavailableError,
+    litellm.BadGatewayError,
+    asyncio.TimeoutError,
+)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Number of seconds to wait before retrying, as requested by the provider in
+    the Retry-After header of the response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        retry_after = headers["retry-after"]
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(retry_after).timestamp() - time.time()
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+class RetryPolicy:
+    """Retry policy for transient provider errors, with exponential backoff and
+    full jitter. The Retry-After header of the provider is honored when present."""
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        initial_delay: float = 1.0,
+        max_delay: float = 60.0,
+        retry_budget: Optional[int] = None,
+    ):
+        """
+        Args:
+            max_retries (int): Maximum number of retries of a call.
+            initial_delay (float): Maximum delay in seconds before the first retry.
+            max_delay (float): Maximum delay in seconds between two retries.
+            retry_budget (Optional[int]): Maximum number of retries over all calls.
+            Once it is spent, transient errors are no longer retried.
+        """
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+
+    def can_retry(self, attempt: int) -> bool:
+        return attempt < self.max_retries and (
+            self.retry_budget is None or self.retry_budget > 0
+        )
+
+    def get_delay(self, attempt: int, error: Exception) -> float:
+        """Delay in seconds before the retry following the given failed attempt,
+        spending one retry of the budget."""
+        if self.retry_budget is not None:
+            self.retry_budget -= 1
+        delay = random.uniform(0, min(self.max_delay, self.initial_delay * 2**attempt))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
@@ -0,0 +1,92 @@
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from grouse.dtos import EvaluationSample
+
+
+def allocate_sample(sample_size: int, strata_sizes: Dict[str, int]) -> Dict[str, int]:
+    """Number of samples drawn from each stratum, proportional to its size with
+    the largest remainder method.
+
+    Each stratum gets at least one sample when the sample size allows it, taken
+    from the largest allocations, so that all strata can be reweighted.
+    """
+    population_size = sum(strata_sizes.values())
+    if sample_size >= population_size:
+        return dict(strata_sizes)
+    quotas = {
+        stratum: sample_size * size / population_size
+        for stratum, size in strata_sizes.items()
+    }
+    allocation = {stratum: int(quota) for stratum, quota in quotas.items()}
+    by_remainder = sorted(
+        quotas, key=lambda stratum: quotas[stratum] - allocation[stratum], reverse=True
+    )
+    for stratum in by_remainder[: sample_size - sum(allocation.values())]:
+        allocation[stratum] += 1
+    if sample_size >= len(strata_sizes):
+        for stratum, size in allocation.items():
+            if size == 0:
+                largest = max(allocation, key=lambda other: allocation[other])
+                allocation[largest] -= 1
+                allocation[stratum] = 1
+    return allocation
+
+
+class StratifiedReservoirSampler:
+    """Stratified random sample of a stream of samples, read once.
+
+    A reservoir of sample_size samples is kept for each stratum, so that the number
+    of samples drawn from a stratum can be chosen once the size of all strata is
+    known. The memory used grows with the sample size and the number of strata,
+    not with the size of the stream.
+    """
+
+    def __init__(self, sample_size: int, seed: Optional[int] = None):
+        """
+        Args:
+            sample_size (int): Number of samples to draw.
+            seed (Optional[int]): Seed of the random number generator.
+        """
+        self.sample_size = sample_size
+        self.random = random.Random(seed)
+        self.reservoirs: Dict[str, List[Tuple[int, EvaluationSample]]] = {}
+        self.strata_sizes: Dict[str, int] = {}
+        self.population_size = 0
+
+    def add(self, eval_sample: EvaluationSample, stratum: Any = None) -> None:
+        """Add the next sample of the stream, with the value of its stratum."""
+        key = json.dumps(stratum, sort_keys=True, default=str)
+        index = self.population_size
+        self.population_size += 1
+        stratum_size = self.strata_sizes.get(key, 0) + 1
+        self.strata_sizes[key] = stratum_size
+        reservoir = self.reservoirs.setdefault(key, [])
+        if len(reservoir) < self.sample_size:
+            reservoir.append((index, eval_sample))
+        else:
+            replaced = self.random.randrange(stratum_size)
+            if replaced < self.sample_size:
+                reservoir[replaced] = (index, eval_sample)
+
+    def sample(self) -> Tuple[List[EvaluationSample], List[float]]:
+        """Drawn samples in the order of the stream, and their weights.
+
+        The weight of a sample is the number of samples of its stratum it
+        represents, so that weighted averages estimate the averages of the whole
+        stream.
+        """
+        allocation = allocate_sample(self.sample_size, self.strata_sizes)
+        sample: List[Tuple[int, EvaluationSample, float]] = []
+        for key, reservoir in self.reservoirs.items():
+            # A random subset of a uniform reservoir is still uniform
+            stratum_sample = self.random.sample(reservoir, allocation[key])
+            weight = self.strata_sizes[key] / max(allocation[key], 1)
+            sample.extend(
+                (index, eval_sample, weight) for index, eval_sample in stratum_sample
+            )
+        sample.sort(key=lambda indexed_sample: indexed_sample[0])
+        return [eval_sample for _, eval_sample, _ in sample], [
+            weight for _, _, weight in sample
+        ]
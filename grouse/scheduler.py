@@ -0,0 +1,160 @@
+import asyncio
+import inspect
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    Iterable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from grouse.concurrency import AdaptiveConcurrencyLimiter
+
+Sample = TypeVar("Sample")
+Result = TypeVar("Result")
+
+
+class SampleScheduler(Generic[Sample, Result]):
+    def __init__(
+        self,
+        process: Callable[[Sample], Awaitable[Result]],
+        num_workers: int = 20,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        queue_size: Optional[int] = None,
+    ):
+        """Producer/consumer scheduler of the evaluation of samples, with a fixed
+        number of workers.
+
+        A producer pulls samples lazily from an iterable into a bounded queue, and
+        each worker takes the next sample from the queue once the previous one is
+        processed and its result is passed to the sink. The memory used thus
+        depends on the number of workers and the size of the queue, not on the
+        number of samples.
+
+        Args:
+            process (Callable[[Sample], Awaitable[Result]]): Coroutine function
+            processing a sample.
+            num_workers (int): Number of workers, the maximum number of samples
+            processed at the same time.
+            concurrency_limiter (Optional[AdaptiveConcurrencyLimiter]): Limiter
+            whose current window is the number of samples processed at the same
+            time. There is then one worker per call allowed at most by the limiter
+            instead of num_workers.
+            queue_size (Optional[int]): Maximum number of samples pulled ahead of
+            the workers, the number of workers by default.
+        """
+        if num_workers < 1:
+            raise ValueError("The number of workers should be at least 1")
+        self.process = process
+        self.concurrency_limiter = concurrency_limiter
+        self.num_workers = (
+            num_workers
+            if concurrency_limiter is None
+            else concurrency_limiter.max_limit
+        )
+        self.queue_size = queue_size if queue_size is not None else self.num_workers
+        self.active = 0
+
+    def __has_slot(self) -> bool:
+        return (
+            self.concurrency_limiter is None
+            or self.active < self.concurrency_limiter.window
+        )
+
+    async def __produce(
+        self,
+        samples: Iterable[Sample],
+        queue: "asyncio.Queue[Optional[Tuple[int, Sample]]]",
+    ) -> None:
+        for indexed_sample in enumerate(samples):
+            await queue.put(indexed_sample)
+        # One end marker per worker
+        for _ in range(self.num_workers):
+            await queue.put(None)
+
+    async def __work(
+        self,
+        queue: "asyncio.Queue[Optional[Tuple[int, Sample]]]",
+        sink: Callable[[int, Result], Any],
+        slots: asyncio.Condition,
+    ) -> None:
+        while True:
+            async with slots:
+                await slots.wait_for(self.__has_slot)
+                self.active += 1
+            try:
+                indexed_sample = await queue.get()
+                if indexed_sample is None:
+                    return
+                index, sample = indexed_sample
+                result = await self.process(sample)
+            finally:
+                async with slots:
+                    self.active -= 1
+                    slots.notify_all()
+            sunk = sink(index, result)
+            if inspect.isawaitable(sunk):
+                await sunk
+
+    async def run(
+        self, samples: Iterable[Sample], sink: Callable[[int, Result], Any]
+    ) -> None:
+        """Process samples and pass each result to the sink as soon as it is
+        completed, along with the index of its sample. The sink can be a function
+        or a coroutine function, awaited before the worker takes its next sample.
+
+        If a sample fails to be processed, the other workers are cancelled and the
+        error is raised.
+        """
+        queue: asyncio.Queue[Optional[Tuple[int, Sample]]] = asyncio.Queue(
+            maxsize=self.queue_size
+        )
+        slots = asyncio.Condition()
+        tasks = [asyncio.create_task(self.__produce(samples, queue))] + [
+            asyncio.create_task(self.__work(queue, sink, slots))
+            for _ in range(self.num_workers)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aiter(
+        self, samples: Iterable[Sample]
+    ) -> AsyncIterator[Tuple[int, Result]]:
+        """Process samples and yield each result as soon as it is completed, along
+        with the index of its sample.
+
+        A worker only takes its next sample once its result has been consumed, and
+        closing the iterator cancels the samples being processed.
+        """
+        results: asyncio.Queue[Optional[Tuple[int, Result, asyncio.Future[None]]]] = (
+            asyncio.Queue()
+        )
+
+        async def sink(index: int, result: Result) -> None:
+            consumed = asyncio.get_running_loop().create_future()
+            results.put_nowait((index, result, consumed))
+            await consumed
+
+        async def run() -> None:
+            try:
+                await self.run(samples, sink)
+            finally:
+                results.put_nowait(None)
+
+        runner = asyncio.create_task(run())
+        try:
+            while (entry := await results.get()) is not None:
+                index, result, consumed = entry
+                yield index, result
+                consumed.set_result(None)
+            # Raise the error of a failed sample, if any
+            await runner
+        finally:
+            runner.cancel()
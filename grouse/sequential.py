@@ -0,0 +1,112 @@
+import math
+from statistics import NormalDist
+from typing import Dict, Sequence
+
+from grouse.dtos import Failed, GroundedQAEvaluation
+
+SCORE_METRICS = ("answer_relevancy", "completeness", "faithfulness", "usefulness")
+# Width of the scale of each metric, from its lowest to its highest score
+SCORE_RANGES = {
+    "answer_relevancy": 4.0,
+    "completeness": 4.0,
+    "faithfulness": 1.0,
+    "usefulness": 1.0,
+}
+# Usefulness is only judged on the samples whose answer finds no document
+DEFAULT_TARGET_METRICS = ("answer_relevancy", "completeness", "faithfulness")
+
+
+class RunningEstimate:
+    """Running mean and variance of the values of a metric, with Welford's
+    algorithm."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.squared_deviations = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squared_deviations += delta * (value - self.mean)
+
+    @property
+    def standard_error(self) -> float:
+        if self.count < 2:
+            return math.inf
+        variance = self.squared_deviations / (self.count - 1)
+        return math.sqrt(variance / self.count)
+
+
+class SequentialStoppingRule:
+    def __init__(
+        self,
+        max_half_width: float = 0.1,
+        metrics: Sequence[str] = DEFAULT_TARGET_METRICS,
+        confidence_level: float = 0.95,
+        min_samples: int = 30,
+    ):
+        """Stopping rule of a sequential evaluation, reached once the confidence
+        interval of the mean of every target metric is narrow enough.
+
+        The intervals are normal approximations computed from running estimates of
+        the mean and variance of each metric, leaving out null and failed values.
+        Their half widths are relative to the range of the scale of each metric, so
+        that the same target applies to the 1 to 5 and to the binary metrics.
+
+        Args:
+            max_half_width (float): Maximum half width of the confidence intervals,
+            as a share of the range of the scale of each metric: 0.1 is 0.4 points
+            of answer relevancy and completeness, and 0.1 of faithfulness and
+            usefulness.
+            metrics (Sequence[str]): Target metrics, among answer_relevancy,
+            completeness, faithfulness and usefulness.
+            confidence_level (float): Confidence level of the intervals.
+            min_samples (int): Minimum number of values of each target metric
+            before stopping, so that the variance estimates are reliable.
+        """
+        for metric in metrics:
+            if metric not in SCORE_METRICS:
+                raise ValueError(
+                    f"Target metrics should be among {SCORE_METRICS}, got {metric}"
+                )
+        self.max_half_width = max_half_width
+        self.metrics = tuple(metrics)
+        self.min_samples = min_samples
+        self.z_score = NormalDist().inv_cdf((1 + confidence_level) / 2)
+        self.estimates: Dict[str, RunningEstimate] = {
+            metric: RunningEstimate() for metric in self.metrics
+        }
+        self.num_samples = 0
+
+    def update(self, evaluation: GroundedQAEvaluation) -> None:
+        self.num_samples += 1
+        for metric, estimate in self.estimates.items():
+            score = getattr(evaluation, metric)
+            if isinstance(score, Failed):
+                continue
+            value = getattr(score, metric)
+            if value is not None:
+                estimate.update(value)
+
+    def half_width(self, metric: str) -> float:
+        """Half width of the confidence interval of a metric, in points of its
+        scale."""
+        return self.z_score * self.estimates[metric].standard_error
+
+    def relative_half_width(self, metric: str) -> float:
+        return self.half_width(metric) / SCORE_RANGES[metric]
+
+    def is_reached(self) -> bool:
+        return all(
+            estimate.count >= self.min_samples
+            and self.relative_half_width(metric) <= self.max_half_width
+            for metric, estimate in self.estimates.items()
+        )
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{metric}={estimate.mean:.2f}±{self.half_width(metric):.2f}"
+            for metric, estimate in self.estimates.items()
+        )
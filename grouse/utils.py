@@ -1,3 +1,5 @@
+import hashlib
+import json
 import math
 from json import JSONEncoder
 from typing import Any, List, Literal, Optional, Tuple
@@ -33,6 +35,30 @@ class NanConverter(JSONEncoder):
         return super().iterencode(nan_to_none(obj), *args, **kwargs)
 
 
+def get_sample_hash(eval_sample: EvaluationSample) -> str:
+    """Stable hash of the content of a sample. The metadata is left out as it is
+    not seen by the evaluator."""
+    content = json.dumps(
+        [
+            eval_sample.input,
+            eval_sample.actual_output,
+            eval_sample.expected_output,
+            eval_sample.references,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def get_question_hash(eval_sample: EvaluationSample) -> str:
+    """Stable hash of the question of a sample, its input and expected output,
+    shared by the answers of different versions of a system to this question."""
+    content = json.dumps(
+        [eval_sample.input, eval_sample.expected_output], ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
 def get_positive_acceptance_negative_rejection(
     answer_relevancy: AnswerRelevancy | Failed,
     completeness: Completeness | Failed,
@@ -0,0 +1,160 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import jsonlines
+
+from grouse.columnar import RATE_METRICS, SCORE_METRICS
+from grouse.dtos import Failed, GroundedQAEvaluation
+
+# Number of evaluations buffered before being written as a Parquet row group
+DEFAULT_BATCH_SIZE = 10000
+
+
+class EvaluationWriter(ABC):
+    """Writer of the evaluations of a run, with the index of their sample."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def write(self, evaluation: GroundedQAEvaluation, index: Optional[int]) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "EvaluationWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class JsonlEvaluationWriter(EvaluationWriter):
+    """Write each evaluation as a line of a jsonlines file as soon as it is
+    given."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.writer = jsonlines.open(path, "w", flush=True)
+
+    def write(self, evaluation: GroundedQAEvaluation, index: Optional[int]) -> None:
+        if index is None:
+            self.writer.write(evaluation.model_dump(mode="json"))
+        else:
+            self.writer.write({"index": index, **evaluation.model_dump(mode="json")})
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def flatten_evaluation(evaluation: GroundedQAEvaluation) -> Dict[str, Any]:
+    """Flatten an evaluation into the columns of the Parquet schema, with a mask of the
+    failed values of each metric and the error of the failed judgements."""
+    row: Dict[str, Any] = {"answer_affirms_no_document_answers": None}
+    for metric in SCORE_METRICS + RATE_METRICS:
+        value = getattr(evaluation, metric)
+        is_failed = isinstance(value, Failed)
+        row[f"{metric}_failed"] = is_failed
+        row[f"{metric}_error"] = value.error if is_failed else None
+        if metric in RATE_METRICS:
+            row[metric] = None if is_failed else value
+            continue
+        row[metric] = None if is_failed else getattr(value, metric)
+        row[f"{metric}_justification"] = (
+            None if is_failed else getattr(value, f"{metric}_justification")
+        )
+        if metric == "answer_relevancy" and not is_failed:
+            row["answer_affirms_no_document_answers"] = (
+                value.answer_affirms_no_document_answers
+            )
+    return row
+
+
+def get_parquet_schema() -> Any:
+    import pyarrow
+
+    fields = [("index", pyarrow.int64())]
+    for metric in SCORE_METRICS + RATE_METRICS:
+        fields.append((metric, pyarrow.int8()))
+        fields.append((f"{metric}_failed", pyarrow.bool_()))
+        fields.append((f"{metric}_error", pyarrow.string()))
+        if metric in SCORE_METRICS:
+            fields.append((f"{metric}_justification", pyarrow.string()))
+    fields.append(("answer_affirms_no_document_answers", pyarrow.bool_()))
+    return pyarrow.schema(fields)
+
+
+class ParquetEvaluationWriter(EvaluationWriter):
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Write evaluations to a Parquet file, flattened into one column per score
+        with masks of the failed values, by row groups of batch_size evaluations.
+
+        Justifications and errors are dictionary encoded and the file is compressed
+        with zstandard, so repeated strings are only stored once.
+
+        Args:
+            path (str): Path to the Parquet file.
+            batch_size (int): Number of evaluations buffered before being written.
+        """
+        try:
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError(
+                "pyarrow is required to write Parquet evaluations, "
+                "install grouse[formats]"
+            ) from error
+        super().__init__(path)
+        self.batch_size = batch_size
+        self.schema = get_parquet_schema()
+        self.writer = pyarrow.parquet.ParquetWriter(
+            path,
+            self.schema,
+            compression="zstd",
+            use_dictionary=[
+                name
+                for name in self.schema.names
+                if name.endswith(("_justification", "_error"))
+            ],
+        )
+        self.buffer: Dict[str, List[Any]] = {name: [] for name in self.schema.names}
+        self.num_rows = 0
+
+    def write(self, evaluation: GroundedQAEvaluation, index: Optional[int]) -> None:
+        row = flatten_evaluation(evaluation)
+        row["index"] = self.num_rows if index is None else index
+        for name, column in self.buffer.items():
+            column.append(row[name])
+        self.num_rows += 1
+        if len(self.buffer["index"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        import pyarrow
+
+        if not self.buffer["index"]:
+            return
+        self.writer.write_table(
+            pyarrow.Table.from_pydict(self.buffer, schema=self.schema)
+        )
+        self.buffer = {name: [] for name in self.schema.names}
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+
+EVALUATIONS_FILE_NAMES = {
+    "jsonl": "evaluations.jsonl",
+    "parquet": "evaluations.parquet",
+}
+OUTPUT_FORMATS = tuple(EVALUATIONS_FILE_NAMES)
+
+
+def open_evaluation_writer(path: str) -> EvaluationWriter:
+    """Open the writer of an evaluations file, in Parquet if its path ends with
+    .parquet and in jsonlines otherwise."""
+    if path.endswith(".parquet"):
+        return ParquetEvaluationWriter(path)
+    return JsonlEvaluationWriter(path)
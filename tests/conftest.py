@@ -0,0 +1,10 @@
+import os
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> str:
+    """Location of the LiteLLM disk cache enabled by the evaluators of a test."""
+    return os.path.join(tmp_path, "litellm_cache")
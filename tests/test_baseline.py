@@ -0,0 +1,143 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from grouse import GroundedQAEvaluator
+from grouse.baseline import Baseline
+from grouse.columnar import EvaluationColumns
+from grouse.dtos import (
+    AnswerRelevancy,
+    Completeness,
+    EvaluationSample,
+    Failed,
+    Faithfulness,
+    GroundedQAEvaluation,
+    Usefulness,
+)
+from grouse.journal import JOURNAL_FILE_NAME, EvaluationJournal
+
+# Hash of the configuration of the evaluator that made the baseline evaluations
+CONFIG_HASH = "baseline-config-hash"
+
+
+def make_sample(input: str, actual_output: str) -> EvaluationSample:
+    return EvaluationSample(
+        input=input,
+        actual_output=actual_output,
+        expected_output="Paris",
+        references=["Paris"],
+    )
+
+
+def make_evaluation(completeness: int) -> GroundedQAEvaluation:
+    return GroundedQAEvaluation(
+        answer_relevancy=AnswerRelevancy(
+            answer_affirms_no_document_answers=False,
+            answer_relevancy_justification="",
+            answer_relevancy=None,
+        ),
+        completeness=Completeness(
+            completeness_justification="", completeness=completeness
+        ),
+        faithfulness=Faithfulness(faithfulness_justification="", faithfulness=None),
+        usefulness=Usefulness(usefulness_justification="", usefulness=None),
+        positive_acceptance=None,
+        negative_rejection=None,
+    )
+
+
+@pytest.fixture
+def baseline_dir_path(tmp_path: Path) -> str:
+    baseline_dir_path = os.path.join(tmp_path, "baseline")
+    os.makedirs(baseline_dir_path)
+    with EvaluationJournal(
+        os.path.join(baseline_dir_path, JOURNAL_FILE_NAME), config_hash=CONFIG_HASH
+    ) as journal:
+        journal.record(make_sample("a", "Paris"), make_evaluation(5))
+        journal.record(make_sample("b", "Lyon"), make_evaluation(2))
+        journal.record(make_sample("c", "Paris"), make_evaluation(4))
+    with open(
+        os.path.join(baseline_dir_path, "report.json"), "w", encoding="utf-8"
+    ) as file:
+        json.dump({"completeness": 11 / 3, "answer_relevancy": None}, file)
+    return baseline_dir_path
+
+
+def test_reuse_baseline(tmp_path: Path, baseline_dir_path: str) -> None:
+    path = os.path.join(tmp_path, JOURNAL_FILE_NAME)
+    with EvaluationJournal(
+        path,
+        baseline=Baseline(baseline_dir_path, CONFIG_HASH),
+        config_hash=CONFIG_HASH,
+    ) as journal:
+        assert journal.get(make_sample("a", "Paris")) == make_evaluation(5)
+        assert journal.get(make_sample("b", "Paris")) is None
+
+    # Reused evaluations are copied to the new journal
+    with EvaluationJournal(path, resume=True, config_hash=CONFIG_HASH) as journal:
+        assert journal.get(make_sample("a", "Paris")) == make_evaluation(5)
+
+
+def test_evaluate_failed_baseline_evaluations_again(tmp_path: Path) -> None:
+    failed_evaluation = make_evaluation(4).model_copy(
+        update={"completeness": Failed(error="Rate limited")}
+    )
+    with EvaluationJournal(
+        os.path.join(tmp_path, JOURNAL_FILE_NAME), config_hash=CONFIG_HASH
+    ) as journal:
+        journal.record(make_sample("a", "Paris"), failed_evaluation)
+        journal.record(make_sample("b", "Paris"), make_evaluation(5))
+
+    baseline = Baseline(str(tmp_path), CONFIG_HASH)
+    assert baseline.get(make_sample("a", "Paris")) is None
+    assert baseline.get(make_sample("b", "Paris")) == make_evaluation(5)
+
+
+def test_refuse_baseline_of_another_configuration(
+    baseline_dir_path: str, cache_path: str
+) -> None:
+    config_hash = GroundedQAEvaluator(
+        model_name="gpt-4o-mini", cache_path=cache_path
+    ).get_config_hash()
+    for evaluator in (
+        GroundedQAEvaluator(model_name="gpt-4o", cache_path=cache_path),
+        GroundedQAEvaluator(
+            model_name="gpt-4o-mini", prompts_path="prompts", cache_path=cache_path
+        ),
+        GroundedQAEvaluator(
+            model_name="gpt-4o-mini",
+            cascade_model_name="gpt-4o",
+            cache_path=cache_path,
+        ),
+    ):
+        assert evaluator.get_config_hash() != config_hash
+        with pytest.raises(ValueError):
+            Baseline(baseline_dir_path, evaluator.get_config_hash())
+
+
+def test_compute_diff(baseline_dir_path: str) -> None:
+    baseline = Baseline(baseline_dir_path)
+    eval_samples = [
+        make_sample("a", "Paris"),
+        make_sample("b", "Paris"),
+        make_sample("d", "Paris"),
+    ]
+    evaluations = [make_evaluation(5), make_evaluation(5), make_evaluation(3)]
+    columns = EvaluationColumns.from_evaluations(evaluations)
+    diff = baseline.compute_diff(eval_samples, columns, columns.compute_report())
+
+    assert diff.unchanged_samples == 1
+    assert diff.changed_samples == 1
+    assert diff.new_samples == 1
+    assert diff.removed_samples == 1
+    assert diff.score_deltas["completeness"] == 3
+    assert diff.improved_samples["completeness"] == 1
+    assert diff.regressed_samples["completeness"] == 0
+    assert diff.report_deltas["completeness"] == pytest.approx(13 / 3 - 11 / 3)
+
+
+def test_missing_baseline(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        Baseline(str(tmp_path))
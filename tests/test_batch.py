@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import litellm
+
+from grouse.batch import BatchGroundedQAEvaluator, LocalBatchService
+from grouse.dtos import EvaluationSample
+
+SCORES = {
+    "answer_relevancy": {
+        "answer_affirms_no_document_answers": True,
+        "answer_relevancy_justification": "No document answers.",
+        "answer_relevancy": None,
+    },
+    "completeness": {"completeness_justification": "", "completeness": None},
+    "usefulness": {"usefulness_justification": "Related.", "usefulness": 1},
+    "faithfulness": {"faithfulness_justification": "Sourced.", "faithfulness": 1},
+}
+
+EVAL_SAMPLES = [
+    EvaluationSample(
+        input="Quel est la capitale de la France ?",
+        actual_output="Aucun document ne répond. Lyon est une ville.[1]",
+        expected_output="Paris[1]",
+        references=["Lyon est une ville."],
+    )
+] * 2
+
+
+def make_local_batch_service(
+    directory: str, requested_metrics: List[str]
+) -> LocalBatchService:
+    def respond(body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = body["messages"][0]["content"]
+        metric = next(
+            metric for metric in SCORES if f"{metric}_justification" in prompt
+        )
+        requested_metrics.append(metric)
+        content = json.dumps({"answer_1": SCORES[metric], "answer_2": SCORES[metric]})
+        return {
+            "id": "chatcmpl",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }
+
+    return LocalBatchService(directory, respond)
+
+
+def test_batch_evaluation(tmp_path: Path) -> None:
+    requested_metrics: List[str] = []
+    evaluator = BatchGroundedQAEvaluator(
+        batch_service=make_local_batch_service(
+            os.path.join(tmp_path, "service"), requested_metrics
+        ),
+        work_dir=os.path.join(tmp_path, "batches"),
+        model_name="gpt-4o-mini",
+        cache_path=os.path.join(tmp_path, "litellm_cache"),
+    )
+    evaluations = evaluator.evaluate_multiple_samples(EVAL_SAMPLES)
+
+    # Usefulness depends on answer relevancy and faithfulness on usefulness
+    assert evaluator.waves == 3
+    assert requested_metrics[:4] == ["answer_relevancy", "completeness"] * 2
+    assert requested_metrics[4:] == ["usefulness"] * 2 + ["faithfulness"] * 2
+    assert all(evaluation.usefulness.usefulness == 1 for evaluation in evaluations)
+    assert all(evaluation.faithfulness.faithfulness == 1 for evaluation in evaluations)
+    assert all(evaluation.positive_acceptance == 1 for evaluation in evaluations)
+
+
+def test_wave_waits_for_slow_evaluations(tmp_path: Path) -> None:
+    class SlowBatchEvaluator(BatchGroundedQAEvaluator):
+        async def complete(
+            self, metric: str, messages: List[Dict[str, str]]
+        ) -> litellm.ModelResponse:
+            # Completeness requests are only sent after some I/O
+            if metric == "completeness":
+                await asyncio.sleep(0.01)
+            return await super().complete(metric, messages)
+
+    requested_metrics: List[str] = []
+    evaluator = SlowBatchEvaluator(
+        batch_service=make_local_batch_service(
+            os.path.join(tmp_path, "service"), requested_metrics
+        ),
+        work_dir=os.path.join(tmp_path, "batches"),
+        model_name="gpt-4o-mini",
+        cache_path=os.path.join(tmp_path, "litellm_cache"),
+        speculative_metrics=["usefulness"],
+    )
+    evaluator.evaluate_multiple_samples(EVAL_SAMPLES)
+
+    assert evaluator.waves == 2
+    assert sorted(requested_metrics[:6]) == sorted(
+        ["answer_relevancy", "completeness", "usefulness"] * 2
+    )
+    assert requested_metrics[6:] == ["faithfulness"] * 2
@@ -0,0 +1,190 @@
+import math
+from pathlib import Path
+
+import jsonlines
+import numpy as np
+import pytest
+
+from grouse.columnar import EvaluationColumns, get_metadata_groups
+from grouse.dtos import (
+    AnswerRelevancy,
+    Completeness,
+    EvaluationSample,
+    Failed,
+    Faithfulness,
+    GroundedQAEvaluation,
+    Usefulness,
+)
+
+
+def make_evaluation(
+    answer_relevancy: int | None | Failed, faithfulness: int | None | Failed
+) -> GroundedQAEvaluation:
+    return GroundedQAEvaluation(
+        answer_relevancy=(
+            answer_relevancy
+            if isinstance(answer_relevancy, Failed)
+            else AnswerRelevancy(
+                answer_affirms_no_document_answers=answer_relevancy is None,
+                answer_relevancy_justification="",
+                answer_relevancy=answer_relevancy,
+            )
+        ),
+        completeness=Completeness(completeness_justification="", completeness=5),
+        faithfulness=(
+            faithfulness
+            if isinstance(faithfulness, Failed)
+            else Faithfulness(faithfulness_justification="", faithfulness=faithfulness)
+        ),
+        usefulness=Usefulness(usefulness_justification="", usefulness=None),
+        positive_acceptance=None,
+        negative_rejection=0,
+    )
+
+
+EVALUATIONS = [
+    make_evaluation(5, 1),
+    make_evaluation(2, 0),
+    make_evaluation(None, None),
+    make_evaluation(Failed(error="parsing failed"), Failed()),
+]
+
+
+class TestEvaluationColumns:
+    def test_compute_report(self) -> None:
+        columns = EvaluationColumns.from_evaluations(EVALUATIONS)
+        assert len(columns) == 4
+        assert columns.null("answer_relevancy").tolist() == [False, False, True, False]
+        assert columns.failed["faithfulness"].tolist() == [False, False, False, True]
+
+        report = columns.compute_report()
+        assert report.answer_relevancy == 3.5
+        assert report.answer_relevancy_parsing_success == 0.75
+        assert report.completeness == 5
+        assert report.faithfulness == 0.5
+        assert math.isnan(report.usefulness)
+        assert report.usefulness_parse_success == 1
+        assert math.isnan(report.positive_acceptance)
+        assert report.negative_rejection == 0
+        assert math.isnan(report.mean)
+
+    def test_slice(self) -> None:
+        columns = EvaluationColumns.from_evaluations(EVALUATIONS)
+        report = columns[np.array([True, False, False, True])].compute_report()
+        assert report.answer_relevancy == 5
+        assert report.faithfulness_parsing_success == 0.5
+        assert math.isnan(columns[:0].compute_report().completeness_parsing_success)
+
+    def test_from_jsonl(self, tmp_path: Path) -> None:
+        path = tmp_path / "evaluations.jsonl"
+        with jsonlines.open(path, "w") as writer:
+            # Streamed evaluations are written in completion order
+            for index, evaluation in reversed(list(enumerate(EVALUATIONS))):
+                writer.write({"index": index, **evaluation.model_dump(mode="json")})
+        columns = EvaluationColumns.from_jsonl(str(path))
+        expected = EvaluationColumns.from_evaluations(EVALUATIONS)
+        for column, values in expected.values.items():
+            np.testing.assert_array_equal(columns.values[column], values)
+            np.testing.assert_array_equal(
+                columns.failed[column], expected.failed[column]
+            )
+
+    def test_compute_group_reports(self) -> None:
+        columns = EvaluationColumns.from_evaluations(EVALUATIONS)
+        groups = [{"domain": "a"}, {"domain": "b"}, {"domain": "a"}, {"domain": None}]
+        group_reports = columns.compute_group_reports(groups)
+        assert [group_report.group for group_report in group_reports] == [
+            {"domain": "a"},
+            {"domain": "b"},
+            {"domain": None},
+        ]
+        assert [group_report.num_samples for group_report in group_reports] == [
+            2,
+            1,
+            1,
+        ]
+        assert group_reports[0].report.answer_relevancy == 5
+        assert group_reports[1].report.faithfulness == 0
+        assert group_reports[2].report.answer_relevancy_parsing_success == 0
+        assert math.isnan(group_reports[2].report.answer_relevancy)
+
+        # Reports of the groups match those of the slices
+        labels = np.array(["a", "b", "a", "null"])
+        for group_report, label in zip(group_reports, ["a", "b", "null"]):
+            expected = columns[labels == label].compute_report()
+            assert group_report.report.model_dump() == pytest.approx(
+                expected.model_dump(), nan_ok=True
+            )
+
+    def test_weights(self) -> None:
+        columns = EvaluationColumns.from_evaluations(EVALUATIONS)
+        columns.weights = np.array([3.0, 1.0, 1.0, 1.0])
+        report = columns.compute_report()
+        assert report.answer_relevancy == 4.25
+        assert report.faithfulness == 0.75
+        assert report.answer_relevancy_parsing_success == 5 / 6
+        assert columns[:2].compute_report().answer_relevancy == 4.25
+        assert columns.mean("answer_relevancy") == 4.25
+        low, high = columns.compute_confidence_intervals(100, seed=0)["completeness"]
+        assert low == high == 5
+
+    def test_compute_confidence_intervals(self) -> None:
+        columns = EvaluationColumns.from_evaluations(EVALUATIONS * 25)
+        report = columns.compute_report(num_resamples=2000, seed=0)
+        confidence_intervals = report.confidence_intervals
+        low, high = confidence_intervals["answer_relevancy"]
+        assert 2 <= low < report.answer_relevancy < high <= 5
+        assert confidence_intervals["completeness"] == (5, 5)
+        low, high = confidence_intervals["answer_relevancy_parsing_success"]
+        assert low < 0.75 < high
+        assert all(math.isnan(bound) for bound in confidence_intervals["usefulness"])
+
+        # Same seed, same intervals
+        assert (
+            columns.compute_confidence_intervals(2000, seed=0)["answer_relevancy"]
+            == (confidence_intervals["answer_relevancy"])
+        )
+
+        # Resamples of the distinct rows match a naive bootstrap of the samples
+        rng = np.random.default_rng(1)
+        values = columns.values["answer_relevancy"]
+        naive_means = [
+            np.nanmean(values[rng.integers(0, len(values), len(values))])
+            for _ in range(2000)
+        ]
+        naive_low, naive_high = np.quantile(naive_means, [0.025, 0.975])
+        low, high = confidence_intervals["answer_relevancy"]
+        assert low == pytest.approx(naive_low, abs=0.15)
+        assert high == pytest.approx(naive_high, abs=0.15)
+
+    def test_compute_group_confidence_intervals(self) -> None:
+        columns = EvaluationColumns.from_evaluations(EVALUATIONS * 10)
+        groups = [{"domain": index % 2} for index in range(len(columns))]
+        group_reports = columns.compute_group_reports(groups, num_resamples=100, seed=0)
+        assert len(group_reports) == 2
+        for group_report in group_reports:
+            assert group_report.report.confidence_intervals["completeness"] == (5, 5)
+
+
+def test_get_metadata_groups() -> None:
+    eval_samples = [
+        EvaluationSample(
+            input="",
+            actual_output="",
+            expected_output="",
+            references=[],
+            metadata=metadata,
+        )
+        for metadata in [
+            {"domain": "a", "source": {"language": "en"}},
+            {"domain": "b"},
+            None,
+        ]
+    ]
+    assert get_metadata_groups(
+        eval_samples, ["metadata.domain", "source.language"]
+    ) == [
+        {"domain": "a", "source.language": "en"},
+        {"domain": "b", "source.language": None},
+        {"domain": None, "source.language": None},
+    ]
@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from grouse import GroundedQAEvaluator
+from grouse.columnar import EvaluationColumns
+from grouse.compare import (
+    bootstrap_mean_interval,
+    compare_columns,
+    compare_systems,
+    pair_samples,
+    sign_test_p_value,
+)
+from grouse.dtos import (
+    Completeness,
+    EvaluationSample,
+    Failed,
+    GroundedQAEvaluation,
+)
+
+
+def make_sample(input: str, actual_output: str) -> EvaluationSample:
+    return EvaluationSample(
+        input=input,
+        actual_output=actual_output,
+        expected_output="Paris",
+        references=["Paris"],
+    )
+
+
+def make_evaluation(completeness: int | None | Failed) -> GroundedQAEvaluation:
+    return GroundedQAEvaluation(
+        answer_relevancy=Failed(),
+        completeness=(
+            completeness
+            if isinstance(completeness, Failed)
+            else Completeness(completeness_justification="", completeness=completeness)
+        ),
+        faithfulness=Failed(),
+        usefulness=Failed(),
+        positive_acceptance=None,
+        negative_rejection=None,
+    )
+
+
+def test_pair_samples() -> None:
+    eval_samples_a = [make_sample("a", "1"), make_sample("b", "1")]
+    eval_samples_b = [make_sample("c", "2"), make_sample("a", "2")]
+    assert pair_samples(eval_samples_a, eval_samples_b) == [
+        (eval_samples_a[0], eval_samples_b[1])
+    ]
+
+
+def test_sign_test_p_value() -> None:
+    assert sign_test_p_value(0, 5) == pytest.approx(2 / 32)
+    assert sign_test_p_value(2, 8) == pytest.approx(2 * (1 + 10 + 45) / 1024)
+    assert sign_test_p_value(5, 5) == 1
+    assert sign_test_p_value(0, 0) == 1
+    # Large numbers of trials do not overflow
+    assert 0.04 < sign_test_p_value(499000, 501000) < 0.05
+
+
+def test_bootstrap_mean_interval() -> None:
+    values = np.array([0.0] * 50 + [1.0] * 50)
+    low, high = bootstrap_mean_interval(values, rng=np.random.default_rng(0))
+    assert low == pytest.approx(0.4, abs=0.02)
+    assert high == pytest.approx(0.6, abs=0.02)
+    assert bootstrap_mean_interval(np.array([2.0, 2.0])) == (2, 2)
+
+
+def test_compare_columns() -> None:
+    columns_a = EvaluationColumns.from_evaluations(
+        [make_evaluation(score) for score in [3, 3, 3, 3, None, Failed()]]
+    )
+    columns_b = EvaluationColumns.from_evaluations(
+        [make_evaluation(score) for score in [5, 4, 3, 2, 5, 5]]
+    )
+    comparison = compare_columns(columns_a, columns_b, num_resamples=1000, seed=0)[
+        "completeness"
+    ]
+    assert comparison.num_pairs == 4
+    assert comparison.mean_a == 3
+    assert comparison.mean_b == 3.5
+    assert comparison.delta == 0.5
+    assert comparison.confidence_interval[0] < 0.5 < comparison.confidence_interval[1]
+    assert (comparison.wins_a, comparison.wins_b, comparison.ties) == (1, 2, 1)
+    assert comparison.p_value == 1
+    assert compare_columns(columns_a, columns_b)["answer_relevancy"].num_pairs == 0
+
+
+def test_compare_systems(cache_path: str) -> None:
+    evaluated = []
+
+    async def evaluate_single_sample(
+        eval_sample: EvaluationSample,
+    ) -> GroundedQAEvaluation:
+        evaluated.append(eval_sample)
+        return make_evaluation(int(eval_sample.actual_output))
+
+    eval_samples_a = [make_sample(str(index), "3") for index in range(20)]
+    eval_samples_b = [make_sample(str(index), "4") for index in reversed(range(20))]
+    evaluator = GroundedQAEvaluator(model_name="gpt-4o-mini", cache_path=cache_path)
+    with patch.object(evaluator, "evaluate_single_sample", evaluate_single_sample):
+        results_a, results_b, comparison = compare_systems(
+            evaluator, eval_samples_a, eval_samples_b, seed=0
+        )
+
+    # Both answers to a question are evaluated back to back
+    assert [eval_sample.input for eval_sample in evaluated[:4]] == ["0", "0", "1", "1"]
+    assert results_a.report.completeness == 3
+    assert results_b.report.completeness == 4
+    assert comparison.metrics["completeness"].wins_b == 20
+    assert comparison.metrics["completeness"].p_value < 1e-5
@@ -0,0 +1,90 @@
+import asyncio
+
+import litellm
+import pytest
+
+from grouse.concurrency import AdaptiveConcurrencyLimiter
+
+
+def test_limit_grows_with_healthy_latency() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=5)
+    for _ in range(5):
+        limiter.on_success(latency=1.0)
+    assert limiter.window == 5
+    for _ in range(100):
+        limiter.on_success(latency=1.0)
+    assert limiter.window == 5
+
+
+def test_limit_holds_with_high_latency() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    limiter.on_success(latency=1.0)
+    limit = limiter.limit
+    for _ in range(10):
+        limiter.on_success(latency=100.0)
+    assert limiter.limit == limit
+
+
+def test_cache_hits_do_not_hold_the_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+
+    async def call(cache_hit: bool) -> None:
+        async with limiter.limit_concurrency() as limited_call:
+            if not cache_hit:
+                await asyncio.sleep(0.01)
+            limited_call.cache_hit = cache_hit
+
+    async def run_calls() -> None:
+        # Cached calls of a resumed run come first and return immediately
+        for _ in range(10):
+            await call(cache_hit=True)
+        for _ in range(10):
+            await call(cache_hit=False)
+
+    asyncio.run(run_calls())
+    assert limiter.min_latency is not None and limiter.min_latency >= 0.01
+    assert limiter.window > 4
+
+
+def test_limit_backs_off_on_rate_limit_errors() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16)
+
+    async def call() -> None:
+        async with limiter.limit_concurrency():
+            await asyncio.sleep(0.01)
+            raise litellm.RateLimitError(
+                message="Too many requests", llm_provider="openai", model="gpt-4"
+            )
+
+    async def run_calls() -> None:
+        results = await asyncio.gather(
+            *[call() for _ in range(8)], return_exceptions=True
+        )
+        assert all(isinstance(result, litellm.RateLimitError) for result in results)
+
+    asyncio.run(run_calls())
+    # Errors of calls sent before the first backoff only halve the limit once
+    assert limiter.window == 8
+    assert limiter.in_flight == 0
+
+
+def test_concurrency_is_limited() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    max_in_flight = 0
+
+    async def call() -> None:
+        nonlocal max_in_flight
+        async with limiter.limit_concurrency():
+            max_in_flight = max(max_in_flight, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run_calls() -> None:
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(run_calls())
+    assert max_in_flight == 2
+
+
+def test_invalid_limits() -> None:
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(initial_limit=10, max_limit=5)
@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+from grouse import EvaluationSample
+from grouse.estimator import estimate_usage, get_expected_metrics, map_bounded
+from grouse.register_models import RATE_LIMITERS, register_rate_limits
+
+ANSWER = {
+    "input": "Quel est la capitale de la France ?",
+    "actual_output": "La capitale de la France est Paris[1].",
+    "expected_output": "Paris[1]",
+    "references": ["Paris est la capitale de la France."],
+}
+NO_ANSWER = {
+    **ANSWER,
+    "actual_output": "No document seems to precisely answer your question.",
+}
+
+
+class TestEstimator:
+    def test_get_expected_metrics(self) -> None:
+        assert get_expected_metrics(EvaluationSample(**ANSWER)) == [
+            "answer_relevancy",
+            "completeness",
+            "faithfulness",
+        ]
+        assert get_expected_metrics(EvaluationSample(**NO_ANSWER)) == [
+            "answer_relevancy",
+            "completeness",
+            "usefulness",
+        ]
+        related = {**NO_ANSWER, "actual_output": NO_ANSWER["actual_output"] + " Lyon."}
+        assert get_expected_metrics(EvaluationSample(**related))[-1] == "faithfulness"
+        assert get_expected_metrics(
+            EvaluationSample(**ANSWER), speculative_metrics=("usefulness",)
+        ) == ["answer_relevancy", "completeness", "faithfulness", "usefulness"]
+
+    def test_estimate_usage(self) -> None:
+        register_rate_limits("gpt-4", rpm=10)
+        try:
+            usage_estimate = estimate_usage(
+                [ANSWER, NO_ANSWER, ANSWER],
+                model_name="gpt-4",
+                output_tokens=100,
+                num_workers=1,
+            )
+        finally:
+            RATE_LIMITERS.clear()
+        assert usage_estimate.num_samples == 3
+        assert usage_estimate.calls == {
+            "answer_relevancy": 3,
+            "completeness": 3,
+            "faithfulness": 2,
+            "usefulness": 1,
+        }
+        assert usage_estimate.prompt_tokens["usefulness"] > 0
+        assert usage_estimate.output_tokens == 900
+        assert usage_estimate.cost > 0
+        # 9 calls at 10 requests per minute
+        assert usage_estimate.duration_seconds == 54
+
+    def test_map_bounded(self) -> None:
+        pulled = 0
+        max_pulled_ahead = 0
+        results: List[int] = []
+
+        def items() -> Iterator[int]:
+            nonlocal pulled
+            for item in range(100):
+                pulled += 1
+                yield item
+
+        def square(item: int, offset: int) -> int:
+            time.sleep(0.001 * (item % 3))
+            return item * item + offset
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for result in map_bounded(executor, square, items(), 4, 1):
+                results.append(result)
+                max_pulled_ahead = max(max_pulled_ahead, pulled - len(results))
+        assert results == [item * item + 1 for item in range(100)]
+        # Items are pulled lazily, at most max_in_flight ahead of the results
+        assert max_pulled_ahead <= 4
@@ -1,6 +1,13 @@
 import asyncio
+import json
+import os
+from pathlib import Path
 from unittest.mock import patch
 
+import litellm
+import numpy as np
+import pytest
+
 from grouse import EvaluationSample, GroundedQAEvaluator
 from grouse.dtos import (
     AnswerRelevancy,
@@ -10,15 +17,21 @@ from grouse.dtos import (
     Faithfulness,
     GroundedQAEvaluation,
     GroundedQAEvaluationReport,
+    MetricRoute,
     Usefulness,
 )
+from grouse.sequential import SequentialStoppingRule
 
 TEST_MODEL = "gpt-4o-mini"
 
 
 class TestGroundedQAEvaluator:
-    def setup_method(self) -> None:
-        self.evaluator = GroundedQAEvaluator(model_name=TEST_MODEL)
+    @pytest.fixture(autouse=True)
+    def setup_evaluator(self, cache_path: str) -> None:
+        self.cache_path = cache_path
+        self.evaluator = GroundedQAEvaluator(
+            model_name=TEST_MODEL, cache_path=cache_path
+        )
 
     def test_evaluate_answer_relevancy(self) -> None:
         with patch.object(
@@ -233,3 +246,566 @@ class TestGroundedQAEvaluator:
             assert len(evaluations) == 1
             assert isinstance(evaluations[0], GroundedQAEvaluation)
             assert isinstance(report, GroundedQAEvaluationReport)
+
+    def test_speculative_metrics_require_parallel_metrics(self) -> None:
+        with pytest.raises(ValueError):
+            GroundedQAEvaluator(
+                model_name=TEST_MODEL, speculative_metrics=["usefulness"]
+            )
+
+    def test_evaluate_single_sample_with_speculative_metrics(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name=TEST_MODEL,
+            cache_path=self.cache_path,
+            parallel_metrics=True,
+            speculative_metrics=["faithfulness", "usefulness"],
+        )
+        with (
+            patch.object(
+                GroundedQAEvaluator,
+                "evaluate_answer_relevancy",
+                return_value=AnswerRelevancy(
+                    answer_relevancy=5,
+                    answer_affirms_no_document_answers=False,
+                    answer_relevancy_justification="Justification",
+                ),
+            ),
+            patch.object(
+                GroundedQAEvaluator,
+                "evaluate_completeness",
+                return_value=Completeness(
+                    completeness=5,
+                    completeness_justification="Justification",
+                ),
+            ),
+            patch.object(
+                GroundedQAEvaluator,
+                "evaluate_faithfulness",
+                return_value=Faithfulness(
+                    faithfulness=1,
+                    faithfulness_justification="Justification",
+                ),
+            ),
+            patch.object(
+                GroundedQAEvaluator,
+                "evaluate_usefulness",
+                return_value=Usefulness(
+                    usefulness=1,
+                    usefulness_justification="Justification",
+                ),
+            ),
+        ):
+            evaluation = asyncio.run(
+                evaluator.evaluate_single_sample(
+                    eval_sample=EvaluationSample(
+                        input="Quel est la capitale de la France ?",
+                        actual_output="Paris[1]",
+                        expected_output="Paris[1]",
+                        references=["Paris"],
+                    )
+                )
+            )
+            assert evaluation.faithfulness.faithfulness == 1
+            # Usefulness is not needed when the answer is relevant
+            assert evaluation.usefulness.usefulness is None
+            assert evaluator.usage["faithfulness"].speculative_calls == 1
+            assert evaluator.usage["usefulness"].speculative_calls == 1
+            assert (
+                evaluator.usage["usefulness"].discarded_calls
+                + evaluator.usage["usefulness"].cancelled_calls
+                == 1
+            )
+            assert evaluator.usage["faithfulness"].discarded_calls == 0
+
+    def test_aiter_evaluate(self) -> None:
+        async def evaluate_single_sample(
+            eval_sample: EvaluationSample,
+        ) -> GroundedQAEvaluation:
+            # Samples with longer outputs take longer to be evaluated
+            await asyncio.sleep(0.01 * len(eval_sample.actual_output))
+            return GroundedQAEvaluation(
+                answer_relevancy=Failed(),
+                completeness=Failed(),
+                faithfulness=Failed(),
+                usefulness=Failed(),
+                positive_acceptance=Failed(),
+                negative_rejection=Failed(),
+            )
+
+        async def collect_indices() -> list:
+            return [
+                index
+                async for index, _ in self.evaluator.aiter_evaluate(
+                    eval_samples, semaphore_size=2
+                )
+            ]
+
+        eval_samples = [
+            EvaluationSample(
+                input="Quel est la capitale de la France ?",
+                actual_output="Paris" * (3 - i),
+                expected_output="Paris",
+                references=["Paris"],
+            )
+            for i in range(3)
+        ]
+        with patch.object(
+            self.evaluator, "evaluate_single_sample", evaluate_single_sample
+        ):
+            indices = asyncio.run(collect_indices())
+        assert sorted(indices) == [0, 1, 2]
+        assert indices[0] == 1
+
+    def test_evaluate_until_precision(self) -> None:
+        started = []
+        cancelled = []
+
+        async def evaluate_single_sample(
+            eval_sample: EvaluationSample,
+        ) -> GroundedQAEvaluation:
+            started.append(eval_sample)
+            score = int(eval_sample.actual_output)
+            try:
+                await asyncio.sleep(0.001 * score)
+            except asyncio.CancelledError:
+                cancelled.append(eval_sample)
+                raise
+            return GroundedQAEvaluation(
+                answer_relevancy=AnswerRelevancy(
+                    answer_relevancy_justification="",
+                    answer_relevancy=score,
+                    answer_affirms_no_document_answers=False,
+                ),
+                completeness=Completeness(
+                    completeness_justification="", completeness=score
+                ),
+                faithfulness=Failed(),
+                usefulness=Usefulness(usefulness_justification="", usefulness=None),
+                positive_acceptance=None,
+                negative_rejection=None,
+            )
+
+        eval_samples = [
+            EvaluationSample(
+                input="Quel est la capitale de la France ?",
+                actual_output=str(4 + i % 2),
+                expected_output="Paris",
+                references=["Paris"],
+            )
+            for i in range(1000)
+        ]
+        stopping_rule = SequentialStoppingRule(
+            max_half_width=0.05,
+            metrics=("answer_relevancy", "completeness"),
+            min_samples=10,
+        )
+        with patch.object(
+            self.evaluator, "evaluate_single_sample", evaluate_single_sample
+        ):
+            results = self.evaluator.evaluate_until_precision(
+                eval_samples, stopping_rule, semaphore_size=10, seed=0
+            )
+        assert stopping_rule.is_reached()
+        assert results.report.stopped_early
+        assert results.report.num_samples == len(results.evaluations) < 100
+        assert results.sample_indices == sorted(results.sample_indices)
+        # Samples are drawn in a random order
+        assert results.sample_indices != list(range(len(results.evaluations)))
+        assert results.report.answer_relevancy == pytest.approx(4.5, abs=0.2)
+        # In-flight evaluations are cancelled and no sample is started afterwards
+        assert cancelled
+        assert len(started) < len(results.evaluations) + 10
+
+    def test_reuse_reference_judgements(self, tmp_path: Path) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name=TEST_MODEL,
+            cache_path=self.cache_path,
+            reference_judgements_path=os.path.join(tmp_path, "judgements"),
+        )
+        answer_1 = {"completeness_justification": "Complete.", "completeness": 5}
+        answer_2 = {"completeness_justification": "Incomplete.", "completeness": 2}
+        prompts = []
+
+        async def complete(metric: str, messages: list) -> litellm.ModelResponse:
+            prompts.append(messages[0]["content"])
+            if len(prompts) == 1:
+                content = json.dumps({"answer_1": answer_1, "answer_2": answer_2})
+            else:
+                content = json.dumps({"answer_2": answer_2})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(evaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.0),
+        ):
+            first = asyncio.run(evaluator.evaluate_completeness(eval_sample))
+            second = asyncio.run(
+                evaluator.evaluate_completeness(
+                    eval_sample.model_copy(update={"actual_output": "Lyon"})
+                )
+            )
+        assert first.completeness == second.completeness == 2
+        assert "Complete." not in prompts[0]
+        assert "Complete." in prompts[1]
+        assert evaluator.usage["completeness"].reused_reference_judgements == 1
+
+    def test_cache_friendly_prompts(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name="anthropic/claude-3-5-sonnet-20240620",
+            cache_path=self.cache_path,
+            cache_friendly_prompts=True,
+        )
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[2]",
+            references=["Paris", "La France"],
+        )
+        default_evaluator = GroundedQAEvaluator(
+            model_name="anthropic/claude-3-5-sonnet-20240620",
+            cache_path=self.cache_path,
+        )
+        prefixes = {}
+        for metric in ["answer_relevancy", "completeness", "faithfulness"]:
+            prompt = evaluator.render_prompt(metric, eval_sample)
+            assert prompt.count("[SAMPLE]") == 1
+            # The sections are only moved, the judge is given the same content
+            default_prompt = default_evaluator.render_prompt(metric, eval_sample)
+            assert sorted(prompt.split("\n")) == sorted(default_prompt.split("\n"))
+            messages = evaluator.build_messages(prompt)
+            prefix, suffix = messages[0]["content"]
+            assert prefix["cache_control"] == {"type": "ephemeral"}
+            assert prefix["text"].startswith("[TASK]")
+            assert "Answer 2: Paris[1]" in suffix["text"]
+            prefixes[metric] = prefix["text"]
+        # Answer relevancy is judged without the references
+        assert "Reference" not in prefixes["answer_relevancy"]
+        assert "Reference 2: La France" in prefixes["completeness"]
+        # Another answer to the same sample shares the prefix
+        other_answer = eval_sample.model_copy(update={"actual_output": "Lyon[1]"})
+        other_prompt = evaluator.render_prompt("completeness", other_answer)
+        assert other_prompt.startswith(prefixes["completeness"])
+
+    def test_cascade(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name="gpt-4",
+            cache_path=self.cache_path,
+            cascade_model_name=TEST_MODEL,
+            cascade_votes=2,
+        )
+        calls = []
+
+        async def complete(
+            self: GroundedQAEvaluator, metric: str, messages: list
+        ) -> litellm.ModelResponse:
+            calls.append((self.model_name, metric))
+            if self.model_name == "gpt-4":
+                score = 2
+            elif metric == "answer_relevancy":
+                # The votes of the cascade model disagree
+                score = 4 + self.completion_kwargs()["seed"]
+            else:
+                score = 5
+            judgement = {"completeness_justification": "", "completeness": score}
+            if metric == "answer_relevancy":
+                judgement = {
+                    "answer_affirms_no_document_answers": False,
+                    "answer_relevancy_justification": "",
+                    "answer_relevancy": score,
+                }
+            content = json.dumps({"answer_1": judgement, "answer_2": judgement})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}],
+                usage={"prompt_tokens": 1000, "completion_tokens": 100},
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(GroundedQAEvaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.001),
+        ):
+            answer_relevancy = asyncio.run(
+                evaluator.evaluate_answer_relevancy(eval_sample)
+            )
+            completeness = asyncio.run(evaluator.evaluate_completeness(eval_sample))
+
+        assert answer_relevancy.answer_relevancy == 2
+        assert completeness.completeness == 5
+        assert calls.count(("gpt-4", "answer_relevancy")) == 1
+        assert ("gpt-4", "completeness") not in calls
+        report = evaluator.compute_report([])
+        assert report.escalation_rate == 0.5
+        assert report.usage["completeness"].cascade_cost == 0.002
+        assert report.cost_saved > 0
+
+    def test_cascade_total_cost(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name="gpt-4",
+            cache_path=self.cache_path,
+            cascade_model_name=TEST_MODEL,
+            metric_routes={"completeness": MetricRoute(model_name="gpt-4-turbo")},
+        )
+
+        async def complete(
+            self: GroundedQAEvaluator, metric: str, messages: list
+        ) -> litellm.ModelResponse:
+            # The cascade model is confident on completeness only
+            score = 5 if metric == "completeness" else 3
+            judgement = {"completeness_justification": "", "completeness": score}
+            if metric == "answer_relevancy":
+                judgement = {
+                    "answer_affirms_no_document_answers": False,
+                    "answer_relevancy_justification": "",
+                    "answer_relevancy": score,
+                }
+            content = json.dumps({"answer_1": judgement, "answer_2": judgement})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}]
+            )
+
+        costs = {TEST_MODEL: 0.001, "gpt-4": 0.01, "gpt-4-turbo": 0.1}
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(GroundedQAEvaluator, "complete", complete),
+            patch.object(
+                litellm,
+                "completion_cost",
+                side_effect=lambda response, model: costs[model],
+            ),
+        ):
+            asyncio.run(evaluator.evaluate_answer_relevancy(eval_sample))
+            asyncio.run(evaluator.evaluate_completeness(eval_sample))
+
+        # Two first passes of the cascade model, answer relevancy being escalated
+        assert evaluator.get_total_cost() == pytest.approx(0.001 * 2 + 0.01)
+
+    def test_metric_routes(self, tmp_path: Path) -> None:
+        prompts_path = tmp_path / "prompts"
+        prompts_path.mkdir()
+        (prompts_path / "faithfulness.txt.jinja").write_text("Custom {{ input }}")
+        evaluator = GroundedQAEvaluator(
+            model_name="gpt-4",
+            cache_path=self.cache_path,
+            metric_routes={
+                "faithfulness": MetricRoute(
+                    model_name=TEST_MODEL, prompts_path=str(prompts_path)
+                ),
+                "usefulness": MetricRoute(
+                    model_name=TEST_MODEL, prompts_path=str(prompts_path)
+                ),
+            },
+        )
+        calls = []
+
+        async def complete(
+            self: GroundedQAEvaluator, metric: str, messages: list
+        ) -> litellm.ModelResponse:
+            calls.append((self.model_name, metric, messages[0]["content"]))
+            judgement = {"faithfulness_justification": "", "faithfulness": 1}
+            content = json.dumps({"answer_1": judgement, "answer_2": judgement})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(GroundedQAEvaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.001),
+        ):
+            faithfulness = asyncio.run(evaluator.evaluate_faithfulness(eval_sample))
+
+        assert faithfulness.faithfulness == 1
+        assert calls == [
+            (TEST_MODEL, "faithfulness", "Custom Quel est la capitale de la France ?")
+        ]
+        assert evaluator.get_route("usefulness") is evaluator.get_route("faithfulness")
+        assert evaluator.get_route("completeness") is evaluator
+        assert evaluator.get_total_cost() == 0.001
+        report = evaluator.compute_report([])
+        assert report.usage["faithfulness"].model_name == TEST_MODEL
+        assert report.usage["faithfulness"].calls == 1
+
+    def test_recover_truncated_response(self) -> None:
+        answer_1 = '{"completeness_justification": "Complete.", "completeness": 5}'
+        answer_2 = "{'completeness_justification': 'Incomplete.', 'completeness': 2,}"
+        responses = [
+            # Prose around the JSON, trailing comma and single quotes
+            f'Sure! {{"answer_1": {answer_1}, "answer_2": {answer_2}}} Done.',
+            # Judgement of answer 1 cut by the maximum number of tokens
+            f'{{"answer_2": {answer_2}, "answer_1": {{"completeness_just',
+        ]
+
+        async def complete(metric: str, messages: list) -> litellm.ModelResponse:
+            return litellm.ModelResponse(
+                choices=[
+                    {"message": {"role": "assistant", "content": responses.pop(0)}}
+                ]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(self.evaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.0),
+        ):
+            for _ in range(2):
+                completeness = asyncio.run(
+                    self.evaluator.evaluate_completeness(eval_sample)
+                )
+                assert completeness.completeness == 2
+        assert self.evaluator.usage["completeness"].repaired_responses == 2
+        assert self.evaluator.usage["completeness"].recovered_answers == 1
+
+    def test_repair_attempts(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name=TEST_MODEL, cache_path=self.cache_path, repair_attempts=1
+        )
+        invalid = {"completeness_justification": "", "completeness": "high"}
+        valid = {"completeness_justification": "", "completeness": 4}
+        responses = [
+            json.dumps({"answer_1": valid, "answer_2": invalid}),
+            json.dumps({"answer_1": valid, "answer_2": valid}),
+        ]
+        sent_messages = []
+
+        async def complete(metric: str, messages: list) -> litellm.ModelResponse:
+            sent_messages.append(messages)
+            return litellm.ModelResponse(
+                choices=[
+                    {"message": {"role": "assistant", "content": responses.pop(0)}}
+                ]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(evaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.001),
+        ):
+            completeness = asyncio.run(evaluator.evaluate_completeness(eval_sample))
+
+        assert completeness.completeness == 4
+        repair_messages = sent_messages[1]
+        assert [message["role"] for message in repair_messages] == [
+            "user",
+            "assistant",
+            "user",
+        ]
+        assert "completeness" in repair_messages[2]["content"]
+        assert "JSON schema" in repair_messages[2]["content"]
+        usage = evaluator.usage["completeness"]
+        assert (usage.repair_calls, usage.repair_successes) == (1, 1)
+        assert usage.cost == 0.002
+
+    def test_failed_repair_cost(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name=TEST_MODEL, cache_path=self.cache_path, repair_attempts=1
+        )
+        invalid = {"completeness_justification": "", "completeness": "high"}
+
+        async def complete(metric: str, messages: list) -> litellm.ModelResponse:
+            content = json.dumps({"answer_1": invalid, "answer_2": invalid})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(evaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.001),
+        ):
+            completeness = asyncio.run(evaluator.evaluate_completeness(eval_sample))
+
+        assert isinstance(completeness, Failed)
+        # The first pass and the repair call are paid for
+        usage = evaluator.usage["completeness"]
+        assert (usage.calls, usage.repair_calls) == (1, 1)
+        assert usage.cost == 0.002
+        assert evaluator.get_total_cost() == 0.002
+
+    def test_first_pass_parsing_success(self) -> None:
+        evaluator = GroundedQAEvaluator(
+            model_name=TEST_MODEL,
+            cache_path=self.cache_path,
+            repair_attempts=1,
+            parallel_metrics=True,
+            speculative_metrics=["usefulness"],
+        )
+        answers = {
+            "answer_relevancy": {
+                "answer_relevancy_justification": "",
+                "answer_affirms_no_document_answers": False,
+                "answer_relevancy": 5,
+            },
+            "completeness": {"completeness_justification": "", "completeness": 4},
+            "faithfulness": {"faithfulness_justification": "", "faithfulness": 1},
+            "usefulness": {"usefulness_justification": "", "usefulness": 1},
+        }
+        invalid_metrics = {"completeness", "usefulness"}
+
+        async def complete(metric: str, messages: list) -> litellm.ModelResponse:
+            answer = answers[metric]
+            if metric in invalid_metrics and len(messages) == 1:
+                answer = {**answer, metric: "high"}
+            content = json.dumps({"answer_1": answers[metric], "answer_2": answer})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(evaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.001),
+        ):
+            evaluation = asyncio.run(evaluator.evaluate_single_sample(eval_sample))
+
+        assert evaluation.completeness.completeness == 4
+        assert evaluation.usefulness.usefulness is None
+        report = evaluator.compute_report([evaluation])
+        assert report.completeness_parsing_success == 1
+        assert report.first_pass_parsing_success["answer_relevancy"] == 1
+        assert report.first_pass_parsing_success["completeness"] == 0
+        assert report.first_pass_parsing_success["faithfulness"] == 1
+        # The repaired speculative usefulness judgement was discarded
+        assert np.isnan(report.first_pass_parsing_success["usefulness"])
@@ -0,0 +1,86 @@
+import os
+from pathlib import Path
+
+from grouse.dtos import (
+    AnswerRelevancy,
+    Completeness,
+    EvaluationSample,
+    Failed,
+    Faithfulness,
+    GroundedQAEvaluation,
+    Usefulness,
+)
+from grouse.journal import EvaluationJournal
+
+SAMPLE = EvaluationSample(
+    input="Quel est la capitale de la France ?",
+    actual_output="Paris[1]",
+    expected_output="Paris[1]",
+    references=["Paris"],
+)
+EVALUATION = GroundedQAEvaluation(
+    answer_relevancy=AnswerRelevancy(
+        answer_affirms_no_document_answers=False,
+        answer_relevancy_justification="",
+        answer_relevancy=5,
+    ),
+    completeness=Completeness(completeness_justification="", completeness=5),
+    faithfulness=Faithfulness(faithfulness_justification="", faithfulness=1),
+    usefulness=Usefulness(usefulness_justification="", usefulness=None),
+    positive_acceptance=None,
+    negative_rejection=None,
+)
+FAILED_EVALUATION = EVALUATION.model_copy(
+    update={"faithfulness": Failed(error="Rate limit exceeded")}
+)
+
+
+def test_resume_journal(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "journal.jsonl")
+    with EvaluationJournal(path) as journal:
+        journal.record(SAMPLE, EVALUATION)
+    # Simulate an interruption while writing an entry
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"sample_hash": "abc", "evalu')
+
+    with EvaluationJournal(path, resume=True) as journal:
+        assert journal.get(SAMPLE) == EVALUATION
+        assert journal.get(SAMPLE.model_copy(update={"actual_output": "Lyon"})) is None
+        journal.record(SAMPLE.model_copy(update={"actual_output": "Lyon"}), EVALUATION)
+
+    with EvaluationJournal(path, resume=True) as journal:
+        assert len(journal.evaluations) == 2
+
+
+def test_resume_failed_evaluations(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "journal.jsonl")
+    with EvaluationJournal(path) as journal:
+        journal.record(SAMPLE, FAILED_EVALUATION)
+
+    # Samples with a failed metric are evaluated again on resume
+    with EvaluationJournal(path, resume=True) as journal:
+        assert journal.get(SAMPLE) is None
+        journal.record(SAMPLE, EVALUATION)
+
+    with EvaluationJournal(path, resume=True) as journal:
+        assert journal.get(SAMPLE) == EVALUATION
+
+
+def test_resume_another_configuration(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "journal.jsonl")
+    with EvaluationJournal(path, config_hash="gpt-4") as journal:
+        journal.record(SAMPLE, EVALUATION)
+
+    with EvaluationJournal(path, resume=True, config_hash="gpt-4o") as journal:
+        assert journal.get(SAMPLE) is None
+    with EvaluationJournal(path, resume=True, config_hash="gpt-4") as journal:
+        assert journal.get(SAMPLE) == EVALUATION
+
+
+def test_overwrite_journal(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "journal.jsonl")
+    with EvaluationJournal(path) as journal:
+        journal.record(SAMPLE, EVALUATION)
+
+    with EvaluationJournal(path) as journal:
+        assert journal.get(SAMPLE) is None
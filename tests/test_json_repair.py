@@ -0,0 +1,44 @@
+import pytest
+
+from grouse.json_repair import find_json_object, loads_tolerant, repair_json
+
+
+class TestJsonRepair:
+    def test_loads_valid_json(self) -> None:
+        assert loads_tolerant('{"a": 1}') == ({"a": 1}, False)
+
+    def test_find_json_object(self) -> None:
+        text = 'Here is my evaluation: {"a": "}", "b": {"c": 1}} Hope it helps.'
+        assert find_json_object(text) == ('{"a": "}", "b": {"c": 1}}', True)
+        assert find_json_object('{"a": {"b"') == ('{"a": {"b"', False)
+        with pytest.raises(ValueError):
+            find_json_object("No JSON here")
+
+    def test_repair_syntax(self) -> None:
+        assert loads_tolerant("{'a': True, 'b': None, 'c': [1, 2,],}") == (
+            {"a": True, "b": None, "c": [1, 2]},
+            True,
+        )
+        assert loads_tolerant("{answer_1: {score: 3}}")[0] == {"answer_1": {"score": 3}}
+        assert loads_tolerant("""{'a': 'say "hi"'}""")[0] == {"a": 'say "hi"'}
+
+    @pytest.mark.parametrize(
+        "truncated, expected",
+        [
+            ('{"a": {"b": 1}, "c": {"d": "cut', {"a": {"b": 1}, "c": {"d": "cut"}}),
+            ('{"a": {"b": 1}, "c": {"d": "e", "f":', {"a": {"b": 1}, "c": {"d": "e"}}),
+            ('{"a": {"b": 1}, "c": {"d": "e", "f', {"a": {"b": 1}, "c": {"d": "e"}}),
+            ('{"a": [{"b": 1}, {"c', {"a": [{"b": 1}]}),
+            ('{"a": [1, 2, tr', {"a": [1, 2]}),
+        ],
+    )
+    def test_repair_truncated_json(self, truncated: str, expected: dict) -> None:
+        assert loads_tolerant(truncated) == (expected, True)
+        assert repair_json(truncated).endswith("}")
+
+    def test_repair_non_ascii_words(self) -> None:
+        assert loads_tolerant("{é: 1, 'clé': 'à'}") == ({"é": 1, "clé": "à"}, True)
+        assert loads_tolerant('{"a": 1, "b": Évid') == ({"a": 1}, True)
+        # Prose after the last member cannot be repaired
+        with pytest.raises(ValueError):
+            loads_tolerant('{"answer_2": {"completeness": 3}, Évidemment}')
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import litellm
+
+from grouse import EvaluationSample
+from grouse.dtos import AnswerRelevancy, Completeness, Failed
+from grouse.grounded_qa_evaluator import GroundedQAEvaluator
+from grouse.multi_judge import MultiJudgeEvaluator, aggregate_scores
+
+JUDGE_SCORES = {"gpt-4": 5, "gpt-4o": 3, "gpt-4o-mini": 3}
+
+
+def make_judgement(metric: str, score: int) -> dict:
+    if metric == "answer_relevancy":
+        return {
+            "answer_affirms_no_document_answers": False,
+            "answer_relevancy_justification": "Justification",
+            "answer_relevancy": score,
+        }
+    if metric == "completeness":
+        return {"completeness_justification": "Justification", "completeness": score}
+    return {"faithfulness_justification": "Justification", "faithfulness": 1}
+
+
+class TestMultiJudgeEvaluator:
+    def test_evaluate_single_sample(self, cache_path: str) -> None:
+        evaluator = MultiJudgeEvaluator(
+            list(JUDGE_SCORES),
+            jury_aggregation="majority",
+            cache_path=cache_path,
+            parallel_metrics=True,
+        )
+        models = []
+
+        async def complete(
+            self: GroundedQAEvaluator, metric: str, messages: list
+        ) -> litellm.ModelResponse:
+            models.append(self.model_name)
+            judgement = make_judgement(metric, JUDGE_SCORES[self.model_name])
+            content = json.dumps({"answer_1": judgement, "answer_2": judgement})
+            return litellm.ModelResponse(
+                choices=[{"message": {"role": "assistant", "content": content}}]
+            )
+
+        eval_sample = EvaluationSample(
+            input="Quel est la capitale de la France ?",
+            actual_output="Paris[1]",
+            expected_output="Paris[1]",
+            references=["Paris"],
+        )
+        with (
+            patch.object(GroundedQAEvaluator, "complete", complete),
+            patch.object(litellm, "completion_cost", return_value=0.0),
+        ):
+            evaluation = asyncio.run(evaluator.evaluate_single_sample(eval_sample))
+
+        assert len(models) == 9
+        # Each of the three prompts is rendered once for the three judges
+        assert len(evaluator.prompt_cache.prompts) == 3
+        assert evaluation.judges["gpt-4"].answer_relevancy.answer_relevancy == 5
+        assert evaluation.judges["gpt-4o"].answer_relevancy.answer_relevancy == 3
+        assert evaluation.jury.answer_relevancy.answer_relevancy == 3
+        assert evaluation.jury.faithfulness.faithfulness == 1
+
+        results = evaluator.compute_reports([evaluation])
+        assert results.judges["gpt-4"].report.answer_relevancy == 5
+        assert results.jury.report.answer_relevancy == 3
+        assert results.jury.report.usage is None
+        assert results.jury.report.escalation_rate is None
+        assert results.jury.report.first_pass_parsing_success is None
+
+    def test_aggregate_scores(self) -> None:
+        scores = [
+            Completeness(completeness_justification="", completeness=value)
+            for value in (1, 5, 4, None)
+        ] + [Failed()]
+        assert aggregate_scores(scores, "completeness", "median").completeness == 4
+        assert aggregate_scores(scores, "completeness", "majority").completeness == 1
+        no_answers = [
+            AnswerRelevancy(
+                answer_affirms_no_document_answers=True,
+                answer_relevancy_justification="",
+                answer_relevancy=None,
+            )
+        ] * 2 + [Failed()]
+        assert (
+            aggregate_scores(no_answers, "answer_relevancy", "median").answer_relevancy
+            is None
+        )
+        assert isinstance(
+            aggregate_scores([Failed(), Failed()], "completeness", "median"), Failed
+        )
@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+from grouse import EvaluationSample
+from grouse.prompts import PromptRenderer
+
+EVAL_SAMPLE = EvaluationSample(
+    input="Quel est la capitale de la France ?",
+    actual_output="Paris[1]",
+    expected_output="Paris[2]",
+    references=["Paris", "La France"],
+)
+
+
+class TestPromptRenderer:
+    def test_render_prompt(self) -> None:
+        renderer = PromptRenderer(model_name="gpt-4")
+        prompt = renderer.render_prompt("completeness", EVAL_SAMPLE)
+        assert "Reference 2: La France" in prompt
+        assert renderer.build_messages(prompt) == [{"role": "user", "content": prompt}]
+
+    def test_move_sample_first(self, tmp_path: Path) -> None:
+        with open(os.path.join(tmp_path, "completeness.txt.jinja"), "w") as file:
+            file.write(
+                "[TASK]Judge completeness.[/TASK]\n"
+                "Instructions.\n"
+                "[SAMPLE]{{ input }}[/SAMPLE]\n"
+                "Answer: {{ actual_output }}"
+            )
+        renderer = PromptRenderer(
+            model_name="anthropic/claude-3-5-sonnet-20240620",
+            prompts_path=str(tmp_path),
+            cache_friendly_prompts=True,
+        )
+        prompt = renderer.render_prompt("completeness", EVAL_SAMPLE)
+        # Only the sections of the prompt are moved
+        assert prompt == (
+            "[TASK]Judge completeness.[/TASK]\n"
+            f"[SAMPLE]{EVAL_SAMPLE.input}[/SAMPLE]\n"
+            "Instructions.\n"
+            "Answer: Paris[1]"
+        )
+        prefix, suffix = renderer.build_messages(prompt)[0]["content"]
+        assert prefix["cache_control"] == {"type": "ephemeral"}
+        assert suffix["text"] == "Instructions.\nAnswer: Paris[1]"
+        # The templates it does not override are the default ones
+        repair_template = renderer.get_template("repair.txt.jinja")
+        assert "JSON schema" in repair_template.render(error="", schema="")
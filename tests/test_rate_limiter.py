@@ -0,0 +1,27 @@
+from grouse.rate_limiter import TokenBucketRateLimiter
+
+
+def test_requests_per_minute() -> None:
+    rate_limiter = TokenBucketRateLimiter(rpm=2)
+    assert rate_limiter.reserve(tokens=1000) == 0
+    assert rate_limiter.reserve(tokens=1000) == 0
+    assert 29 < rate_limiter.reserve(tokens=1000) <= 30
+
+
+def test_tokens_per_minute() -> None:
+    rate_limiter = TokenBucketRateLimiter(rpm=100, tpm=1000)
+    assert rate_limiter.reserve(tokens=600) == 0
+    assert 11 < rate_limiter.reserve(tokens=600) <= 12
+
+
+def test_refund() -> None:
+    rate_limiter = TokenBucketRateLimiter(tpm=1000)
+    assert rate_limiter.reserve(tokens=1000) == 0
+    rate_limiter.refund(tokens=500)
+    assert rate_limiter.reserve(tokens=500) == 0
+
+
+def test_request_larger_than_bucket() -> None:
+    rate_limiter = TokenBucketRateLimiter(tpm=1000)
+    assert rate_limiter.reserve(tokens=5000) == 0
+    assert 59 < rate_limiter.reserve(tokens=5000) <= 60
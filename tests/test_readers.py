@@ -0,0 +1,93 @@
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from pydantic import ValidationError
+
+from grouse.dtos import EvaluationSample
+from grouse.readers import (
+    READERS,
+    iter_chunks,
+    read_rows,
+    read_samples,
+    register_reader,
+)
+
+ROWS = [
+    {
+        "input": f"Question {index}",
+        "actual_output": f"Answer {index}",
+        "expected_output": f"Expected answer {index}",
+        "references": [f"Reference {index}"],
+        "metadata": {"domain": "a" if index % 2 else "b"},
+    }
+    for index in range(5)
+]
+
+
+def write_jsonl(file: Any, rows: List[Dict[str, Any]]) -> None:
+    for row in rows:
+        file.write((json.dumps(row) + "\n").encode("utf-8"))
+
+
+def test_read_jsonl(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "dataset.jsonl")
+    with open(path, "wb") as file:
+        write_jsonl(file, ROWS)
+        # Blank lines are skipped
+        file.write(b"\n")
+    samples = list(read_samples(path))
+    assert samples == [EvaluationSample(**row) for row in ROWS]
+
+
+def test_read_jsonl_gz(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "dataset.jsonl.gz")
+    with gzip.open(path, "wb") as file:
+        write_jsonl(file, ROWS)
+    assert list(read_rows(path)) == ROWS
+
+
+def test_read_jsonl_zst(tmp_path: Path) -> None:
+    zstandard = pytest.importorskip("zstandard")
+    path = os.path.join(tmp_path, "dataset.jsonl.zst")
+    with open(path, "wb") as file:
+        with zstandard.ZstdCompressor().stream_writer(file) as writer:
+            write_jsonl(writer, ROWS)
+    assert list(read_rows(path)) == ROWS
+
+
+def test_read_parquet(tmp_path: Path) -> None:
+    pyarrow = pytest.importorskip("pyarrow")
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+
+    path = os.path.join(tmp_path, "dataset.parquet")
+    pyarrow_parquet.write_table(pyarrow.Table.from_pylist(ROWS), path)
+    samples = list(read_samples(path, chunk_size=2))
+    assert samples == [EvaluationSample(**row) for row in ROWS]
+
+
+def test_iter_chunks() -> None:
+    chunks = list(iter_chunks(iter(ROWS), chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[2][0].input == "Question 4"
+
+    with pytest.raises(ValidationError):
+        list(iter_chunks([{"input": "Question"}]))
+
+
+def test_register_reader(tmp_path: Path) -> None:
+    def read_json(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, encoding="utf-8") as file:
+            yield from json.load(file)
+
+    path = os.path.join(tmp_path, "dataset.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(ROWS, file)
+    register_reader(".json", read_json)
+    try:
+        assert list(read_rows(path)) == ROWS
+    finally:
+        del READERS[".json"]
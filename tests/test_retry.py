@@ -0,0 +1,59 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import litellm
+
+from grouse.grounded_qa_evaluator import GroundedQAEvaluator
+from grouse.retry import RetryPolicy, get_retry_after
+
+
+def rate_limit_error(headers: dict) -> litellm.RateLimitError:
+    return litellm.RateLimitError(
+        message="Too many requests",
+        llm_provider="openai",
+        model="gpt-4o-mini",
+        response=httpx.Response(
+            429, headers=headers, request=httpx.Request("POST", "https://test")
+        ),
+    )
+
+
+def test_get_retry_after() -> None:
+    assert get_retry_after(rate_limit_error({"retry-after": "12"})) == 12
+    assert get_retry_after(rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert get_retry_after(rate_limit_error({})) is None
+
+
+def test_retry_budget() -> None:
+    retry_policy = RetryPolicy(max_retries=3, retry_budget=1)
+    assert retry_policy.can_retry(0)
+    retry_policy.get_delay(0, rate_limit_error({}))
+    assert not retry_policy.can_retry(0)
+
+
+def test_complete_retries_transient_errors(cache_path: str) -> None:
+    evaluator = GroundedQAEvaluator(
+        model_name="gpt-4o-mini",
+        cache_path=cache_path,
+        retry_policy=RetryPolicy(max_retries=2, initial_delay=0),
+    )
+    with patch.object(
+        litellm,
+        "acompletion",
+        AsyncMock(
+            side_effect=[
+                rate_limit_error({"retry-after": "0.01"}),
+                litellm.Timeout(
+                    message="Timeout", model="gpt-4o-mini", llm_provider="openai"
+                ),
+                "response",
+            ]
+        ),
+    ):
+        response = asyncio.run(
+            evaluator.complete("faithfulness", [{"role": "user", "content": "Hi"}])
+        )
+    assert response == "response"
+    assert evaluator.usage["faithfulness"].retries == 2
+    assert evaluator.usage["faithfulness"].backoff_seconds >= 0.01
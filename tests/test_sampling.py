@@ -0,0 +1,58 @@
+from collections import Counter
+
+from grouse.dtos import EvaluationSample
+from grouse.sampling import StratifiedReservoirSampler, allocate_sample
+
+
+def make_sample(index: int, domain: str) -> EvaluationSample:
+    return EvaluationSample(
+        input=str(index),
+        actual_output="",
+        expected_output="",
+        references=[],
+        metadata={"domain": domain},
+    )
+
+
+def test_allocate_sample() -> None:
+    assert allocate_sample(10, {"a": 60, "b": 30, "c": 10}) == {"a": 6, "b": 3, "c": 1}
+    # Small strata get at least one sample
+    assert allocate_sample(10, {"a": 990, "b": 5, "c": 5}) == {"a": 8, "b": 1, "c": 1}
+    assert sum(allocate_sample(7, {"a": 10, "b": 10, "c": 10}).values()) == 7
+    assert allocate_sample(100, {"a": 3, "b": 2}) == {"a": 3, "b": 2}
+
+
+class TestStratifiedReservoirSampler:
+    def test_sample(self) -> None:
+        domains = ["a"] * 700 + ["b"] * 200 + ["c"] * 100
+        sampler = StratifiedReservoirSampler(50, seed=0)
+        for index, domain in enumerate(domains):
+            sampler.add(make_sample(index, domain), domain)
+        eval_samples, weights = sampler.sample()
+
+        assert sampler.population_size == 1000
+        assert len(eval_samples) == 50
+        counts = Counter(eval_sample.metadata["domain"] for eval_sample in eval_samples)
+        assert counts == {"a": 35, "b": 10, "c": 5}
+        # Samples are in the order of the stream, weighted back to the population
+        indices = [int(eval_sample.input) for eval_sample in eval_samples]
+        assert indices == sorted(indices)
+        assert sum(weights) == 1000
+        assert set(weights) == {20}
+
+        # Same seed, same sample
+        other_sampler = StratifiedReservoirSampler(50, seed=0)
+        for index, domain in enumerate(domains):
+            other_sampler.add(make_sample(index, domain), domain)
+        assert other_sampler.sample()[0] == eval_samples
+
+    def test_reservoir_is_uniform(self) -> None:
+        counts = Counter()
+        for seed in range(200):
+            sampler = StratifiedReservoirSampler(5, seed=seed)
+            for index in range(20):
+                sampler.add(make_sample(index, "a"))
+            eval_samples, _ = sampler.sample()
+            counts.update(int(eval_sample.input) for eval_sample in eval_samples)
+        # Each sample is drawn 50 times on average
+        assert all(20 <= counts[index] <= 80 for index in range(20))
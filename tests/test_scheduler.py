@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import aclosing
+from typing import Dict, Iterator, List
+
+import pytest
+
+from grouse.concurrency import AdaptiveConcurrencyLimiter
+from grouse.scheduler import SampleScheduler
+
+
+class TestSampleScheduler:
+    def test_run(self) -> None:
+        pulled = 0
+        in_flight = 0
+        max_in_flight = 0
+        max_pulled_ahead = 0
+        results: Dict[int, int] = {}
+
+        def samples() -> Iterator[int]:
+            nonlocal pulled
+            for sample in range(1000):
+                pulled += 1
+                yield sample
+
+        async def process(sample: int) -> int:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.001 * (sample % 3))
+            in_flight -= 1
+            return sample * 2
+
+        def sink(index: int, result: int) -> None:
+            nonlocal max_pulled_ahead
+            results[index] = result
+            max_pulled_ahead = max(max_pulled_ahead, pulled - len(results))
+
+        scheduler = SampleScheduler(process, num_workers=4)
+        asyncio.run(scheduler.run(samples(), sink))
+        assert results == {sample: sample * 2 for sample in range(1000)}
+        assert max_in_flight == 4
+        # Samples are pulled lazily, at most the workers and the queue ahead
+        assert max_pulled_ahead <= 4 + 4 + 1
+
+    def test_aiter(self) -> None:
+        async def process(sample: int) -> int:
+            await asyncio.sleep(0.01 * sample)
+            return sample
+
+        async def collect() -> List[int]:
+            scheduler = SampleScheduler(process, num_workers=3)
+            return [index async for index, _ in scheduler.aiter([3, 1, 2])]
+
+        assert asyncio.run(collect()) == [1, 2, 0]
+
+    def test_aiter_close(self) -> None:
+        started: List[int] = []
+        cancelled: List[int] = []
+
+        async def process(sample: int) -> int:
+            started.append(sample)
+            try:
+                await asyncio.sleep(0.001 * (sample % 5))
+            except asyncio.CancelledError:
+                cancelled.append(sample)
+                raise
+            return sample
+
+        async def take(num_results: int) -> List[int]:
+            scheduler = SampleScheduler(process, num_workers=5)
+            results = []
+            async with aclosing(scheduler.aiter(range(1000))) as evaluations:
+                async for _, result in evaluations:
+                    results.append(result)
+                    if len(results) == num_results:
+                        break
+            await asyncio.sleep(0.01)
+            return results
+
+        results = asyncio.run(take(20))
+        assert len(results) == 20
+        # A worker only takes its next sample once its result is consumed
+        assert len(started) < len(results) + 5
+        assert cancelled
+
+    def test_error(self) -> None:
+        async def process(sample: int) -> int:
+            await asyncio.sleep(0.001)
+            if sample == 5:
+                raise ValueError("Failed sample")
+            return sample
+
+        async def collect() -> List[int]:
+            scheduler = SampleScheduler(process, num_workers=2)
+            return [result async for _, result in scheduler.aiter(range(10))]
+
+        with pytest.raises(ValueError, match="Failed sample"):
+            asyncio.run(collect())
+
+    def test_concurrency_limiter(self) -> None:
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=8)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def process(sample: int) -> int:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+            return sample
+
+        scheduler = SampleScheduler(process, concurrency_limiter=limiter)
+        assert scheduler.num_workers == 8
+        asyncio.run(scheduler.run(range(50), lambda index, result: None))
+        # The window of the limiter does not grow without calls
+        assert max_in_flight == 2
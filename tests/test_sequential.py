@@ -0,0 +1,104 @@
+import math
+import statistics
+
+import pytest
+
+from grouse.dtos import (
+    Completeness,
+    Failed,
+    Faithfulness,
+    GroundedQAEvaluation,
+    Usefulness,
+)
+from grouse.sequential import RunningEstimate, SequentialStoppingRule
+
+
+def make_evaluation(completeness: int | None) -> GroundedQAEvaluation:
+    return GroundedQAEvaluation(
+        answer_relevancy=Failed(),
+        completeness=Completeness(
+            completeness_justification="", completeness=completeness
+        ),
+        faithfulness=Faithfulness(faithfulness_justification="", faithfulness=1),
+        usefulness=Usefulness(usefulness_justification="", usefulness=None),
+        positive_acceptance=None,
+        negative_rejection=None,
+    )
+
+
+def test_running_estimate() -> None:
+    values = [1, 5, 3, 4, 4, 2]
+    estimate = RunningEstimate()
+    assert math.isinf(estimate.standard_error)
+    for value in values:
+        estimate.update(value)
+    assert estimate.count == len(values)
+    assert estimate.mean == pytest.approx(statistics.mean(values))
+    assert estimate.standard_error == pytest.approx(
+        statistics.stdev(values) / math.sqrt(len(values))
+    )
+
+
+class TestSequentialStoppingRule:
+    def test_is_reached(self) -> None:
+        stopping_rule = SequentialStoppingRule(
+            max_half_width=0.175, metrics=("completeness",), min_samples=5
+        )
+        for completeness in [2, 4, None, 3, 3]:
+            stopping_rule.update(make_evaluation(completeness))
+        # Null values are left out of the estimates
+        assert stopping_rule.num_samples == 5
+        assert stopping_rule.estimates["completeness"].count == 4
+        assert not stopping_rule.is_reached()
+
+        stopping_rule.update(make_evaluation(3))
+        assert stopping_rule.half_width("completeness") == pytest.approx(
+            1.96 * statistics.stdev([2, 4, 3, 3, 3]) / math.sqrt(5), abs=1e-3
+        )
+        assert stopping_rule.is_reached()
+
+    def test_binary_metric(self) -> None:
+        stopping_rule = SequentialStoppingRule(
+            max_half_width=0.1, metrics=("completeness", "faithfulness"), min_samples=5
+        )
+        for index in range(40):
+            stopping_rule.update(
+                make_evaluation(3).model_copy(
+                    update={
+                        "faithfulness": Faithfulness(
+                            faithfulness_justification="", faithfulness=index % 2
+                        )
+                    }
+                )
+            )
+        # The interval of faithfulness is wider than 0.1, although narrower than
+        # the 0.4 points allowed on the 1 to 5 scale of completeness
+        assert stopping_rule.half_width("completeness") == 0
+        assert 0.1 < stopping_rule.half_width("faithfulness") < 0.4
+        assert not stopping_rule.is_reached()
+
+        for index in range(400):
+            stopping_rule.update(
+                make_evaluation(3).model_copy(
+                    update={
+                        "faithfulness": Faithfulness(
+                            faithfulness_justification="", faithfulness=index % 2
+                        )
+                    }
+                )
+            )
+        assert stopping_rule.relative_half_width("faithfulness") <= 0.1
+        assert stopping_rule.is_reached()
+
+    def test_failed_metric_is_never_reached(self) -> None:
+        stopping_rule = SequentialStoppingRule(
+            metrics=("answer_relevancy", "faithfulness"), min_samples=2
+        )
+        for _ in range(10):
+            stopping_rule.update(make_evaluation(3))
+        assert stopping_rule.half_width("faithfulness") == 0
+        assert not stopping_rule.is_reached()
+
+    def test_invalid_metric(self) -> None:
+        with pytest.raises(ValueError):
+            SequentialStoppingRule(metrics=("positive_acceptance",))
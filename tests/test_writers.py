@@ -0,0 +1,119 @@
+import os
+from pathlib import Path
+
+import jsonlines
+import numpy as np
+import pytest
+
+from grouse.columnar import COLUMNS, EvaluationColumns
+from grouse.dtos import (
+    AnswerRelevancy,
+    Completeness,
+    Failed,
+    Faithfulness,
+    GroundedQAEvaluation,
+    Usefulness,
+)
+from grouse.writers import (
+    JsonlEvaluationWriter,
+    ParquetEvaluationWriter,
+    flatten_evaluation,
+    open_evaluation_writer,
+)
+
+
+def make_evaluation(
+    answer_relevancy: int | None | Failed, faithfulness: int | None | Failed
+) -> GroundedQAEvaluation:
+    return GroundedQAEvaluation(
+        answer_relevancy=(
+            answer_relevancy
+            if isinstance(answer_relevancy, Failed)
+            else AnswerRelevancy(
+                answer_affirms_no_document_answers=answer_relevancy is None,
+                answer_relevancy_justification="The answer is relevant.",
+                answer_relevancy=answer_relevancy,
+            )
+        ),
+        completeness=Completeness(
+            completeness_justification="The answer is complete.", completeness=5
+        ),
+        faithfulness=(
+            faithfulness
+            if isinstance(faithfulness, Failed)
+            else Faithfulness(
+                faithfulness_justification="The answer is faithful.",
+                faithfulness=faithfulness,
+            )
+        ),
+        usefulness=Usefulness(usefulness_justification="", usefulness=None),
+        positive_acceptance=None,
+        negative_rejection=0,
+    )
+
+
+EVALUATIONS = [
+    make_evaluation(5, 1),
+    make_evaluation(2, 0),
+    make_evaluation(None, None),
+    make_evaluation(Failed(error="parsing failed"), Failed()),
+]
+
+
+def assert_columns_equal(
+    columns: EvaluationColumns, expected_columns: EvaluationColumns
+) -> None:
+    for column in COLUMNS:
+        np.testing.assert_array_equal(
+            columns.values[column], expected_columns.values[column]
+        )
+        np.testing.assert_array_equal(
+            columns.failed[column], expected_columns.failed[column]
+        )
+
+
+def test_flatten_evaluation() -> None:
+    row = flatten_evaluation(EVALUATIONS[3])
+    assert row["answer_relevancy"] is None
+    assert row["answer_relevancy_failed"]
+    assert row["answer_relevancy_error"] == "parsing failed"
+    assert row["answer_affirms_no_document_answers"] is None
+    assert row["completeness"] == 5
+    assert row["completeness_justification"] == "The answer is complete."
+    assert not row["negative_rejection_failed"]
+
+
+def test_write_jsonl(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "evaluations.jsonl")
+    with open_evaluation_writer(path) as writer:
+        assert isinstance(writer, JsonlEvaluationWriter)
+        for index, evaluation in reversed(list(enumerate(EVALUATIONS))):
+            writer.write(evaluation, index)
+    with jsonlines.open(path) as reader:
+        assert [row["index"] for row in reader] == [3, 2, 1, 0]
+    assert_columns_equal(
+        EvaluationColumns.from_jsonl(path),
+        EvaluationColumns.from_evaluations(EVALUATIONS),
+    )
+
+
+def test_write_parquet(tmp_path: Path) -> None:
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    path = os.path.join(tmp_path, "evaluations.parquet")
+    writer = ParquetEvaluationWriter(path, batch_size=3)
+    # Evaluations are streamed in completion order
+    for index in (2, 0, 3, 1):
+        writer.write(EVALUATIONS[index], index)
+    writer.close()
+
+    parquet_file = pyarrow_parquet.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read()
+    assert table["index"].to_pylist() == [2, 0, 3, 1]
+    assert table["faithfulness_justification"].to_pylist()[1] == (
+        "The answer is faithful."
+    )
+    assert_columns_equal(
+        EvaluationColumns.from_parquet(path),
+        EvaluationColumns.from_evaluations(EVALUATIONS),
+    )